@@ -0,0 +1,221 @@
+"""
+Load and latency benchmark against the in-process app
+
+    cd backend && python -m benchmarks.load [--users 50] [--iterations 5]
+    python -m benchmarks.load --save-baseline      # record benchmarks/baseline.json
+    python -m benchmarks.load --compare            # fail when p95 regresses
+
+server.app is driven through httpx's ASGI transport, so no network or
+uvicorn process is involved. The app's lifespan runs around the load, so
+the image and tagging worker pools, the notification feed and the other
+background services compete for the process as they do in production.
+The database is mongomock-motor by default; pass --mongo-url to run
+against a real mongod instead. Each virtual user logs in with OTP, uploads
+a JPEG document, submits an application and polls notifications; latency
+is recorded per route and reported as p50/p95/p99 with requests per second.
+
+The committed baseline.json was recorded with the defaults on mongomock;
+absolute numbers depend on the machine, so re-record it on the machine
+that runs --compare.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from io import BytesIO
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+FIXED_OTP = "123456"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, http, label: str, method: str, url: str, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        response = await http.request(method, url, **kwargs)
+        self.samples[label].append((time.perf_counter() - started) * 1000)
+        if response.status_code not in expected:
+            self.errors[label] += 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        report = {}
+        for label, samples in sorted(self.samples.items()):
+            report[label] = {
+                "count": len(samples),
+                "errors": self.errors.get(label, 0),
+                "rps": len(samples) / elapsed,
+                "p50_ms": statistics.median(samples),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+            }
+        return report
+
+
+def configure_app(mongo_url: str, blob_dir: str):
+    """Import server with a benchmark database and process-local adapters"""
+    if mongo_url:
+        os.environ['MONGO_URL'] = mongo_url
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'akshaya_benchmark')
+    os.environ.setdefault('DEFAULT_CENTER_ID', 'benchmark-center')
+    os.environ['NODE_ENV'] = 'development'
+    os.environ['BLOB_STORE'] = 'local'
+    os.environ['BLOB_STORE_PATH'] = blob_dir
+    os.environ['OTP_STORE'] = 'memory'
+
+    if not mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+        from database import client, transactions
+
+        # Installed before server is imported, so every module-level store uses it
+        client.configure(client=AsyncMongoMockClient())
+        # mongomock has no sessions; take the standalone-server write path
+        transactions.set_transactions_supported(False)
+
+    import server
+
+    server.generate_otp = lambda: FIXED_OTP
+    return server
+
+
+def sample_document() -> bytes:
+    """A ~60 KB photo-like JPEG, so uploads go through real compression and thumbnailing"""
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def user_flow(http, recorder: Recorder, user_index: int, iterations: int, document_body: bytes) -> None:
+    phone = f"+9190000{user_index:05d}"
+    await recorder.call(http, "POST /api/auth/request-otp", "POST", "/api/auth/request-otp", json={"phone": phone})
+    response = await recorder.call(
+        http, "POST /api/auth/verify-otp", "POST", "/api/auth/verify-otp", json={"phone": phone, "otp": FIXED_OTP}
+    )
+    token = response.json().get("token")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for _ in range(iterations):
+        await recorder.call(http, "GET /api/services", "GET", "/api/services")
+        response = await recorder.call(
+            http, "POST /api/documents", "POST", "/api/documents", headers=headers,
+            data={"name": "aadhaar.jpg", "type": "identity_proof"},
+            files={"file": ("aadhaar.jpg", document_body, "image/jpeg")}
+        )
+        document_id = response.json().get("id")
+        await recorder.call(http, "GET /api/documents", "GET", "/api/documents", headers=headers)
+        await recorder.call(
+            http, "POST /api/applications", "POST", "/api/applications", headers=headers,
+            json={"service_id": "residence_certificate", "documents": [document_id] if document_id else []}
+        )
+        await recorder.call(http, "GET /api/notifications", "GET", "/api/notifications", headers=headers)
+        await recorder.call(
+            http, "GET /api/notifications/unread-count", "GET", "/api/notifications/unread-count", headers=headers
+        )
+        await recorder.call(http, "GET /api/dashboard/summary", "GET", "/api/dashboard/summary", headers=headers)
+
+
+async def run(args) -> Dict[str, dict]:
+    import httpx
+
+    with tempfile.TemporaryDirectory() as blob_dir:
+        server = configure_app(args.mongo_url, blob_dir)
+        transport = httpx.ASGITransport(app=server.app)
+        recorder = Recorder()
+        document_body = sample_document()
+        # ASGITransport sends no lifespan events; run startup/shutdown around the load
+        async with server.app.router.lifespan_context(server.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+                started = time.perf_counter()
+                await asyncio.gather(*(
+                    user_flow(http, recorder, i, args.iterations, document_body) for i in range(args.users)
+                ))
+                elapsed = time.perf_counter() - started
+        report = recorder.report(elapsed)
+        total = sum(stats["count"] for stats in report.values())
+        report["_total"] = {"count": total, "elapsed_s": elapsed, "rps": total / elapsed}
+        # Latencies only compare across runs on the same kind of machine and database
+        report["_environment"] = {
+            "cpus": os.cpu_count(),
+            "python": sys.version.split()[0],
+            "database": "mongodb" if args.mongo_url else "mongomock",
+            "users": args.users,
+            "iterations": args.iterations,
+        }
+        return report
+
+
+def print_report(report: Dict[str, dict], baseline: Dict[str, dict] = None) -> List[str]:
+    regressions = []
+    print(f"{'endpoint':40} {'count':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, stats in report.items():
+        if label.startswith("_"):
+            continue
+        line = (
+            f"{label:40} {stats['count']:6d} {stats['errors']:4d} {stats['rps']:8.1f} "
+            f"{stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f}"
+        )
+        previous = (baseline or {}).get(label)
+        if previous:
+            change = (stats["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+            line += f"   p95 {change:+.0f}% vs baseline"
+            if change > baseline.get("_threshold_pct", 20):
+                regressions.append(label)
+        print(line)
+    total = report["_total"]
+    print(f"total {total['count']} requests in {total['elapsed_s']:.2f}s ({total['rps']:.1f} req/s)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="In-process load and latency benchmark")
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=5, help="flow iterations per user")
+    parser.add_argument("--mongo-url", help="real MongoDB instead of mongomock-motor")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE_PATH.name}")
+    parser.add_argument("--compare", action="store_true", help="compare p95 against the stored baseline")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed p95 regression in percent")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        if not BASELINE_PATH.exists():
+            print(f"No baseline at {BASELINE_PATH}; run with --save-baseline first")
+            return 2
+        baseline = json.loads(BASELINE_PATH.read_text())
+        baseline["_threshold_pct"] = args.threshold
+        if baseline.get("_environment") != report["_environment"]:
+            print(f"Baseline was recorded with {baseline.get('_environment')}, this run is {report['_environment']}")
+    regressions = print_report(report, baseline)
+
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+    if regressions:
+        print(f"p95 regressions over {args.threshold:.0f}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
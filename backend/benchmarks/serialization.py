@@ -0,0 +1,85 @@
+"""
+Serialization benchmark: FastAPI's default response path vs the orjson fast path
+
+    cd backend && python -m benchmarks.serialization [--items 1000] [--rounds 200]
+
+Default path: validate rows into the response model, run jsonable_encoder,
+render with JSONResponse (what FastAPI does for a returned list of dicts or
+models). Fast path: FastJSONResponse on the projected rows.
+"""
+import os
+import time
+import uuid
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from typing import List
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'akshaya_benchmark')
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from server import NotificationMessage
+from services.serialization import FastJSONResponse, ORJSON_AVAILABLE
+
+
+def make_rows(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        NotificationMessage(
+            user_id="benchmark-user",
+            title="Application Submitted",
+            message=f"Your Ration Card application has been submitted successfully. Application ID: {uuid.uuid4()}",
+            type="service_update",
+            read=bool(i % 3),
+            created_at=now - timedelta(minutes=i)
+        ).model_dump()
+        for i in range(count)
+    ]
+
+
+def default_path(rows: List[dict], adapter: TypeAdapter) -> bytes:
+    models = adapter.validate_python(rows)
+    return JSONResponse(jsonable_encoder(models)).body
+
+
+def fast_path(rows: List[dict], adapter: TypeAdapter) -> bytes:
+    return FastJSONResponse(rows).body
+
+
+def measure(fn, rows, adapter, rounds: int) -> List[float]:
+    fn(rows, adapter)  # warm up
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(rows, adapter)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    rows = make_rows(args.items)
+    adapter = TypeAdapter(List[NotificationMessage])
+    print(f"{args.items} notifications x {args.rounds} rounds (orjson available: {ORJSON_AVAILABLE})")
+
+    results = {}
+    for name, fn in (("default", default_path), ("fast", fast_path)):
+        samples = measure(fn, rows, adapter, args.rounds)
+        results[name] = statistics.median(samples)
+        print(
+            f"  {name:8} median {results[name]:8.3f} ms   "
+            f"p95 {sorted(samples)[int(len(samples) * 0.95) - 1]:8.3f} ms"
+        )
+    print(f"  speedup  {results['default'] / results['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
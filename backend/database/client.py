@@ -0,0 +1,122 @@
+"""
+Managed MongoDB client
+One AsyncIOMotorClient per process, configured from the environment:
+
+    MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE      connections per worker process
+    MONGO_MAX_IDLE_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS pool housekeeping
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS
+    MONGO_LIST_READ_PREFERENCE                     read preference of list reads (default primary)
+    MONGO_MAX_STALENESS_SECONDS                    how far behind a secondary may be for them
+    MONGO_WRITE_CONCERN_CRITICAL / _DEFAULT / _BACKGROUND
+
+Code picks a database handle by operation class instead of tuning each call:
+- "default"    primary reads, MONGO_WRITE_CONCERN_DEFAULT (1)
+- "critical"   user, application and payment writes, majority + journal
+- "list"       list reads; primary unless MONGO_LIST_READ_PREFERENCE opts in to
+               secondaries, which gives up read-your-writes on those lists
+- "background" workers (image processing, tagging, stats), w=1 without journal wait
+"""
+import os
+import logging
+from typing import Dict, Optional
+
+from pymongo import ReadPreference
+from pymongo.read_preferences import Secondary, SecondaryPreferred, Nearest, PrimaryPreferred
+from pymongo.write_concern import WriteConcern
+
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCES = {
+    "primary": lambda staleness: ReadPreference.PRIMARY,
+    "primarypreferred": lambda staleness: PrimaryPreferred(max_staleness=staleness),
+    "secondary": lambda staleness: Secondary(max_staleness=staleness),
+    "secondarypreferred": lambda staleness: SecondaryPreferred(max_staleness=staleness),
+    "nearest": lambda staleness: Nearest(max_staleness=staleness),
+}
+
+
+def _write_concern(value: str, journal: Optional[bool]) -> WriteConcern:
+    w = int(value) if value.isdigit() else value
+    if w == 0:
+        # Unacknowledged writes cannot ask for journaling
+        return WriteConcern(w=0)
+    return WriteConcern(w=w, j=journal)
+
+
+class Database:
+    def __init__(self, url: str, name: str, client=None, listeners=()):
+        self.url = url
+        self.name = name
+        self.pool_options = {
+            "maxPoolSize": int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+            "minPoolSize": int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+            "maxIdleTimeMS": int(os.getenv('MONGO_MAX_IDLE_MS', 60000)),
+            "waitQueueTimeoutMS": int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)),
+            "connectTimeoutMS": int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+            "socketTimeoutMS": int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000)),
+            "serverSelectionTimeoutMS": int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        }
+        if client is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            client = AsyncIOMotorClient(url, event_listeners=list(listeners), **self.pool_options)
+        self.client = client
+        self._handles: Dict[str, object] = {}
+
+    def _options(self, operation: str) -> dict:
+        if operation == "list":
+            preference = os.getenv('MONGO_LIST_READ_PREFERENCE', 'primary').lower()
+            staleness = int(os.getenv('MONGO_MAX_STALENESS_SECONDS', -1))
+            if preference not in READ_PREFERENCES:
+                logger.warning(f"Unknown MONGO_LIST_READ_PREFERENCE '{preference}', reading from the primary")
+                preference = "primary"
+            return {"read_preference": READ_PREFERENCES[preference](staleness)}
+        if operation == "critical":
+            return {"write_concern": _write_concern(os.getenv('MONGO_WRITE_CONCERN_CRITICAL', 'majority'), True)}
+        if operation == "background":
+            return {"write_concern": _write_concern(os.getenv('MONGO_WRITE_CONCERN_BACKGROUND', '1'), False)}
+        return {"write_concern": _write_concern(os.getenv('MONGO_WRITE_CONCERN_DEFAULT', '1'), None)}
+
+    def handle(self, operation: str = "default"):
+        """Motor database configured for an operation class (see module docstring)"""
+        handle = self._handles.get(operation)
+        if handle is None:
+            handle = self.client.get_database(self.name, **self._options(operation))
+            self._handles[operation] = handle
+        return handle
+
+    async def connect(self) -> None:
+        """Verify connectivity at startup; the pool itself connects lazily"""
+        try:
+            await self.client.admin.command('ping')
+            logger.info(
+                f"Connected to MongoDB database '{self.name}' "
+                f"(pool {self.pool_options['minPoolSize']}-{self.pool_options['maxPoolSize']})"
+            )
+        except Exception as e:
+            logger.error(f"MongoDB not reachable at startup: {str(e)}")
+
+    def close(self) -> None:
+        self.client.close()
+
+
+_database: Optional[Database] = None
+
+
+def configure(url: Optional[str] = None, name: Optional[str] = None, client=None, listeners=()) -> Database:
+    """Create the process-wide Database; tests and benchmarks call this before importing server"""
+    global _database
+    _database = Database(
+        url or os.environ.get('MONGO_URL', 'mongodb://localhost:27017'),
+        name or os.environ['DB_NAME'],
+        client=client,
+        listeners=listeners
+    )
+    return _database
+
+
+def get_database(listeners=()) -> Database:
+    """The process-wide Database, created from MONGO_URL/DB_NAME on first use"""
+    if _database is None:
+        configure(listeners=listeners)
+    return _database
@@ -0,0 +1,202 @@
+"""
+MongoDB index bootstrapper
+Declares every index the API's queries rely on, ensures them idempotently at
+startup and reports drift between the declaration and the live database.
+
+Build on an existing large database ahead of a deploy with:
+    python -m database.indexes            # create missing indexes
+    python -m database.indexes --check    # only report drift
+"""
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+    options: Tuple[Tuple[str, object], ...] = ()
+
+    @property
+    def name(self) -> str:
+        # Same naming scheme MongoDB uses for unnamed indexes
+        return "_".join(f"{key}_{direction}" for key, direction in self.keys)
+
+
+REQUIRED_INDEXES: List[IndexSpec] = [
+    # Login looks users up by phone, every authenticated read by id
+    IndexSpec("users", (("phone", 1),), unique=True),
+    IndexSpec("users", (("id", 1),), unique=True),
+    # Single document reads/deletes and the keyset-paginated list
+    IndexSpec("documents", (("user_id", 1), ("id", 1)), unique=True),
+    IndexSpec("documents", (("user_id", 1), ("created_at", -1), ("id", -1))),
+    # Image compression updates the metadata of every document sharing a content hash
+    IndexSpec("documents", (("content_hash", 1),)),
+    # Auto-tagging claims and recovers documents by status
+    IndexSpec("documents", (("tagging_status", 1),)),
+    IndexSpec("applications", (("id", 1),), unique=True),
+    IndexSpec("applications", (("user_id", 1), ("created_at", -1), ("id", -1))),
+    # Center work queue: equality on center and status, then the queue order. Leading
+    # with center_id also makes it the natural shard key prefix for applications.
+    IndexSpec("applications", (("center_id", 1), ("status", 1), ("priority", -1), ("created_at", 1))),
+    # Client retries of the same submission resolve to the original application
+    IndexSpec(
+        "applications", (("user_id", 1), ("idempotency_key", 1)), unique=True,
+        options=(("partialFilterExpression", {"idempotency_key": {"$exists": True}}),)
+    ),
+    IndexSpec("notifications", (("id", 1),), unique=True),
+    IndexSpec("notifications", (("user_id", 1), ("created_at", -1), ("id", -1))),
+    # Covers the unread badge count and bulk "read everything before" updates
+    IndexSpec("notifications", (("user_id", 1), ("read", 1), ("created_at", -1))),
+    # Abandoned codes of the Mongo OTP store expire on their own
+    IndexSpec("otp_codes", (("expires_at", 1),), options=(("expireAfterSeconds", 0),)),
+    # Originals replaced by compressed images are deleted once their grace period is over
+    IndexSpec("retired_blobs", (("delete_after", 1),)),
+    # Revoked access tokens only need to be remembered until they expire
+    IndexSpec("revoked_tokens", (("expires_at", 1),), options=(("expireAfterSeconds", 0),)),
+]
+
+
+@dataclass
+class IndexReport:
+    missing: List[IndexSpec] = field(default_factory=list)
+    conflicting: List[Tuple[IndexSpec, dict]] = field(default_factory=list)
+    unmanaged: Dict[str, List[str]] = field(default_factory=dict)
+    created: List[IndexSpec] = field(default_factory=list)
+    failed: List[Tuple[IndexSpec, str]] = field(default_factory=list)
+
+    @property
+    def has_drift(self) -> bool:
+        return bool(self.missing or self.conflicting or self.failed)
+
+    def log(self) -> None:
+        for spec in self.created:
+            logger.info(f"Created index {spec.collection}.{spec.name}")
+        for spec in self.missing:
+            logger.warning(f"Missing index {spec.collection}.{spec.name}")
+        for spec, existing in self.conflicting:
+            logger.warning(
+                f"Index {spec.collection}.{spec.name} differs from declaration: "
+                f"expected unique={spec.unique}, found {existing}"
+            )
+        for spec, error in self.failed:
+            logger.error(f"Failed to create index {spec.collection}.{spec.name}: {error}")
+        for collection, names in self.unmanaged.items():
+            logger.info(f"Unmanaged indexes on {collection}: {', '.join(names)}")
+
+
+def _matches(spec: IndexSpec, existing: dict) -> bool:
+    if [tuple(k) for k in existing.get("key", [])] != [(k, d) for k, d in spec.keys]:
+        return False
+    if bool(existing.get("unique", False)) != spec.unique:
+        return False
+    return all(existing.get(option) == value for option, value in spec.options)
+
+
+async def check_indexes(db, specs: List[IndexSpec] = None) -> IndexReport:
+    """Compare declared indexes against the database without changing anything"""
+    specs = REQUIRED_INDEXES if specs is None else specs
+    report = IndexReport()
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in specs:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    for collection, collection_specs in by_collection.items():
+        existing = await db[collection].index_information()
+        declared_names = {spec.name for spec in collection_specs}
+        for spec in collection_specs:
+            if spec.name not in existing:
+                report.missing.append(spec)
+            elif not _matches(spec, existing[spec.name]):
+                report.conflicting.append((spec, existing[spec.name]))
+        extra = sorted(name for name in existing if name != "_id_" and name not in declared_names)
+        if extra:
+            report.unmanaged[collection] = extra
+    return report
+
+
+async def ensure_indexes(db, specs: List[IndexSpec] = None, background: bool = False) -> IndexReport:
+    """
+    Create every missing declared index. Existing indexes that conflict with
+    the declaration are reported, never dropped.
+    """
+    report = await check_indexes(db, specs)
+    missing, report.missing = report.missing, []
+    for spec in missing:
+        try:
+            await db[spec.collection].create_index(
+                list(spec.keys),
+                name=spec.name,
+                unique=spec.unique,
+                background=background,
+                **dict(spec.options)
+            )
+            report.created.append(spec)
+        except Exception as e:
+            report.failed.append((spec, str(e)))
+    return report
+
+
+async def bootstrap_indexes(db) -> IndexReport:
+    """
+    Startup hook. MONGO_ENSURE_INDEXES selects the behaviour:
+    "create" (default) builds missing indexes, "check" only reports drift,
+    "off" skips the step entirely.
+    """
+    mode = os.getenv('MONGO_ENSURE_INDEXES', 'create').lower()
+    if mode == 'off':
+        return IndexReport()
+    try:
+        if mode == 'check':
+            report = await check_indexes(db)
+        else:
+            report = await ensure_indexes(db)
+    except Exception as e:
+        # Never keep the API from starting because the index pass failed
+        logger.error(f"Index bootstrap failed: {str(e)}")
+        return IndexReport()
+    report.log()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Create or verify the Akshaya API MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="only report drift, do not build anything")
+    parser.add_argument(
+        "--foreground", action="store_true",
+        help="request foreground builds (servers before MongoDB 4.2 otherwise build in the background)"
+    )
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run() -> IndexReport:
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            if args.check:
+                return await check_indexes(db)
+            return await ensure_indexes(db, background=not args.foreground)
+        finally:
+            client.close()
+
+    report = asyncio.run(run())
+    report.log()
+    return 1 if report.has_drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Multi-document transactions with a standalone-server fallback
+Replica sets and sharded clusters run the callback inside a transaction.
+Standalone servers (typical for development) reject transactions; the first
+rejection is remembered and the callback then runs without a session.
+"""
+import logging
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos"
+TRANSACTIONS_UNSUPPORTED_CODE = 20
+
+_transactions_supported: Optional[bool] = None
+
+
+def set_transactions_supported(supported: Optional[bool]) -> None:
+    """
+    Override transaction detection: False always writes without a session
+    (e.g. benchmarks on an in-memory mock), None probes the server again.
+    """
+    global _transactions_supported
+    _transactions_supported = supported
+
+
+async def run_in_transaction(client, callback: Callable[[Optional[object]], Awaitable[T]]) -> T:
+    """
+    Run callback(session) atomically. Without transaction support the
+    callback receives None and its writes are applied individually.
+    """
+    global _transactions_supported
+    if _transactions_supported is not False:
+        try:
+            async with await client.start_session() as session:
+                result = await session.with_transaction(callback)
+            _transactions_supported = True
+            return result
+        except OperationFailure as e:
+            if e.code != TRANSACTIONS_UNSUPPORTED_CODE:
+                raise
+            _transactions_supported = False
+            logger.warning("MongoDB transactions unavailable (standalone server) - writing without a transaction")
+    return await callback(None)
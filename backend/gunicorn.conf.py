@@ -0,0 +1,38 @@
+"""
+Multi-worker production runtime
+
+    cd backend && gunicorn -c gunicorn.conf.py server:app
+
+Runs one uvicorn worker per CPU core by default (WEB_CONCURRENCY or -w overrides).
+Every worker has its own event loop, Mongo pool (MONGO_MAX_POOL_SIZE each)
+and background pools, so the shared backends must be configured, e.g.
+
+    JWT_SECRET=... SESSION_SECRET=... OTP_STORE=mongo \
+    CACHE_BACKEND=redis RATE_LIMIT_BACKEND=redis REDIS_URL=redis://localhost:6379/0
+
+otherwise services.deployment stops the workers from booting. OTP_STORE=redis
+works as well; the redis client is part of requirements.txt.
+"""
+import os
+import multiprocessing
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '8001')}")
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# Recycle workers now and then to contain slow leaks; jitter avoids restarting all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+
+
+def on_starting(server):
+    """
+    Export the worker count the arbiter will actually run (-w and GUNICORN_CMD_ARGS
+    override the value above). Workers inherit the environment; the app sizes its
+    pools and runs its shared-state startup check from it.
+    """
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
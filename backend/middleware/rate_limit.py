@@ -0,0 +1,194 @@
+"""
+Sliding-window rate limiting
+Each key keeps the request count of the current and the previous fixed
+window; the previous count is weighted by how much of it still overlaps the
+sliding window. That makes every check O(1) with constant memory per key.
+A request is only counted when every matching rule allows it, so a request
+rejected by one rule does not use up the quota of the others.
+"""
+import os
+import time
+import math
+import logging
+from dataclasses import dataclass
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    name: str
+    limit: int
+    window: int  # seconds
+    path: Optional[str] = None  # exact path, or prefix when ending with "*"
+    per_user: bool = False  # key on the verified user id instead of the client IP
+    anonymous_only: bool = False  # skip requests from a verified user
+
+    def matches(self, path: str) -> bool:
+        if self.path is None:
+            return True
+        if self.path.endswith("*"):
+            return path.startswith(self.path[:-1])
+        return path == self.path
+
+
+class MemoryRateLimitBackend:
+    """
+    Process-local counters. Keys are kept in least-recently-used order, so
+    idle keys are evicted from the front lazily and memory stays bounded by
+    max_keys.
+    """
+
+    is_shared = False
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._max_window = 0
+        # key -> [window index, current count, previous count, last seen]
+        self._counters: "OrderedDict[str, list]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        counters = self._counters
+        # Anything unseen for two windows has no influence on a decision any more
+        idle_after = 2 * self._max_window
+        while counters:
+            key, state = next(iter(counters.items()))
+            if len(counters) <= self.max_keys and now - state[3] < idle_after:
+                break
+            del counters[key]
+
+    def _advance(self, key: str, window: int, now: float) -> list:
+        index = int(now // window)
+        self._max_window = max(self._max_window, window)
+        state = self._counters.get(key)
+        if state is None:
+            state = [index, 0, 0, now]
+            self._counters[key] = state
+            return state
+        self._counters.move_to_end(key)
+        if state[0] != index:
+            state[2] = state[1] if state[0] == index - 1 else 0
+            state[1] = 0
+            state[0] = index
+        state[3] = now
+        return state
+
+    async def hit_all(self, checks: List[Tuple[str, int, int]]) -> Tuple[bool, int]:
+        """
+        Count a request against every (key, limit, window); returns (allowed,
+        retry_after seconds). Nothing is counted unless all of them allow it.
+        """
+        now = time.time()
+        states = []
+        retry_after = 0
+        for key, limit, window in checks:
+            state = self._advance(key, window, now)
+            elapsed = (now - state[0] * window) / window
+            if state[2] * (1 - elapsed) + state[1] >= limit:
+                retry_after = max(retry_after, math.ceil(window * (1 - elapsed)), 1)
+            states.append(state)
+        self._evict(now)
+        if retry_after:
+            return False, retry_after
+        for state in states:
+            state[1] += 1
+        return True, 0
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+# KEYS = (current, previous) window key per check; ARGV = (limit, previous weight, ttl ms) per check.
+# Returns 0 after counting the request everywhere, or the 1-based check that rejected it.
+_REDIS_HIT_SCRIPT = """
+for i = 1, #KEYS / 2 do
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    if previous * tonumber(ARGV[3 * i - 1]) + current >= tonumber(ARGV[3 * i - 2]) then
+        return i
+    end
+end
+for i = 1, #KEYS / 2 do
+    redis.call('INCR', KEYS[2 * i - 1])
+    redis.call('PEXPIRE', KEYS[2 * i - 1], ARGV[3 * i])
+end
+return 0
+"""
+
+
+class RedisRateLimitBackend:
+    """Counters shared by every worker on a Redis-protocol server"""
+
+    is_shared = True
+
+    def __init__(self, redis, key_prefix: str = "ratelimit:"):
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self._hit_script = redis.register_script(_REDIS_HIT_SCRIPT)
+
+    async def hit_all(self, checks: List[Tuple[str, int, int]]) -> Tuple[bool, int]:
+        now = time.time()
+        keys, args, remaining = [], [], []
+        for key, limit, window in checks:
+            index = int(now // window)
+            elapsed = (now - index * window) / window
+            keys += [f"{self.key_prefix}{key}:{index}", f"{self.key_prefix}{key}:{index - 1}"]
+            args += [limit, 1 - elapsed, window * 2000]
+            remaining.append(window * (1 - elapsed))
+        rejected = await self._hit_script(keys=keys, args=args)
+        if not rejected:
+            return True, 0
+        return False, max(1, math.ceil(remaining[int(rejected) - 1]))
+
+
+class RateLimiter:
+    """Applies every matching rule to a request"""
+
+    def __init__(self, rules: List[RateLimitRule], backend=None):
+        self.rules = rules
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+
+    async def check(self, path: str, client_ip: str, user_id: Optional[str]) -> Tuple[bool, int]:
+        """user_id is the verified caller, or None to apply per-user rules to the client IP"""
+        checks = []
+        for rule in self.rules:
+            if not rule.matches(path) or (rule.anonymous_only and user_id):
+                continue
+            if rule.per_user and user_id:
+                key = f"{rule.name}:user:{user_id}"
+            else:
+                key = f"{rule.name}:ip:{client_ip}"
+            checks.append((key, rule.limit, rule.window))
+        if not checks:
+            return True, 0
+        return await self.backend.hit_all(checks)
+
+
+def default_rules() -> List[RateLimitRule]:
+    window = int(os.getenv('RATE_LIMIT_WINDOW_MS', 900000)) // 1000
+    otp_window = int(os.getenv('OTP_RATE_LIMIT_WINDOW_MS', 900000)) // 1000
+    return [
+        RateLimitRule("otp-request", int(os.getenv('OTP_RATE_LIMIT_MAX_REQUESTS', 5)), otp_window,
+                      path="/api/auth/request-otp"),
+        RateLimitRule("otp-verify", int(os.getenv('OTP_VERIFY_RATE_LIMIT_MAX_REQUESTS', 10)), otp_window,
+                      path="/api/auth/verify-otp"),
+        RateLimitRule("user", int(os.getenv('RATE_LIMIT_USER_MAX_REQUESTS', 300)), window,
+                      path="/api/*", per_user=True),
+        # Verified users are budgeted by the per-user rule alone, so callers
+        # sharing one address (an Akshaya center, a carrier NAT) don't starve each other
+        RateLimitRule("ip", int(os.getenv('RATE_LIMIT_MAX_REQUESTS', 100)), window, anonymous_only=True),
+    ]
+
+
+def create_rate_limit_backend():
+    """Build the backend selected by RATE_LIMIT_BACKEND ("memory" or "redis")"""
+    backend = os.getenv('RATE_LIMIT_BACKEND', 'memory').lower()
+    if backend == 'redis':
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        return RedisRateLimitBackend(aioredis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0')))
+    return MemoryRateLimitBackend(max_keys=int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000)))
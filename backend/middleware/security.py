@@ -2,52 +2,41 @@
 Production Security Middleware
 """
 import os
-from fastapi import Request, HTTPException
+from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-import time
-from collections import defaultdict
-from typing import Dict
+from fastapi.responses import JSONResponse
+from typing import Callable, Optional
 
-# Rate limiting storage (in production, use Redis)
-request_counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+from middleware.rate_limit import RateLimiter, default_rules, create_rate_limit_backend
 
 class SecurityMiddleware:
-    def __init__(self, app):
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, identify: Optional[Callable[[str], str]] = None):
+        """identify verifies a bearer token and returns its user id (raising when invalid)"""
         self.app = app
-        self.rate_limit_window = int(os.getenv('RATE_LIMIT_WINDOW_MS', 900000)) // 1000  # Convert to seconds
-        self.rate_limit_max = int(os.getenv('RATE_LIMIT_MAX_REQUESTS', 100))
+        self.limiter = limiter or RateLimiter(default_rules(), create_rate_limit_backend())
+        self.identify = identify
         
     async def __call__(self, scope, receive, send):
         if scope["type"] == "http":
             request = Request(scope, receive)
             
             # Rate limiting
-            client_ip = self.get_client_ip(request)
-            current_time = int(time.time())
-            window_start = current_time - self.rate_limit_window
+            allowed, retry_after = await self.limiter.check(
+                scope["path"],
+                self.get_client_ip(request),
+                self.get_user_id(request)
+            )
             
-            # Clean old entries
-            for ip in list(request_counts.keys()):
-                request_counts[ip] = {
-                    timestamp: count for timestamp, count in request_counts[ip].items()
-                    if int(timestamp) > window_start
-                }
-            
-            # Count requests in current window
-            total_requests = sum(request_counts[client_ip].values())
-            
-            if total_requests >= self.rate_limit_max:
-                response = HTTPException(
+            if not allowed:
+                response = JSONResponse(
                     status_code=429,
-                    detail="Too many requests. Please try again later."
+                    content={"detail": "Too many requests. Please try again later."},
+                    headers={"Retry-After": str(retry_after)}
                 )
                 await response(scope, receive, send)
                 return
-            
-            # Increment request count
-            request_counts[client_ip][str(current_time)] += 1
         
         await self.app(scope, receive, send)
     
@@ -58,6 +47,20 @@ class SecurityMiddleware:
             return forwarded.split(",")[0].strip()
         return request.client.host if request.client else "unknown"
 
+    def get_user_id(self, request: Request) -> Optional[str]:
+        """
+        User id of a valid bearer token, used to key per-user limits.
+        Missing, forged or expired tokens count against the client IP instead,
+        so made-up tokens cannot mint fresh quotas.
+        """
+        authorization = request.headers.get("Authorization")
+        if not self.identify or not authorization or not authorization.startswith("Bearer "):
+            return None
+        try:
+            return self.identify(authorization[7:])
+        except Exception:
+            return None
+
 def add_security_headers(app):
     """Add security headers to responses"""
     
@@ -95,7 +98,7 @@ def configure_cors(app):
         CORSMiddleware,
         allow_origins=allowed_origins,
         allow_credentials=True,
-        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         allow_headers=["*"],
         expose_headers=["*"]
     )
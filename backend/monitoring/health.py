@@ -1,16 +1,121 @@
 """
 Health Check and Monitoring Endpoints
+System metrics and database connectivity are sampled by a background task
+on the app's shared Mongo client; probes only read the cached snapshot, so
+they never block the event loop or open new connections.
 """
 from fastapi import APIRouter, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi.responses import JSONResponse, Response
 import os
 import time
+import asyncio
+import logging
 import psutil
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from monitoring.metrics import render_metrics, CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+PROCESS_STARTED_AT = time.time()
+
+
+class HealthMonitor:
+    def __init__(self, interval: float = 15.0, db_timeout: float = 2.0):
+        self.interval = interval
+        self.db_timeout = db_timeout
+        self.client = None
+        self.snapshot: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def attach(self, client) -> None:
+        """Use the application's Mongo client for connectivity checks"""
+        self.client = client
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        # Prime the CPU counter; psutil reports usage since the previous call
+        psutil.cpu_percent(interval=None)
+        await self.sample()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sample()
+            except Exception as e:
+                logger.error(f"Health sampling failed: {str(e)}")
+
+    async def _ping_db(self) -> str:
+        if self.client is None:
+            return "not_configured"
+        try:
+            await asyncio.wait_for(self.client.admin.command('ping'), self.db_timeout)
+            return "connected"
+        except Exception as e:
+            logger.warning(f"Database ping failed: {str(e)}")
+            return "unreachable"
+
+    @staticmethod
+    def _read_system() -> Dict[str, Any]:
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        return {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory": {
+                "total": memory.total,
+                "available": memory.available,
+                "percent": memory.percent
+            },
+            "disk": {
+                "total": disk.total,
+                "free": disk.free,
+                "percent": (disk.used / disk.total) * 100
+            }
+        }
+
+    async def sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        system, db_status = await asyncio.gather(
+            loop.run_in_executor(None, self._read_system),
+            self._ping_db()
+        )
+        self.snapshot = {
+            "sampled_at": time.time(),
+            "database": db_status,
+            "system": system,
+        }
+
+    @property
+    def is_stale(self) -> bool:
+        sampled_at = self.snapshot.get("sampled_at")
+        return sampled_at is None or time.time() - sampled_at > 3 * self.interval
+
+    @property
+    def is_ready(self) -> bool:
+        return not self.is_stale and self.snapshot.get("database") in ("connected", "not_configured")
+
+
+health_monitor = HealthMonitor(
+    interval=float(os.getenv('HEALTH_SAMPLE_INTERVAL_SECONDS', 15)),
+    db_timeout=float(os.getenv('HEALTH_DB_TIMEOUT_SECONDS', 2))
+)
+
+
 @router.get("/health")
 async def health_check():
     """Basic health check endpoint"""
@@ -20,83 +125,67 @@ async def health_check():
         "service": "akshaya-e-services-api"
     }
 
+
+@router.get("/health/live")
+async def liveness_check():
+    """Liveness probe - the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness_check():
+    """Readiness probe - the last background sample reached the database"""
+    ready = health_monitor.is_ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "database": health_monitor.snapshot.get("database", "unknown"),
+            "stale": health_monitor.is_stale
+        }
+    )
+
+
 @router.get("/health/detailed")
 async def detailed_health_check():
     """Detailed health check with system metrics"""
-    try:
-        # Database connectivity check
-        mongo_url = os.environ.get('MONGO_URL')
-        if mongo_url:
-            client = AsyncIOMotorClient(mongo_url)
-            await client.admin.command('ping')
-            db_status = "connected"
-            client.close()
-        else:
-            db_status = "not_configured"
-        
-        # System metrics
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        
-        return {
-            "status": "healthy",
-            "timestamp": datetime.utcnow().isoformat(),
-            "service": "akshaya-e-services-api",
-            "version": "1.0.0",
-            "environment": os.getenv('NODE_ENV', 'development'),
-            "database": {
-                "status": db_status,
-                "type": "mongodb"
-            },
-            "system": {
-                "cpu_percent": cpu_percent,
-                "memory": {
-                    "total": memory.total,
-                    "available": memory.available,
-                    "percent": memory.percent
-                },
-                "disk": {
-                    "total": disk.total,
-                    "free": disk.free,
-                    "percent": (disk.used / disk.total) * 100
-                }
-            },
-            "uptime": time.time()
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail=f"Health check failed: {str(e)}"
-        )
+    snapshot = health_monitor.snapshot
+    if not snapshot:
+        raise HTTPException(status_code=503, detail="Health check failed: no sample collected yet")
+
+    return {
+        "status": "healthy" if health_monitor.is_ready else "degraded",
+        "timestamp": datetime.utcnow().isoformat(),
+        "sampled_at": datetime.utcfromtimestamp(snapshot["sampled_at"]).isoformat(),
+        "service": "akshaya-e-services-api",
+        "version": "1.0.0",
+        "environment": os.getenv('NODE_ENV', 'development'),
+        "database": {
+            "status": snapshot["database"],
+            "type": "mongodb"
+        },
+        "system": snapshot["system"],
+        "uptime": time.time() - PROCESS_STARTED_AT
+    }
+
 
 @router.get("/metrics")
 async def get_metrics():
-    """Prometheus-style metrics endpoint"""
-    try:
-        cpu_percent = psutil.cpu_percent()
-        memory = psutil.virtual_memory()
-        
-        metrics = f"""
-# HELP akshaya_cpu_usage_percent CPU usage percentage
+    """Prometheus metrics endpoint (text exposition format)"""
+    system = health_monitor.snapshot.get("system")
+    system_metrics = None
+    if system:
+        system_metrics = f"""# HELP akshaya_cpu_usage_percent CPU usage percentage
 # TYPE akshaya_cpu_usage_percent gauge
-akshaya_cpu_usage_percent {cpu_percent}
-
+akshaya_cpu_usage_percent {system["cpu_percent"]}
 # HELP akshaya_memory_usage_percent Memory usage percentage
 # TYPE akshaya_memory_usage_percent gauge
-akshaya_memory_usage_percent {memory.percent}
-
+akshaya_memory_usage_percent {system["memory"]["percent"]}
 # HELP akshaya_memory_total_bytes Total memory in bytes
 # TYPE akshaya_memory_total_bytes gauge
-akshaya_memory_total_bytes {memory.total}
-
+akshaya_memory_total_bytes {system["memory"]["total"]}
 # HELP akshaya_memory_available_bytes Available memory in bytes
 # TYPE akshaya_memory_available_bytes gauge
-akshaya_memory_available_bytes {memory.available}
+akshaya_memory_available_bytes {system["memory"]["available"]}
 """
-        return metrics.strip()
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Metrics collection failed: {str(e)}"
-        )
\ No newline at end of file
+    return Response(content=render_metrics(system_metrics), media_type=CONTENT_TYPE)
@@ -0,0 +1,349 @@
+"""
+Prometheus instrumentation
+A small in-process registry (counters, gauges, histograms) rendered in the
+Prometheus text exposition format, an ASGI middleware recording per-route
+request metrics, and PyMongo listeners timing database commands and tracking
+connection pool usage.
+
+Label children are created once per label set and cached, so recording a
+request costs a dict lookup plus a few additions.
+"""
+import time
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child) -> List[str]:
+        lines = []
+        names = self.labelnames + ("le",)
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(names, tuple(values) + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.counter(
+    "akshaya_http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "akshaya_http_request_duration_seconds", "HTTP request latency in seconds", ("method", "route")
+)
+http_response_size_bytes = registry.histogram(
+    "akshaya_http_response_size_bytes", "HTTP response body size in bytes", ("method", "route"), SIZE_BUCKETS
+)
+http_requests_in_flight = registry.gauge(
+    "akshaya_http_requests_in_flight", "HTTP requests currently being served"
+)
+mongo_command_duration_seconds = registry.histogram(
+    "akshaya_mongo_command_duration_seconds", "MongoDB command latency in seconds", ("command", "outcome")
+)
+mongo_pool_connections = registry.gauge(
+    "akshaya_mongo_pool_connections", "Open MongoDB connections in this process's pool", ("address",)
+)
+mongo_pool_checked_out = registry.gauge(
+    "akshaya_mongo_pool_checked_out", "MongoDB connections currently in use", ("address",)
+)
+mongo_pool_waiting = registry.gauge(
+    "akshaya_mongo_pool_waiting", "Operations waiting for a MongoDB connection", ("address",)
+)
+cache_requests_total = registry.counter(
+    "akshaya_cache_requests_total", "Read-through cache lookups by cache and result", ("cache", "result")
+)
+mongo_pool_checkout_failures_total = registry.counter(
+    "akshaya_mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts", ("address", "reason")
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records request count, latency, response size and in-flight requests per
+    route template (e.g. /api/documents/{document_id}), never per raw path,
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = http_requests_in_flight.labels()
+        # (method, route) -> (latency child, size child); status counters are cached per key too
+        self._route_children: Dict[Tuple[str, str], tuple] = {}
+        self._status_children: Dict[Tuple[str, str, int], _CounterChild] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight.dec()
+            self._record(scope, status_code, elapsed, size)
+
+    def _record(self, scope, status_code: int, elapsed: float, size: int) -> None:
+        route = scope.get("route")
+        key = (scope["method"], getattr(route, "path", None) or UNMATCHED_ROUTE)
+        children = self._route_children.get(key)
+        if children is None:
+            children = (http_request_duration_seconds.labels(*key), http_response_size_bytes.labels(*key))
+            self._route_children[key] = children
+        status_key = key + (status_code,)
+        counter = self._status_children.get(status_key)
+        if counter is None:
+            counter = http_requests_total.labels(key[0], key[1], str(status_code))
+            self._status_children[status_key] = counter
+        counter.inc()
+        children[0].observe(elapsed)
+        children[1].observe(size)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command; register via AsyncIOMotorClient(event_listeners=[...])"""
+
+    def __init__(self):
+        self._children: Dict[Tuple[str, str], _HistogramChild] = {}
+
+    def _observe(self, command_name: str, outcome: str, duration_micros: int) -> None:
+        key = (command_name, outcome)
+        child = self._children.get(key)
+        if child is None:
+            child = mongo_command_duration_seconds.labels(*key)
+            self._children[key] = child
+        child.observe(duration_micros / 1000000)
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        self._observe(event.command_name, "success", event.duration_micros)
+
+    def failed(self, event) -> None:
+        self._observe(event.command_name, "failure", event.duration_micros)
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool gauges per server; register next to MongoCommandMetrics"""
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def pool_created(self, event) -> None:
+        address = self._address(event)
+        for gauge in (mongo_pool_connections, mongo_pool_checked_out, mongo_pool_waiting):
+            gauge.labels(address).set(0)
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        mongo_pool_connections.labels(self._address(event)).inc()
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        mongo_pool_connections.labels(self._address(event)).dec()
+
+    def connection_check_out_started(self, event) -> None:
+        mongo_pool_waiting.labels(self._address(event)).inc()
+
+    def connection_check_out_failed(self, event) -> None:
+        address = self._address(event)
+        mongo_pool_waiting.labels(address).dec()
+        mongo_pool_checkout_failures_total.labels(address, str(event.reason)).inc()
+
+    def connection_checked_out(self, event) -> None:
+        address = self._address(event)
+        mongo_pool_waiting.labels(address).dec()
+        mongo_pool_checked_out.labels(address).inc()
+
+    def connection_checked_in(self, event) -> None:
+        mongo_pool_checked_out.labels(self._address(event)).dec()
+
+
+mongo_pool_metrics = MongoPoolMetrics()
+
+
+def render_metrics(extra: Optional[str] = None) -> str:
+    """Full exposition: registry metrics plus optional pre-rendered lines"""
+    body = registry.render()
+    if extra:
+        body = extra.rstrip("\n") + "\n" + body
+    return body
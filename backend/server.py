@@ -1,24 +1,50 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 import secrets
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Literal, Optional
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 import json
 import random
 import string
+import base64
+import asyncio
+import binascii
+
+from services.storage import create_blob_store, parse_range, BlobNotFound, ContentAddressedStore, BytesSource, is_reencoded, UploadTooLarge, MAX_UPLOAD_BYTES
+from services.image_pipeline import create_image_processor
+from services.auto_tagging import create_document_tagger, AUTO_TYPE, OTHER_TYPE
+from database.client import get_database
+from database.indexes import bootstrap_indexes
+from database.transactions import run_in_transaction
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from monitoring.metrics import MetricsMiddleware, mongo_command_metrics, mongo_pool_metrics
+from services.catalog import ServiceCatalog, etag_matches
+from services.tokens import create_token_manager, InvalidToken, StreamGrant
+from services.otp_store import create_otp_store, OTPResult
+from services import user_stats
+from services.cache import ReadThroughCache, create_cache_backend
+from services import application_workflow
+from services.notification_feed import NotificationBroker, NotificationFeed
+from services.pagination import keyset_filter, split_page, InvalidCursor, KEYSET_SORT, cursor_headers
+from services.serialization import fast_json_response, with_defaults, model_defaults
+from services.deployment import check_deployment, worker_count
+from services.centers import create_center_directory, UnknownCenter
 
 # Import production modules
 try:
     from middleware.security import SecurityMiddleware, add_security_headers, configure_cors, configure_trusted_hosts
-    from monitoring.health import router as health_router
+    from middleware.rate_limit import RateLimiter, default_rules, create_rate_limit_backend
+    from monitoring.health import router as health_router, health_monitor
     from services.sms import SMSService
     PRODUCTION_MODULES_AVAILABLE = True
 except ImportError:
@@ -28,16 +54,42 @@ except ImportError:
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection: one pooled client per process, handles per operation class
+database = get_database(listeners=[mongo_command_metrics, mongo_pool_metrics])
+client = database.client
+db = database.handle()
+list_db = database.handle("list")  # list reads; secondaries only when MONGO_LIST_READ_PREFERENCE opts in
+critical_db = database.handle("critical")  # user and application writes, majority + journal
+background_db = database.handle("background")  # worker writes
+
+# Uploaded file bytes live in the blob store, document rows only reference them
+blob_store = create_blob_store(db)
+# Identical uploads share one reference-counted blob, keyed by SHA-256
+document_store = ContentAddressedStore(blob_store, db, max_length=MAX_UPLOAD_BYTES)
+# Compresses uploaded images and renders thumbnails off the request path
+image_processor = create_image_processor(background_db, blob_store)
+
+# Signed access tokens (JWT_SECRET or JWT_SIGNING_KEYS/JWT_ACTIVE_KID for rotation)
+token_manager = create_token_manager(db)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await database.connect()
+    await start_background_services()
+    try:
+        yield
+    finally:
+        await stop_background_services()
+        database.close()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-# Add session middleware with secure secret
-session_secret = os.getenv('JWT_SECRET', secrets.token_urlsafe(32))
+# Add session middleware with secure secret; must be the same in every worker
+session_secret = os.getenv('SESSION_SECRET') or os.getenv('JWT_SECRET')
+SESSION_SECRET_CONFIGURED = bool(session_secret)
+if not session_secret:
+    session_secret = secrets.token_urlsafe(32)
 app.add_middleware(SessionMiddleware, secret_key=session_secret)
 
 # Configure security for production
@@ -46,10 +98,15 @@ if PRODUCTION_MODULES_AVAILABLE and os.getenv('NODE_ENV') == 'production':
     add_security_headers(app)
     configure_cors(app)
     configure_trusted_hosts(app)
-    app.add_middleware(SecurityMiddleware)
+    rate_limiter = RateLimiter(default_rules(), create_rate_limit_backend())
+    # Per-user limits key on the verified token subject, not the raw header
+    app.add_middleware(SecurityMiddleware, limiter=rate_limiter, identify=token_manager.verify)
+    # Outermost, so rate-limited and failed requests are measured too
+    app.add_middleware(MetricsMiddleware)
     
     # Add health check endpoints
     app.include_router(health_router, prefix="/api/health", tags=["health"])
+    health_monitor.attach(client)
     
     # Initialize SMS service
     sms_service = SMSService()
@@ -62,8 +119,11 @@ else:
         allow_origins=["*"],
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
     sms_service = None
+    health_monitor = None
+    rate_limiter = None
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -74,10 +134,12 @@ class User(BaseModel):
     phone: str
     name: str = "User"
     language: str = "en"  # "en" or "ml"
+    role: str = "citizen"  # "citizen" or "operator"; operators are provisioned directly in the database
+    center_id: Optional[str] = None  # Akshaya center an operator works at
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class UserCreate(BaseModel):
-    phone: str
+    phone: Optional[str] = None  # the login number; it can only change through OTP verification
     name: str = "User"
     language: str = "en"
 
@@ -85,16 +147,41 @@ class Document(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     name: str
-    type: str  # "address_proof", "identity_proof", "income_certificate", etc.
-    file_data: str  # base64 encoded file data
-    auto_tagged: bool = False
+    type: str  # "address_proof", "identity_proof", "income_certificate", etc.; "auto" until classified
+    blob_id: Optional[str] = None  # reference into the blob store
+    content_hash: Optional[str] = None  # "<user id>:<SHA-256>", shared by the user's identical uploads
+    content_type: str = "application/octet-stream"
+    size: int = 0
+    file_data: Optional[str] = None  # legacy inline base64 data (rows created before blob storage)
+    auto_tagged: bool = False  # type was assigned by the classifier
+    tagging_status: str = "pending"  # "pending", "processing", "tagged", "unrecognized", "failed"
+    suggested_type: Optional[str] = None
+    tag_confidence: Optional[float] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-class DocumentCreate(BaseModel):
+class DocumentSummary(BaseModel):
+    """Document metadata for list views - never carries file bodies"""
+    id: str
     name: str
     type: str
+    content_type: str = "application/octet-stream"
+    size: int = 0
+    auto_tagged: bool = False
+    tagging_status: Optional[str] = None
+    suggested_type: Optional[str] = None
+    created_at: datetime
+
+DOCUMENT_SUMMARY_PROJECTION = {"_id": 0, **{field: 1 for field in DocumentSummary.model_fields}}
+DOCUMENT_SUMMARY_DEFAULTS = model_defaults(DocumentSummary)
+
+class DocumentCreate(BaseModel):
+    name: str
+    type: str = AUTO_TYPE
     file_data: str
 
+class DocumentUpdate(BaseModel):
+    type: str  # a document type of the service catalog, or "other"
+
 class ServiceApplication(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -104,12 +191,17 @@ class ServiceApplication(BaseModel):
     fee: int
     documents: List[str] = []  # Document IDs
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    status_updated_at: Optional[datetime] = None
+    center_id: Optional[str] = None  # Akshaya center handling the application
+    priority: int = 0  # higher is served first in the center queue
+    assigned_operator: Optional[str] = None
 
 class ServiceApplicationCreate(BaseModel):
-    service_name: str
     service_id: str
-    fee: int
+    service_name: Optional[str] = None  # informational; the catalog entry is authoritative
+    fee: Optional[int] = None  # validated against the catalog fee when sent
     documents: List[str] = []
+    center_id: Optional[str] = None  # one of CENTER_IDS; DEFAULT_CENTER_ID when omitted
 
 class NotificationMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -120,6 +212,22 @@ class NotificationMessage(BaseModel):
     read: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ApplicationTransition(BaseModel):
+    application_id: str
+    status: Literal["pending", "processing", "completed", "rejected"]
+    note: Optional[str] = Field(None, max_length=500)
+
+class ApplicationBulkTransition(BaseModel):
+    transitions: List[ApplicationTransition] = Field(..., min_length=1, max_length=application_workflow.MAX_BATCH)
+
+class ApplicationStatusUpdate(BaseModel):
+    status: Literal["pending", "processing", "completed", "rejected"]
+    note: Optional[str] = Field(None, max_length=500)
+
+class NotificationBulkRead(BaseModel):
+    ids: Optional[List[str]] = Field(None, max_length=1000)  # mark these notifications read
+    before: Optional[datetime] = None  # or everything created at or before this time
+
 class OTPRequest(BaseModel):
     phone: str
 
@@ -133,34 +241,87 @@ class AuthResponse(BaseModel):
     user_id: Optional[str] = None
     token: Optional[str] = None
 
-# Mock OTP storage (in production, use Redis or database)
-otp_storage = {}
+# OTP storage (OTP_STORE=memory|mongo|redis; use a shared backend with multiple workers)
+otp_store = create_otp_store(db)
+
+OTP_ERRORS = {
+    OTPResult.NOT_FOUND: "OTP not found. Please request OTP first.",
+    OTPResult.EXPIRED: "OTP expired. Please request new OTP.",
+    OTPResult.TOO_MANY_ATTEMPTS: "Too many attempts. Please request new OTP.",
+    OTPResult.INVALID: "Invalid OTP",
+}
 
 def generate_otp():
     return ''.join(random.choices(string.digits, k=6))
 
 async def send_otp_via_sms(phone: str, otp: str) -> bool:
-    """Send OTP via SMS service"""
+    """Queue OTP delivery via the SMS service; returns as soon as the message is queued"""
     if sms_service:
-        return await sms_service.send_otp(phone, otp)
+        return await sms_service.send_otp(phone, otp, otp_store.ttl_seconds)
     else:
         # Development mode - just log
         print(f"🔐 OTP for {phone}: {otp}")
         return True
 
-def get_current_user(authorization: str = Header(None)):
+def get_bearer_token(authorization: Optional[str]) -> str:
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header required")
-    
-    # Mock token validation - in production, use JWT
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid token format")
-    
-    token = authorization.split(" ")[1]
-    # Extract user_id from token format "token_{user_id}"
-    if token.startswith("token_"):
-        return token[6:]  # Remove "token_" prefix to get user_id
-    return token  # Return as-is for backward compatibility
+    return authorization[7:]
+
+async def get_current_user(authorization: str = Header(None)):
+    # Verified in-process from the token signature (and a small LRU cache), no database round trip
+    token = get_bearer_token(authorization)
+    try:
+        return token_manager.verify(token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+def verify_stream_credentials(ticket: Optional[str], authorization: Optional[str]) -> StreamGrant:
+    """
+    Browsers cannot set headers on EventSource/WebSocket, so streams accept a
+    short-lived ?ticket= from POST /notifications/stream-ticket; never the
+    access token itself, which would end up in access logs.
+    """
+    try:
+        if ticket:
+            return token_manager.verify_stream_ticket(ticket)
+        return token_manager.stream_grant(get_bearer_token(authorization))
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+async def get_stream_grant(ticket: Optional[str] = Query(None), authorization: str = Header(None)) -> StreamGrant:
+    return verify_stream_credentials(ticket, authorization)
+
+# Profiles change rarely: cached per user id, refreshed on login and profile updates
+async def load_user_profile(user_id: str) -> Optional[dict]:
+    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    return User(**user).model_dump(mode="json") if user else None
+
+profile_cache = ReadThroughCache(
+    "user_profile",
+    create_cache_backend(),
+    load_user_profile,
+    ttl=float(os.getenv('CACHE_TTL_SECONDS', 300))
+)
+
+async def get_current_operator(user_id: str = Depends(get_current_user)) -> dict:
+    """
+    Akshaya center operator; the role lives on the user row, not in the token.
+    Read from the database rather than profile_cache, so a demotion or center
+    change applies to the very next request.
+    """
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "id": 1, "role": 1, "center_id": 1})
+    if not user or user.get("role") != "operator":
+        raise HTTPException(status_code=403, detail="Operator access required")
+    return {"id": user["id"], "role": user["role"], "center_id": user.get("center_id")}
+
+# Real-time notification push (change stream fed when available, in-process otherwise)
+notification_broker = NotificationBroker(queue_size=int(os.getenv('NOTIFICATION_QUEUE_SIZE', 100)))
+notification_feed = NotificationFeed(notification_broker)
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('NOTIFICATION_HEARTBEAT_SECONDS', 25))
+STREAM_TICKET_TTL_SECONDS = int(os.getenv('NOTIFICATION_STREAM_TICKET_TTL_SECONDS', 30))
 
 # Services data
 SERVICES = [
@@ -169,6 +330,7 @@ SERVICES = [
         "name": "Ration Card",
         "description": "Apply for a new ration card or update existing card details",
         "fee": 100,
+        "requires_visit": True,
         "required_documents": [
             {"type": "address_proof", "name": "Address Proof", "description": "Electricity bill, water bill, or any government issued address proof"},
             {"type": "identity_proof", "name": "Identity Proof", "description": "Aadhaar card, voter ID, or any government issued identity"},
@@ -213,6 +375,7 @@ SERVICES = [
         "name": "Caste Certificate",
         "description": "Apply for caste certificate",
         "fee": 80,
+        "requires_visit": True,
         "required_documents": [
             {"type": "identity_proof", "name": "Identity Proof", "description": "Aadhaar card or voter ID"},
             {"type": "family_certificate", "name": "Family Certificate", "description": "Family register or family certificate"},
@@ -224,6 +387,8 @@ SERVICES = [
         "name": "Pension Scheme",
         "description": "Apply for pension scheme",
         "fee": 0,
+        "requires_visit": True,
+        "priority": 1,
         "required_documents": [
             {"type": "identity_proof", "name": "Identity Proof", "description": "Aadhaar card or voter ID"},
             {"type": "age_proof", "name": "Age Proof", "description": "Birth certificate or SSLC certificate"},
@@ -232,18 +397,25 @@ SERVICES = [
     }
 ]
 
+# Indexed, pre-serialized catalog; SERVICES is the built-in default source
+service_catalog = ServiceCatalog(SERVICES)
+# Classifies uploads into the catalog's document types in a background worker pool
+document_tagger = create_document_tagger(background_db, blob_store, service_catalog)
+CATALOG_CACHE_CONTROL = f"public, max-age={int(os.getenv('SERVICE_CATALOG_MAX_AGE', 300))}"
+
+def catalog_response(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # Authentication endpoints
 @api_router.post("/auth/request-otp", response_model=AuthResponse)
 async def request_otp(request: OTPRequest):
     """Request OTP for phone number"""
     otp = generate_otp()
-    otp_storage[request.phone] = {
-        "otp": otp,
-        "timestamp": datetime.utcnow(),
-        "attempts": 0
-    }
+    await otp_store.save(request.phone, otp)
     
-    # In production, send SMS here
     sms_sent = await send_otp_via_sms(request.phone, otp)
     
     if not sms_sent:
@@ -254,27 +426,9 @@ async def request_otp(request: OTPRequest):
 @api_router.post("/auth/verify-otp", response_model=AuthResponse)
 async def verify_otp(request: OTPVerify):
     """Verify OTP and login/register user"""
-    if request.phone not in otp_storage:
-        raise HTTPException(status_code=400, detail="OTP not found. Please request OTP first.")
-    
-    stored_otp = otp_storage[request.phone]
-    
-    # Check if OTP is expired (5 minutes)
-    if datetime.utcnow() - stored_otp["timestamp"] > timedelta(minutes=5):
-        del otp_storage[request.phone]
-        raise HTTPException(status_code=400, detail="OTP expired. Please request new OTP.")
-    
-    # Check OTP attempts
-    if stored_otp["attempts"] >= 3:
-        del otp_storage[request.phone]
-        raise HTTPException(status_code=400, detail="Too many attempts. Please request new OTP.")
-    
-    if stored_otp["otp"] != request.otp:
-        otp_storage[request.phone]["attempts"] += 1
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-    
-    # OTP verified, clean up
-    del otp_storage[request.phone]
+    result = await otp_store.verify(request.phone, request.otp)
+    if result != OTPResult.OK:
+        raise HTTPException(status_code=400, detail=OTP_ERRORS[result])
     
     # Check if user exists
     existing_user = await db.users.find_one({"phone": request.phone})
@@ -284,10 +438,15 @@ async def verify_otp(request: OTPVerify):
     else:
         # Create new user
         user = User(phone=request.phone)
-        await db.users.insert_one(user.dict())
+        try:
+            await critical_db.users.insert_one(user.dict())
+        except DuplicateKeyError:
+            # A concurrent first login for this phone created the user first
+            user = User(**await critical_db.users.find_one({"phone": request.phone}))
+    # Freshly read or written, so good to serve the profile calls that follow login
+    await profile_cache.set(user.id, user.model_dump(mode="json"))
     
-    # Generate token (in production, use JWT)
-    token = f"token_{user.id}"
+    token = token_manager.issue(user.id)
     
     return AuthResponse(
         success=True,
@@ -296,57 +455,164 @@ async def verify_otp(request: OTPVerify):
         token=token
     )
 
+@api_router.post("/auth/logout")
+async def logout(authorization: str = Header(None)):
+    """Revoke the current access token"""
+    try:
+        await token_manager.revoke(get_bearer_token(authorization))
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    return {"message": "Logged out successfully"}
+
 # User endpoints
 @api_router.get("/user/profile")
 async def get_user_profile(user_id: str = Depends(get_current_user)):
     """Get user profile"""
-    user = await db.users.find_one({"id": user_id})
+    user = await profile_cache.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return User(**user)
 
 @api_router.put("/user/profile")
 async def update_user_profile(profile: UserCreate, user_id: str = Depends(get_current_user)):
-    """Update user profile"""
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": profile.dict()}
+    """Update name and language; a phone other than the verified login number is rejected with 409"""
+    query = {"id": user_id}
+    if profile.phone is not None:
+        query["phone"] = profile.phone
+    result = await critical_db.users.update_one(
+        query,
+        {"$set": profile.dict(include={"name", "language"})}
     )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="Phone number can only be changed by verifying it with an OTP")
+    await profile_cache.invalidate(user_id)
     return {"message": "Profile updated successfully"}
 
 # Services endpoints
 @api_router.get("/services")
-async def get_services():
+async def get_services(if_none_match: Optional[str] = Header(None)):
     """Get all available services"""
-    return SERVICES
+    body, etag = service_catalog.list_response()
+    return catalog_response(body, etag, if_none_match)
 
 @api_router.get("/services/{service_id}")
-async def get_service(service_id: str):
+async def get_service(service_id: str, if_none_match: Optional[str] = Header(None)):
     """Get specific service details"""
-    service = next((s for s in SERVICES if s["id"] == service_id), None)
-    if not service:
+    cached = service_catalog.service_response(service_id)
+    if not cached:
         raise HTTPException(status_code=404, detail="Service not found")
-    return service
+    return catalog_response(*cached, if_none_match)
 
 # Document endpoints
+def decode_data_url(file_data: str, validate: bool = True):
+    """
+    Split a base64 payload (optionally a data: URL) into (content_type, bytes).
+    validate=False tolerates stray characters in rows stored before uploads were checked.
+    """
+    content_type = "application/octet-stream"
+    if file_data.startswith("data:"):
+        header, _, file_data = file_data.partition(",")
+        content_type = header[len("data:"):].split(";")[0] or content_type
+    return content_type, base64.b64decode(file_data, validate=validate)
+
+# Request body ceiling for uploads: base64 inflates by 4/3, plus room for the
+# multipart boundaries or JSON envelope around the file
+MAX_UPLOAD_BODY_BYTES = MAX_UPLOAD_BYTES * 4 // 3 + 64 * 1024
+UPLOAD_TOO_LARGE = f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit"
+
+async def read_limited_body(request: Request, limit: int) -> bytes:
+    """Read the request body, giving up with 413 as soon as it passes limit bytes"""
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE)
+    return bytes(body)
+
+async def iter_bytes(data: bytes, chunk_size: int):
+    for offset in range(0, len(data), chunk_size):
+        yield data[offset:offset + chunk_size]
+
 @api_router.post("/documents")
-async def create_document(document: DocumentCreate, user_id: str = Depends(get_current_user)):
-    """Upload a document"""
+async def create_document(request: Request, user_id: str = Depends(get_current_user)):
+    """
+    Upload a document.
+    Preferred: multipart/form-data with "name", "type" and "file" fields, streamed to the blob store.
+    Legacy: JSON body with base64 "file_data".
+    Content already stored (same SHA-256) is reused instead of written again.
+    Images are compressed and thumbnailed in the background after the response.
+    Omit "type" (or send "auto") to have the document classified in the background.
+    Files over MAX_UPLOAD_BYTES are rejected with 413 before anything is stored.
+    """
+    declared_length = request.headers.get("content-length", "")
+    if declared_length.isdigit() and int(declared_length) > MAX_UPLOAD_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE)
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        doc_type = form.get("type") or AUTO_TYPE
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=422, detail="Multipart upload requires a 'file' field")
+        name = form.get("name") or upload.filename or "document"
+        content_type = upload.content_type or "application/octet-stream"
+        try:
+            info = await document_store.put(upload, name, content_type, scope=user_id)
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE)
+        finally:
+            await upload.close()
+    else:
+        body = await read_limited_body(request, MAX_UPLOAD_BODY_BYTES)
+        try:
+            document = DocumentCreate(**json.loads(body))
+        except (ValueError, TypeError, ValidationError):
+            raise HTTPException(status_code=422, detail="Invalid document payload")
+        name, doc_type = document.name, document.type
+        try:
+            content_type, data = decode_data_url(document.file_data)
+        except (binascii.Error, ValueError):
+            raise HTTPException(status_code=422, detail="file_data is not valid base64")
+        if not data:
+            raise HTTPException(status_code=422, detail="file_data is empty")
+        if len(data) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE)
+        info = await document_store.put(BytesSource(data), name, content_type, scope=user_id)
+
     doc = Document(
         user_id=user_id,
-        name=document.name,
-        type=document.type,
-        file_data=document.file_data,
-        auto_tagged=True  # Mock auto-tagging
+        name=name,
+        type=doc_type,
+        blob_id=info.blob_id,
+        content_hash=info.content_hash,
+        # The upload's own type, unless the shared bytes were already re-encoded
+        content_type=info.content_type,
+        size=info.length
     )
+    await user_stats.ensure(db, user_id)
     await db.documents.insert_one(doc.dict())
+    await user_stats.increment(db, user_id, documents=1)
+    document_tagger.enqueue(doc.id)
+    if info.content_type.startswith("image/"):
+        image_processor.enqueue(info.content_hash)
     return doc
 
-@api_router.get("/documents", response_model=List[Document])
-async def get_documents(user_id: str = Depends(get_current_user)):
-    """Get all user documents"""
-    documents = await db.documents.find({"user_id": user_id}).to_list(1000)
-    return [Document(**doc) for doc in documents]
+@api_router.get("/documents", response_model=List[DocumentSummary])
+async def get_documents(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    List user documents newest first, metadata only.
+    When more documents exist the next page cursor is returned in the X-Next-Cursor header.
+    """
+    try:
+        query = keyset_filter({"user_id": user_id}, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await list_db.documents.find(query, DOCUMENT_SUMMARY_PROJECTION).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    page, next_cursor = split_page(rows, limit)
+    return fast_json_response(with_defaults(page, DOCUMENT_SUMMARY_DEFAULTS), headers=cursor_headers(next_cursor))
 
 @api_router.get("/documents/{document_id}")
 async def get_document(document_id: str, user_id: str = Depends(get_current_user)):
@@ -356,72 +622,476 @@ async def get_document(document_id: str, user_id: str = Depends(get_current_user
         raise HTTPException(status_code=404, detail="Document not found")
     return Document(**document)
 
+@api_router.get("/documents/{document_id}/content")
+async def get_document_content(
+    document_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    user_id: str = Depends(get_current_user)
+):
+    """Stream the document bytes, honouring single "Range: bytes=" requests"""
+    document = await db.documents.find_one(
+        {"id": document_id, "user_id": user_id},
+        {"blob_id": 1, "content_hash": 1, "content_type": 1, "file_data": 1}
+    )
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    # Shared content is resolved through its ref, which always names the current blob
+    ref = await document_store.get_ref(document["content_hash"]) if document.get("content_hash") else None
+    blob_id = ref["blob_id"] if ref else document.get("blob_id")
+    if blob_id:
+        try:
+            info = await blob_store.stat(blob_id)
+        except BlobNotFound:
+            raise HTTPException(status_code=404, detail="Document content not found")
+        if ref and is_reencoded(ref):
+            media_type = ref["content_type"]
+        else:
+            media_type = document.get("content_type") or info.content_type
+        length = info.length
+        legacy_data = None
+    elif document.get("file_data"):
+        media_type, legacy_data = decode_data_url(document["file_data"], validate=False)
+        length = len(legacy_data)
+    else:
+        raise HTTPException(status_code=404, detail="Document content not found")
+
+    try:
+        byte_range = parse_range(range_header, length)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{length}"})
+
+    headers = {"Accept-Ranges": "bytes"}
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    else:
+        start, end = 0, length - 1
+        status_code = 200
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+
+    if legacy_data is not None:
+        body = iter_bytes(legacy_data[start:end + 1], blob_store.chunk_size)
+    else:
+        body = blob_store.open(blob_id, start, end)
+    return StreamingResponse(body, status_code=status_code, media_type=media_type, headers=headers)
+
+@api_router.get("/documents/{document_id}/thumbnail")
+async def get_document_thumbnail(
+    document_id: str,
+    size: str = Query("small", pattern="^(small|medium)$"),
+    user_id: str = Depends(get_current_user)
+):
+    """Thumbnail for image documents; 404 for PDFs and until background processing has finished"""
+    document = await db.documents.find_one({"id": document_id, "user_id": user_id}, {"content_hash": 1})
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    ref = await document_store.get_ref(document["content_hash"]) if document.get("content_hash") else None
+    thumbnail = (ref or {}).get("thumbnails", {}).get(size)
+    if not thumbnail:
+        raise HTTPException(status_code=404, detail="Thumbnail not available")
+    headers = {
+        "Content-Length": str(thumbnail["length"]),
+        # Thumbnails of a given content hash never change
+        "Cache-Control": "private, max-age=86400",
+    }
+    return StreamingResponse(
+        blob_store.open(thumbnail["blob_id"]), media_type=thumbnail["content_type"], headers=headers
+    )
+
+@api_router.patch("/documents/{document_id}")
+async def update_document(update: DocumentUpdate, document_id: str, user_id: str = Depends(get_current_user)):
+    """
+    Set a document's type, e.g. for uploads the classifier could not recognize.
+    Accepts the document types the service catalog asks for, or "other".
+    """
+    if update.type != OTHER_TYPE and update.type not in service_catalog.document_types():
+        raise HTTPException(status_code=422, detail=f"Unknown document type '{update.type}'")
+    document = await db.documents.find_one_and_update(
+        {"id": document_id, "user_id": user_id},
+        # Not auto-tagged any more; a classifier still running only records its suggestion
+        {"$set": {"type": update.type, "auto_tagged": False}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return Document(**document)
+
 @api_router.delete("/documents/{document_id}")
 async def delete_document(document_id: str, user_id: str = Depends(get_current_user)):
     """Delete a document"""
-    result = await db.documents.delete_one({"id": document_id, "user_id": user_id})
-    if result.deleted_count == 0:
+    await user_stats.ensure(db, user_id)
+    document = await db.documents.find_one_and_delete(
+        {"id": document_id, "user_id": user_id},
+        projection={"blob_id": 1, "content_hash": 1}
+    )
+    if not document:
         raise HTTPException(status_code=404, detail="Document not found")
+    await user_stats.increment(db, user_id, documents=-1)
+    if document.get("content_hash"):
+        await document_store.release(document["content_hash"])
+    elif document.get("blob_id"):
+        # Uploaded before content addressing: the blob is not shared
+        try:
+            await blob_store.delete(document["blob_id"])
+        except BlobNotFound:
+            logger.warning(f"Blob {document['blob_id']} for document {document_id} was already gone")
     return {"message": "Document deleted successfully"}
 
 # Service Application endpoints
+# Every application goes to a listed center; DEFAULT_CENTER_ID when the client picks none
+center_directory = create_center_directory()
+
+async def finish_submission(row: dict) -> None:
+    """
+    Write the notification and counters of an application stored without a
+    transaction. Safe to repeat: the notification id is fixed and clearing the
+    pending marker claims the counter update, so it is applied at most once.
+    """
+    notification = row["pending_notification"]
+    try:
+        await db.notifications.insert_one(dict(notification))
+    except DuplicateKeyError:
+        pass  # written by an earlier attempt
+    claimed = await critical_db.applications.update_one(
+        {"id": row["id"], "pending_notification": {"$exists": True}},
+        {"$unset": {"pending_notification": ""}}
+    )
+    if claimed.modified_count:
+        await user_stats.increment(
+            db, row["user_id"],
+            applications=1, fees_paid=row["fee"], notifications=1, unread_notifications=1
+        )
+        notification_feed.notify(notification)
+
+async def find_application_by_idempotency_key(user_id: str, idempotency_key: str):
+    existing = await db.applications.find_one({"user_id": user_id, "idempotency_key": idempotency_key})
+    if existing and "pending_notification" in existing:
+        # An earlier attempt stopped after storing the application; finish it
+        await finish_submission(existing)
+    return ServiceApplication(**existing) if existing else None
+
 @api_router.post("/applications")
-async def create_application(application: ServiceApplicationCreate, user_id: str = Depends(get_current_user)):
-    """Create a service application"""
+async def create_application(
+    application: ServiceApplicationCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Create a service application.
+    Send an Idempotency-Key header to make retries return the original application.
+    With transaction support the application, its notification and the counters
+    are written in one transaction (sequentially; cross-collection writes can't be
+    batched). Without it the application is written first, carrying its pending
+    notification, and a retry with the same key completes a partial submission.
+    """
+    if idempotency_key:
+        existing = await find_application_by_idempotency_key(user_id, idempotency_key)
+        if existing:
+            return existing
+
+    service = service_catalog.get(application.service_id)
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    if application.fee is not None and application.fee != service["fee"]:
+        raise HTTPException(status_code=400, detail="Fee does not match the service catalog")
+    try:
+        center_id = center_directory.resolve(application.center_id)
+    except UnknownCenter as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # One $in query confirms every referenced document belongs to the user
+    document_ids = list(dict.fromkeys(application.documents))
+    if document_ids:
+        owned = await db.documents.count_documents({"user_id": user_id, "id": {"$in": document_ids}})
+        if owned != len(document_ids):
+            raise HTTPException(status_code=400, detail="One or more documents were not found")
+
     app = ServiceApplication(
         user_id=user_id,
-        service_name=application.service_name,
-        service_id=application.service_id,
-        fee=application.fee,
-        documents=application.documents
+        service_name=service["name"],
+        service_id=service["id"],
+        fee=service["fee"],
+        documents=document_ids,
+        center_id=center_id,
+        priority=service.get("priority", 0)
     )
-    await db.applications.insert_one(app.dict())
+    app_row = app.dict()
+    if idempotency_key:
+        app_row["idempotency_key"] = idempotency_key
     
     # Create notification for user
     notification = NotificationMessage(
         user_id=user_id,
         title="Application Submitted",
-        message=f"Your {application.service_name} application has been submitted successfully. Application ID: {app.id}",
+        message=f"Your {app.service_name} application has been submitted successfully. Application ID: {app.id}",
         type="service_update"
     )
-    await db.notifications.insert_one(notification.dict())
+
+    async def write(session):
+        await user_stats.ensure(db, user_id, session=session)
+        if session is None:
+            pending_row = {**app_row, "pending_notification": notification.dict()}
+            await critical_db.applications.insert_one(pending_row)
+            await finish_submission(pending_row)
+            return None
+        await critical_db.applications.insert_one(app_row, session=session)
+        await db.notifications.insert_one(notification.dict(), session=session)
+        await user_stats.increment(
+            db, user_id, session=session,
+            applications=1, fees_paid=app.fee, notifications=1, unread_notifications=1
+        )
+        return notification.dict()
+
+    try:
+        committed_notification = await run_in_transaction(client, write)
+    except DuplicateKeyError:
+        # A concurrent retry with the same idempotency key won the race
+        existing = idempotency_key and await find_application_by_idempotency_key(user_id, idempotency_key)
+        if not existing:
+            raise
+        return existing
     
+    if committed_notification:
+        # Published only once the transaction has committed
+        notification_feed.notify(committed_notification)
     return app
 
+APPLICATION_PROJECTION = {"_id": 0, **{field: 1 for field in ServiceApplication.model_fields}}
+APPLICATION_DEFAULTS = model_defaults(ServiceApplication)
+
 @api_router.get("/applications", response_model=List[ServiceApplication])
 async def get_applications(user_id: str = Depends(get_current_user)):
     """Get all user applications"""
-    applications = await db.applications.find({"user_id": user_id}).to_list(1000)
-    return [ServiceApplication(**app) for app in applications]
+    applications = await list_db.applications.find({"user_id": user_id}, APPLICATION_PROJECTION).to_list(1000)
+    return fast_json_response(with_defaults(applications, APPLICATION_DEFAULTS))
+
+# Operator endpoints
+def operator_center(operator: dict) -> str:
+    if not operator.get("center_id"):
+        raise HTTPException(status_code=403, detail="Operator is not assigned to a center")
+    return operator["center_id"]
+
+async def transition_applications(transitions: List[ApplicationTransition], operator: dict):
+    result = await application_workflow.apply_transitions(
+        critical_db,
+        client,
+        [application_workflow.Transition(t.application_id, t.status, t.note) for t in transitions],
+        NotificationMessage,
+        operator_id=operator["id"],
+        # Operators only move their own center's applications; without a center, none
+        scope={"center_id": operator_center(operator)}
+    )
+    for notification in result.notifications:
+        notification_feed.notify(notification)
+    return result
+
+@api_router.post("/operator/applications/transitions")
+async def bulk_transition_applications(request: ApplicationBulkTransition, operator: dict = Depends(get_current_operator)):
+    """
+    Move many applications through the status workflow in one call (e.g. end-of-day processing).
+    Items that are unknown, not allowed by the workflow or changed concurrently are
+    reported in "failed"; the rest are applied and their applicants notified.
+    """
+    result = await transition_applications(request.transitions, operator)
+    return result.summary()
+
+@api_router.put("/operator/applications/{application_id}/status")
+async def update_application_status(
+    application_id: str,
+    request: ApplicationStatusUpdate,
+    operator: dict = Depends(get_current_operator)
+):
+    """Move a single application to a new status"""
+    transition = ApplicationTransition(application_id=application_id, status=request.status, note=request.note)
+    result = await transition_applications([transition], operator)
+    if result.failed:
+        reason = result.failed[0]["reason"]
+        if reason == "not_found":
+            raise HTTPException(status_code=404, detail="Application not found")
+        raise HTTPException(status_code=409, detail=reason)
+    return {"message": "Application status updated", "status": request.status}
+
+QUEUE_PROJECTION = {"_id": 0, "status_history": 0, "idempotency_key": 0, "pending_notification": 0}
+
+@api_router.get("/operator/queue", response_model=List[ServiceApplication])
+async def get_operator_queue(limit: int = Query(50, ge=1, le=200), operator: dict = Depends(get_current_operator)):
+    """Pending applications of the operator's center, highest priority then oldest first"""
+    rows = await db.applications.find(
+        {"center_id": operator_center(operator), "status": application_workflow.PENDING},
+        QUEUE_PROJECTION
+    ).sort(application_workflow.QUEUE_SORT).limit(limit).to_list(limit)
+    return fast_json_response(with_defaults(rows, APPLICATION_DEFAULTS))
+
+@api_router.post("/operator/queue/claim")
+async def claim_next_application(operator: dict = Depends(get_current_operator)):
+    """Take the next application off the center queue and start processing it; 204 when the queue is empty"""
+    application, notifications = await application_workflow.claim_next(
+        critical_db, client, operator_center(operator), operator["id"], NotificationMessage
+    )
+    if application is None:
+        return Response(status_code=204)
+    for notification in notifications:
+        notification_feed.notify(notification)
+    return ServiceApplication(**application)
 
 # Notifications endpoints
+NOTIFICATION_PROJECTION = {"_id": 0, **{field: 1 for field in NotificationMessage.model_fields}}
+
 @api_router.get("/notifications", response_model=List[NotificationMessage])
-async def get_notifications(user_id: str = Depends(get_current_user)):
-    """Get all user notifications"""
-    notifications = await db.notifications.find({"user_id": user_id}).sort("created_at", -1).to_list(1000)
-    return [NotificationMessage(**notif) for notif in notifications]
+async def get_notifications(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Get user notifications, newest first.
+    The next page cursor is returned in the X-Next-Cursor header.
+    """
+    try:
+        query = keyset_filter({"user_id": user_id}, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await list_db.notifications.find(query, NOTIFICATION_PROJECTION).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    page, next_cursor = split_page(rows, limit)
+    return fast_json_response(page, headers=cursor_headers(next_cursor))
+
+@api_router.post("/notifications/stream-ticket")
+async def create_stream_ticket(authorization: str = Header(None)):
+    """Short-lived ticket for opening /notifications/stream or /notifications/ws from a browser"""
+    try:
+        ticket = token_manager.issue_stream_ticket(get_bearer_token(authorization), STREAM_TICKET_TTL_SECONDS)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL_SECONDS}
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(grant: StreamGrant = Depends(get_stream_grant)):
+    """
+    Server-sent events: one "notification" event per new notification, plus keep-alive comments.
+    The stream ends once the access token behind it expires or is revoked, checked at least every heartbeat.
+    """
+    user_id = grant.user_id
+
+    async def events():
+        queue = notification_broker.subscribe(user_id)
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    message = None
+                if not token_manager.is_active(grant):
+                    break
+                if message is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: notification\ndata: {NotificationMessage(**message).model_dump_json()}\n\n"
+        finally:
+            notification_broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.websocket("/notifications/ws")
+async def notifications_websocket(websocket: WebSocket, ticket: Optional[str] = Query(None)):
+    """
+    WebSocket push: each new notification is sent as a JSON text frame.
+    Closed with 1008 once the access token behind it expires or is revoked.
+    """
+    try:
+        grant = verify_stream_credentials(ticket, websocket.headers.get("authorization"))
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    user_id = grant.user_id
+    await websocket.accept()
+    queue = notification_broker.subscribe(user_id)
+
+    async def wait_for_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    receiver = asyncio.create_task(wait_for_disconnect())
+    getter = None
+    try:
+        while True:
+            getter = getter or asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait(
+                {getter, receiver}, timeout=STREAM_HEARTBEAT_SECONDS, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiver in done:
+                break
+            if not token_manager.is_active(grant):
+                await websocket.close(code=1008)
+                break
+            if getter in done:
+                await websocket.send_text(NotificationMessage(**getter.result()).model_dump_json())
+                getter = None
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if getter is not None:
+            getter.cancel()
+        receiver.cancel()
+        notification_broker.unsubscribe(user_id, queue)
+
+@api_router.get("/notifications/unread-count")
+async def get_unread_notification_count(user_id: str = Depends(get_current_user)):
+    """Unread badge count, answered from the (user_id, read) index alone"""
+    unread = await db.notifications.count_documents({"user_id": user_id, "read": False})
+    return {"unread": unread}
+
+@api_router.post("/notifications/read")
+async def mark_notifications_read(request: NotificationBulkRead, user_id: str = Depends(get_current_user)):
+    """Mark several notifications as read in one update, by id list or everything up to a timestamp"""
+    if (request.ids is None) == (request.before is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of 'ids' or 'before'")
+    query = {"user_id": user_id, "read": False}
+    if request.ids is not None:
+        query["id"] = {"$in": request.ids}
+    else:
+        before = request.before
+        if before.tzinfo:
+            # Stored timestamps are naive UTC
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+        query["created_at"] = {"$lte": before}
+    await user_stats.ensure(db, user_id)
+    result = await db.notifications.update_many(query, {"$set": {"read": True}})
+    if result.modified_count:
+        await user_stats.increment(db, user_id, unread_notifications=-result.modified_count)
+    return {"message": "Notifications marked as read", "updated": result.modified_count}
 
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, user_id: str = Depends(get_current_user)):
     """Mark notification as read"""
+    await user_stats.ensure(db, user_id)
+    # Only an unread -> read transition changes the unread counter
     result = await db.notifications.update_one(
-        {"id": notification_id, "user_id": user_id},
+        {"id": notification_id, "user_id": user_id, "read": False},
         {"$set": {"read": True}}
     )
-    if result.matched_count == 0:
+    if result.modified_count:
+        await user_stats.increment(db, user_id, unread_notifications=-1)
+    elif not await db.notifications.count_documents({"id": notification_id, "user_id": user_id}, limit=1):
         raise HTTPException(status_code=404, detail="Notification not found")
     return {"message": "Notification marked as read"}
 
 # Analytics endpoints
-@api_router.get("/analytics/savings")
-async def get_user_savings(user_id: str = Depends(get_current_user)):
-    """Get user savings analytics"""
-    applications = await db.applications.find({"user_id": user_id}).to_list(1000)
-    
+def savings_summary(application_count: int) -> dict:
     # Calculate mock savings
-    time_saved = len(applications) * 2  # 2 hours per application
-    money_saved = len(applications) * 50  # ₹50 per application
-    visits_avoided = len(applications)  # 1 visit per application
+    time_saved = application_count * 2  # 2 hours per application
+    money_saved = application_count * 50  # ₹50 per application
+    visits_avoided = application_count  # 1 visit per application
     
     return {
         "time_saved": f"{time_saved}h",
@@ -429,6 +1099,19 @@ async def get_user_savings(user_id: str = Depends(get_current_user)):
         "visits_avoided": visits_avoided
     }
 
+@api_router.get("/analytics/savings")
+async def get_user_savings(user_id: str = Depends(get_current_user)):
+    """Get user savings analytics"""
+    stats = await user_stats.get_stats(db, user_id)
+    return {**savings_summary(stats["applications"]), "fees_paid": stats["fees_paid"]}
+
+@api_router.get("/dashboard/summary")
+async def get_dashboard_summary(user_id: str = Depends(get_current_user)):
+    """Counters and savings for the home dashboard, served from the materialized user stats"""
+    # Primary, never list_db: a missing document is rebuilt from these reads and written back
+    stats = await user_stats.get_stats(db, user_id)
+    return {**stats, **savings_summary(stats["applications"])}
+
 # Payment endpoints (mock)
 @api_router.post("/payments/process")
 async def process_payment(payment_data: dict, user_id: str = Depends(get_current_user)):
@@ -441,23 +1124,36 @@ async def process_payment(payment_data: dict, user_id: str = Depends(get_current
         "message": "Payment processed successfully"
     }
 
+PAYMENT_HISTORY_PROJECTION = {"_id": 0, "id": 1, "service_name": 1, "fee": 1, "created_at": 1}
+
 @api_router.get("/payments/history")
-async def get_payment_history(user_id: str = Depends(get_current_user)):
-    """Get payment history"""
-    applications = await db.applications.find({"user_id": user_id}).to_list(1000)
+async def get_payment_history(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Get payment history, newest first.
+    The next page cursor is returned in the X-Next-Cursor header.
+    """
+    try:
+        query = keyset_filter({"user_id": user_id}, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await list_db.applications.find(query, PAYMENT_HISTORY_PROJECTION).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    page, next_cursor = split_page(rows, limit)
     
-    # Mock payment history
-    history = []
-    for app in applications:
-        history.append({
-            "id": str(uuid.uuid4()),
+    # One payment per application, identified by the application id so it is stable across calls
+    return fast_json_response([
+        {
+            "id": app["id"],
             "service": app["service_name"],
             "amount": app["fee"],
             "date": app["created_at"].strftime("%d/%m/%Y"),
             "status": "Completed"
-        })
-    
-    return history
+        }
+        for app in page
+    ], headers=cursor_headers(next_cursor))
 
 # Root endpoint
 @api_router.get("/")
@@ -481,6 +1177,53 @@ logger.info(f"📊 Environment: {os.getenv('NODE_ENV', 'development')}")
 logger.info(f"🔒 Security modules: {'enabled' if PRODUCTION_MODULES_AVAILABLE else 'disabled'}")
 logger.info(f"📱 SMS service: {'configured' if sms_service and sms_service.is_production else 'development mode'}")
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# Several workers only act as one API when state is shared and secrets agree
+check_deployment(
+    adapters={
+        "OTP_STORE": otp_store,
+        "CACHE_BACKEND": profile_cache.backend,
+        "RATE_LIMIT_BACKEND": rate_limiter.backend if rate_limiter else None,
+    },
+    secrets={
+        "JWT_SECRET (or JWT_SIGNING_KEYS)": bool(os.getenv('JWT_SECRET') or os.getenv('JWT_SIGNING_KEYS')),
+        "SESSION_SECRET (or JWT_SECRET)": SESSION_SECRET_CONFIGURED,
+    },
+    # Applications without a center would sit in no operator's queue
+    required={"DEFAULT_CENTER_ID": bool(center_directory.default_center_id)}
+)
+
+background_tasks = []
+
+async def start_background_services():
+    await bootstrap_indexes(db)
+    moved = await center_directory.backfill(critical_db)
+    if moved:
+        logger.info(f"Routed {moved} applications without a center to {center_directory.default_center_id}")
+    if os.getenv('SERVICE_CATALOG_SOURCE', 'builtin').lower() != 'builtin':
+        interval = float(os.getenv('SERVICE_CATALOG_REFRESH_SECONDS', 60))
+        if interval > 0:
+            background_tasks.append(asyncio.create_task(service_catalog.watch(db, interval)))
+        else:
+            await service_catalog.refresh(db)
+    interval = float(os.getenv('JWT_REVOCATION_SYNC_SECONDS', 30))
+    background_tasks.append(asyncio.create_task(token_manager.revocations.watch(interval)))
+    await notification_feed.start(db)
+    if notification_feed.mode == "local" and worker_count() > 1:
+        logger.warning("Without change streams, live notifications only reach clients connected to the worker that wrote them")
+    if sms_service:
+        await sms_service.start()
+    await image_processor.start()
+    await document_tagger.start()
+    if health_monitor:
+        await health_monitor.start()
+
+async def stop_background_services():
+    if sms_service:
+        await sms_service.stop()
+    if health_monitor:
+        await health_monitor.stop()
+    await notification_feed.stop()
+    await image_processor.stop()
+    await document_tagger.stop()
+    for task in background_tasks:
+        task.cancel()
@@ -0,0 +1,229 @@
+"""
+Service application status workflow
+Applications move through
+
+    pending -> processing -> completed
+       |            |
+       +------------+-----> rejected
+
+and every accepted transition notifies the applicant. Transitions are applied
+in bulk: one bulk_write for the applications, one insert_many for the
+notifications and one bulk_write for the per-user counters, all inside a
+transaction where the server supports it.
+"""
+import uuid
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from database.transactions import run_in_transaction
+from services import user_stats
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+PROCESSING = "processing"
+COMPLETED = "completed"
+REJECTED = "rejected"
+STATUSES = (PENDING, PROCESSING, COMPLETED, REJECTED)
+
+TRANSITIONS: Dict[str, frozenset] = {
+    PENDING: frozenset({PROCESSING, REJECTED}),
+    # Back to pending when a center hands the application back to the queue
+    PROCESSING: frozenset({PENDING, COMPLETED, REJECTED}),
+    COMPLETED: frozenset(),
+    REJECTED: frozenset(),
+}
+
+STATUS_MESSAGES = {
+    PENDING: ("Application Returned to Queue", "Your {service_name} application {id} is waiting to be processed."),
+    PROCESSING: ("Application In Progress", "Your {service_name} application {id} is being processed."),
+    COMPLETED: ("Application Completed", "Your {service_name} application {id} has been completed."),
+    REJECTED: ("Application Rejected", "Your {service_name} application {id} was rejected."),
+}
+
+MAX_BATCH = 5000
+
+
+def can_transition(current: str, target: str) -> bool:
+    return target in TRANSITIONS.get(current, ())
+
+
+@dataclass
+class Transition:
+    application_id: str
+    status: str
+    note: Optional[str] = None
+
+
+@dataclass
+class TransitionResult:
+    updated: List[str] = field(default_factory=list)
+    failed: List[dict] = field(default_factory=list)
+    notifications: List[dict] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        return {"updated": len(self.updated), "failed": self.failed}
+
+
+def _message(application: dict, status: str, note: Optional[str]) -> Dict[str, str]:
+    title, template = STATUS_MESSAGES[status]
+    message = template.format(service_name=application.get("service_name", "service"), id=application["id"])
+    if note:
+        message = f"{message} {note}"
+    return {"title": title, "message": message}
+
+
+def _history_entry(current: str, target: str, at: datetime, operator_id: Optional[str], note: Optional[str]) -> dict:
+    return {"from": current, "to": target, "at": at, "by": operator_id, "note": note}
+
+
+async def _notify_applicants(db, moves: List[tuple], notification_factory, session=None) -> List[dict]:
+    """Insert one notification per (application row, new status, note) and bump the counters"""
+    notifications = []
+    deltas: Dict[str, Dict[str, int]] = {}
+    for row, status, note in moves:
+        notifications.append(notification_factory(
+            user_id=row["user_id"],
+            type="service_update",
+            **_message(row, status, note)
+        ).model_dump())
+        counters = deltas.setdefault(row["user_id"], {"notifications": 0, "unread_notifications": 0})
+        counters["notifications"] += 1
+        counters["unread_notifications"] += 1
+    if notifications:
+        await user_stats.ensure_many(db, deltas, session=session)
+        # insert_many mutates its input with _id; keep the originals clean for publishing
+        await db.notifications.insert_many([dict(n) for n in notifications], ordered=False, session=session)
+        await user_stats.increment_many(db, deltas, session=session)
+    return notifications
+
+
+async def apply_transitions(
+    db,
+    client,
+    transitions: List[Transition],
+    notification_factory: Callable[..., object],
+    operator_id: Optional[str] = None,
+    scope: Optional[dict] = None
+) -> TransitionResult:
+    """
+    Validate and apply a batch of status changes.
+    `scope` restricts which applications may be touched (e.g. one center's).
+    Each row is only updated if its status is still the one it was validated
+    against, so a concurrent change makes that item fail instead of skipping
+    a workflow step.
+    """
+    result = TransitionResult()
+    requested: Dict[str, Transition] = {}
+    for transition in transitions:
+        # Last entry wins when the same application appears twice
+        requested[transition.application_id] = transition
+
+    rows = await db.applications.find(
+        {**(scope or {}), "id": {"$in": list(requested)}},
+        {"_id": 0, "id": 1, "user_id": 1, "status": 1, "service_name": 1}
+    ).to_list(None)
+    current = {row["id"]: row for row in rows}
+
+    batch_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    operations, operation_ids = [], []
+    for application_id, transition in requested.items():
+        row = current.get(application_id)
+        if row is None:
+            result.failed.append({"application_id": application_id, "reason": "not_found"})
+            continue
+        if not can_transition(row["status"], transition.status):
+            result.failed.append({
+                "application_id": application_id,
+                "reason": f"invalid_transition: {row['status']} -> {transition.status}"
+            })
+            continue
+        update = {"status": transition.status, "status_updated_at": now, "last_transition": batch_id}
+        if transition.status == PENDING:
+            # Handed back to the center queue; any operator may claim it again
+            update["assigned_operator"] = None
+        operation_ids.append(application_id)
+        operations.append(UpdateOne(
+            {**(scope or {}), "id": application_id, "status": row["status"]},
+            {
+                "$set": update,
+                "$push": {"status_history": _history_entry(row["status"], transition.status, now, operator_id, transition.note)}
+            }
+        ))
+    if not operations:
+        return result
+
+    async def write(session):
+        write_result = await db.applications.bulk_write(operations, ordered=False, session=session)
+        if write_result.modified_count == len(operations):
+            updated_ids = list(operation_ids)
+        else:
+            # Some rows changed status concurrently; find the ones this batch actually moved
+            moved = await db.applications.find(
+                {"id": {"$in": operation_ids}, "last_transition": batch_id},
+                {"_id": 0, "id": 1},
+                session=session
+            ).to_list(None)
+            updated_ids = [row["id"] for row in moved]
+
+        moves = [
+            (current[application_id], requested[application_id].status, requested[application_id].note)
+            for application_id in updated_ids
+        ]
+        notifications = await _notify_applicants(db, moves, notification_factory, session)
+        return updated_ids, notifications
+
+    updated_ids, notifications = await run_in_transaction(client, write)
+    result.updated = updated_ids
+    result.notifications = notifications
+    moved = set(updated_ids)
+    for application_id in operation_ids:
+        if application_id not in moved:
+            result.failed.append({"application_id": application_id, "reason": "conflict"})
+    logger.info(f"Status batch {batch_id}: {len(updated_ids)} updated, {len(result.failed)} failed")
+    return result
+
+
+# Center work queue: pending applications of one center, most urgent first
+QUEUE_SORT = [("priority", -1), ("created_at", 1)]
+
+
+async def claim_next(
+    db,
+    client,
+    center_id: str,
+    operator_id: str,
+    notification_factory: Callable[..., object]
+) -> Tuple[Optional[dict], List[dict]]:
+    """
+    Atomically take the next pending application of a center and move it to
+    processing for this operator. find_one_and_update picks and updates in one
+    server-side step, so two operators can never claim the same application.
+    Returns (application, notifications) or (None, []) when the queue is empty.
+    """
+    from pymongo import ReturnDocument
+
+    async def write(session):
+        now = datetime.utcnow()
+        application = await db.applications.find_one_and_update(
+            {"center_id": center_id, "status": PENDING},
+            {
+                "$set": {"status": PROCESSING, "status_updated_at": now, "assigned_operator": operator_id},
+                "$push": {"status_history": _history_entry(PENDING, PROCESSING, now, operator_id, None)}
+            },
+            sort=QUEUE_SORT,
+            projection={"_id": 0, "status_history": 0},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if application is None:
+            return None, []
+        notifications = await _notify_applicants(db, [(application, PROCESSING, None)], notification_factory, session)
+        return application, notifications
+
+    return await run_in_transaction(client, write)
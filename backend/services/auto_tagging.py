@@ -0,0 +1,339 @@
+"""
+Document auto-tagging
+Classifies uploads into the document types the service catalog asks for
+(`required_documents[].type`). Runs entirely on CPU and off the request path:
+uploads are queued, claimed in batches and scored in a process pool by a
+keyword matcher over the file name and extracted PDF text, plus a few
+OCR-free heuristics (ID number patterns, passport-photo proportions).
+
+Each Document row tracks its progress in `tagging_status`:
+pending -> processing -> tagged | unrecognized | failed
+Uploads left as "auto" by an unrecognized or failed run fall back to "other",
+so the internal sentinel never outlives the tagging run.
+"""
+import io
+import os
+import re
+import uuid
+import asyncio
+import logging
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from services.storage import BlobNotFound
+
+try:
+    from pypdf import PdfReader
+    PDF_TEXT_AVAILABLE = True
+except ImportError:
+    PDF_TEXT_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Uploads with this type are classified and re-typed; any other type is kept
+# and the classifier's opinion is only recorded as suggested_type.
+AUTO_TYPE = "auto"
+# For documents that match none of the catalog types: set by the owner, or by
+# the tagger when it cannot classify an "auto" upload
+OTHER_TYPE = "other"
+
+# Phrases typical of each document type issued in Kerala. Types that only
+# exist in a custom catalog are matched on their catalog name/description.
+KEYWORDS: Dict[str, List[str]] = {
+    "address_proof": [
+        "electricity bill", "kseb", "water bill", "kerala water authority", "rental agreement",
+        "rent agreement", "consumer number", "consumer no", "kwh", "tenancy", "building tax", "address proof",
+    ],
+    "identity_proof": [
+        "aadhaar", "aadhar", "uidai", "unique identification", "voter id", "election commission",
+        "electors photo identity", "epic", "pan card", "permanent account number", "driving licence",
+        "driving license", "identity card", "identity proof",
+    ],
+    "income_certificate": [
+        "income certificate", "annual income", "village officer", "tahsildar", "revenue department",
+    ],
+    "passport_photo": ["passport photo", "passport size", "photograph", "photo"],
+    "medical_certificate": [
+        "hospital", "medical certificate", "discharge summary", "birth record", "date of delivery",
+        "medical officer", "doctor",
+    ],
+    "salary_certificate": [
+        "salary certificate", "salary", "pay slip", "payslip", "gross pay", "net pay", "basic pay",
+        "employer", "designation",
+    ],
+    "family_certificate": [
+        "family certificate", "family register", "family members", "relationship certificate",
+        "legal heir", "ration card",
+    ],
+    "age_proof": [
+        "sslc", "secondary school leaving", "school leaving certificate", "date of birth",
+        "birth certificate", "age proof",
+    ],
+}
+
+PATTERNS = {
+    # Aadhaar: 12 digits in groups of four; EPIC: three letters and seven digits
+    "identity_proof": [re.compile(r"\b\d{4}\s\d{4}\s\d{4}\b"), re.compile(r"\b[a-z]{3}\d{7}\b")],
+}
+
+FILENAME_WEIGHT = 2.0
+PDF_PAGES = 3
+STOPWORDS = {"or", "and", "any", "the", "of", "from", "by", "issued", "current", "recent", "certificate", "proof"}
+
+
+def build_profiles(document_types: Dict[str, str]) -> Dict[str, List[str]]:
+    """Keyword list per catalog document type: built-in phrases plus words from the catalog text"""
+    profiles = {}
+    for doc_type, text in document_types.items():
+        words = [w for w in re.findall(r"[a-z]+", text.lower()) if len(w) > 3 and w not in STOPWORDS]
+        profiles[doc_type] = sorted(set(KEYWORDS.get(doc_type, [])) | set(words))
+    return profiles
+
+
+def _normalize(text: str) -> str:
+    return " " + " ".join(re.findall(r"[a-z0-9]+", text.lower())) + " "
+
+
+def _pdf_text(data: bytes) -> str:
+    if not PDF_TEXT_AVAILABLE:
+        return ""
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        return " ".join(page.extract_text() or "" for page in reader.pages[:PDF_PAGES])
+    except Exception:
+        return ""
+
+
+def _looks_like_passport_photo(data: bytes) -> bool:
+    """Portrait, roughly 35x45mm proportions and not a full-page scan"""
+    if not PILLOW_AVAILABLE:
+        return False
+    try:
+        width, height = Image.open(io.BytesIO(data)).size
+    except Exception:
+        return False
+    return height > width and 0.7 <= width / height <= 0.85 and width * height <= 1200 * 1600
+
+
+def classify(job: dict, profiles: Dict[str, List[str]]) -> dict:
+    """Score one document against every profile; returns {id, label, confidence}"""
+    name_text = _normalize(job.get("name", ""))
+    body_text = ""
+    if job.get("content_type") == "application/pdf" and job.get("data"):
+        body_text = _normalize(_pdf_text(job["data"]))
+
+    scores = {}
+    for doc_type, phrases in profiles.items():
+        score = 0.0
+        for phrase in phrases:
+            needle = f" {phrase} "
+            score += FILENAME_WEIGHT * name_text.count(needle) + body_text.count(needle)
+        for pattern in PATTERNS.get(doc_type, []):
+            if pattern.search(body_text):
+                score += 3.0
+        scores[doc_type] = score
+
+    if "passport_photo" in scores and job.get("content_type", "").startswith("image/") and job.get("data"):
+        if _looks_like_passport_photo(job["data"]):
+            scores["passport_photo"] += 3.0
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if not ranked or ranked[0][1] <= 0:
+        return {"id": job["id"], "label": None, "confidence": 0.0}
+    best_type, best = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    # Margin over the runner-up, squashed into [0, 1)
+    confidence = (best - runner_up) / (best + 1.0)
+    return {"id": job["id"], "label": best_type, "confidence": round(confidence, 3)}
+
+
+def classify_batch(jobs: List[dict], profiles: Dict[str, List[str]]) -> List[dict]:
+    """Runs in a worker process: one executor round-trip per batch"""
+    results = []
+    for job in jobs:
+        try:
+            results.append(classify(job, profiles))
+        except Exception as e:
+            results.append({"id": job["id"], "error": str(e)})
+    return results
+
+
+class DocumentTagger:
+    CLAIM_TIMEOUT = timedelta(minutes=10)
+
+    def __init__(
+        self,
+        db,
+        blob_store,
+        catalog,
+        workers: int = 1,
+        batch_size: int = 16,
+        batch_wait: float = 0.2,
+        min_confidence: float = 0.2,
+        max_bytes: int = 10 * 1024 * 1024
+    ):
+        self.db = db
+        self.blob_store = blob_store
+        self.catalog = catalog
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.min_confidence = min_confidence
+        self.max_bytes = max_bytes
+        self.queue: Optional[asyncio.Queue] = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._tasks = []
+
+    async def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        if not PDF_TEXT_AVAILABLE:
+            logger.warning("pypdf not installed - documents are tagged from their file names only")
+        self.queue = asyncio.Queue()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self.recover()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def enqueue(self, document_id: str) -> None:
+        if self._tasks:
+            self.queue.put_nowait(document_id)
+
+    async def recover(self, limit: int = 1000) -> None:
+        """Re-queue documents left pending, or stuck in processing, by a restart"""
+        stale = datetime.utcnow() - self.CLAIM_TIMEOUT
+        # Rows finished before unclassified uploads fell back to "other"
+        await self.db.documents.update_many(
+            {"tagging_status": {"$in": ["unrecognized", "failed"]}, "type": AUTO_TYPE},
+            {"$set": {"type": OTHER_TYPE}}
+        )
+        await self.db.documents.update_many(
+            {"tagging_status": "processing", "tagging_started_at": {"$lt": stale}},
+            {"$set": {"tagging_status": "pending"}, "$unset": {"tagging_claim": ""}}
+        )
+        async for doc in self.db.documents.find({"tagging_status": "pending"}, {"id": 1}).limit(limit):
+            self.queue.put_nowait(doc["id"])
+
+    async def _next_batch(self) -> List[str]:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            # Not asyncio.wait_for: before Python 3.12 it can swallow a cancel that
+            # arrives together with the item, and stop() then waits forever
+            getter = asyncio.ensure_future(self.queue.get())
+            try:
+                done, _ = await asyncio.wait({getter}, timeout=timeout)
+            finally:
+                if not getter.done():
+                    getter.cancel()
+            if not done:
+                break
+            batch.append(getter.result())
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.process(batch)
+            except Exception as e:
+                logger.error(f"Auto-tagging batch of {len(batch)} failed: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _claim(self, document_ids: List[str]) -> List[dict]:
+        """Atomically move pending documents to processing; other workers skip them"""
+        claim = uuid.uuid4().hex
+        await self.db.documents.update_many(
+            {"tagging_status": "pending", "id": {"$in": document_ids}},
+            {"$set": {"tagging_status": "processing", "tagging_claim": claim, "tagging_started_at": datetime.utcnow()}}
+        )
+        return await self.db.documents.find(
+            {"tagging_status": "processing", "tagging_claim": claim},
+            {"_id": 0, "id": 1, "name": 1, "type": 1, "blob_id": 1, "content_type": 1, "size": 1, "tagging_claim": 1}
+        ).to_list(None)
+
+    async def _load(self, doc: dict) -> dict:
+        job = {"id": doc["id"], "name": doc.get("name", ""), "content_type": doc.get("content_type", "")}
+        if not doc.get("blob_id") or doc.get("size", 0) > self.max_bytes:
+            return job
+        try:
+            job["data"] = await self.blob_store.read_all(doc["blob_id"])
+        except BlobNotFound:
+            # Image compression may have swapped the blob under us; read the new one
+            fresh = await self.db.documents.find_one(
+                {"tagging_claim": doc["tagging_claim"], "id": doc["id"]}, {"blob_id": 1}
+            )
+            if fresh and fresh.get("blob_id") != doc["blob_id"]:
+                job["data"] = await self.blob_store.read_all(fresh["blob_id"])
+        return job
+
+    async def process(self, document_ids: List[str]) -> None:
+        docs = await self._claim(document_ids)
+        if not docs:
+            return
+        jobs = await asyncio.gather(*(self._load(doc) for doc in docs))
+        profiles = build_profiles(self.catalog.document_types())
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.executor, classify_batch, jobs, profiles)
+
+        claims = {doc["id"]: doc["tagging_claim"] for doc in docs}
+        now = datetime.utcnow()
+        operations = []
+        for result in results:
+            selector = {"tagging_status": "processing", "tagging_claim": claims[result["id"]], "id": result["id"]}
+            if "error" in result:
+                logger.warning(f"Auto-tagging document {result['id']} failed: {result['error']}")
+                status_update = {"tagging_status": "failed"}
+            elif result["label"] and result["confidence"] >= self.min_confidence:
+                status_update = {"tagging_status": "tagged", "suggested_type": result["label"]}
+                # Documents uploaded without a type take the classifier's label
+                operations.append(UpdateOne(
+                    {**selector, "type": AUTO_TYPE},
+                    {"$set": {"type": result["label"], "auto_tagged": True}}
+                ))
+            else:
+                status_update = {"tagging_status": "unrecognized", "suggested_type": result.get("label")}
+            if status_update["tagging_status"] != "tagged":
+                # Nothing to assign: an "auto" upload falls back to "other"
+                operations.append(UpdateOne({**selector, "type": AUTO_TYPE}, {"$set": {"type": OTHER_TYPE}}))
+            status_update.update({"tag_confidence": result.get("confidence", 0.0), "tagged_at": now})
+            operations.append(UpdateOne(selector, {"$set": status_update, "$unset": {"tagging_claim": ""}}))
+        if operations:
+            # ordered: the type assignment must run before the claim is cleared
+            await self.db.documents.bulk_write(operations, ordered=True)
+
+
+def create_document_tagger(db, blob_store, catalog) -> DocumentTagger:
+    return DocumentTagger(
+        db,
+        blob_store,
+        catalog,
+        workers=int(os.getenv('TAGGING_WORKERS', 1)),
+        batch_size=int(os.getenv('TAGGING_BATCH_SIZE', 16)),
+        batch_wait=float(os.getenv('TAGGING_BATCH_WAIT_SECONDS', 0.2)),
+        min_confidence=float(os.getenv('TAGGING_MIN_CONFIDENCE', 0.2)),
+        max_bytes=int(os.getenv('TAGGING_MAX_BYTES', 10 * 1024 * 1024))
+    )
@@ -0,0 +1,154 @@
+"""
+Read-through caching for hot per-user reads
+ReadThroughCache wraps a loader (usually a Mongo lookup) with a cache
+backend keyed by user id. Values must be JSON-safe (dump models with
+mode="json"), so every backend can store them. Writers keep the cache
+coherent by calling set() with the new value or invalidate() after a change;
+TTLs bound staleness for rows changed outside the API.
+
+Backends, selected by CACHE_BACKEND:
+- memory: per-process LRU with TTL
+- redis:  shared by every worker, so an invalidation is seen everywhere
+          (tested against fakeredis as the local stand-in)
+"""
+import os
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from monitoring.metrics import cache_requests_total
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 300
+
+
+class CacheBackend:
+    """Interface implemented by every cache backend"""
+
+    is_shared = False  # True when all workers see the same entries
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Process-local LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # key -> (expires_at (monotonic), value); most recently used at the end
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shared cache on any Redis-protocol server (redis.asyncio client API)"""
+
+    is_shared = True
+
+    def __init__(self, redis, key_prefix: str = "cache:"):
+        self.redis = redis
+        self.key_prefix = key_prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.redis.get(self.key_prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self.redis.set(self.key_prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self.redis.delete(self.key_prefix + key)
+
+
+class ReadThroughCache:
+    def __init__(
+        self,
+        name: str,
+        backend: CacheBackend,
+        loader: Callable[[str], Awaitable[Optional[Any]]],
+        ttl: float = DEFAULT_TTL_SECONDS
+    ):
+        self.name = name
+        self.backend = backend
+        self.loader = loader
+        self.ttl = ttl
+        self._hits = cache_requests_total.labels(name, "hit")
+        self._misses = cache_requests_total.labels(name, "miss")
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached value, or load, store and return it; None (not cached) when the loader finds nothing"""
+        try:
+            value = await self.backend.get(self._key(key))
+        except Exception as e:
+            # A cache outage must not take reads down with it
+            logger.warning(f"Cache '{self.name}' read failed: {str(e)}")
+            value = None
+        if value is not None:
+            self._hits.inc()
+            return value
+        self._misses.inc()
+        value = await self.loader(key)
+        if value is not None:
+            await self.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """Write-through after the source of truth was updated"""
+        try:
+            await self.backend.set(self._key(key), value, self.ttl)
+        except Exception as e:
+            logger.warning(f"Cache '{self.name}' write failed: {str(e)}")
+
+    async def invalidate(self, key: str) -> None:
+        """Drop a cached value after the source of truth changed"""
+        try:
+            await self.backend.delete(self._key(key))
+        except Exception as e:
+            # The write it follows is already committed; the TTL bounds how long the stale copy lives
+            logger.warning(f"Cache '{self.name}' invalidation failed: {str(e)}")
+
+
+def create_cache_backend() -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND ("memory" or "redis")"""
+    backend = os.getenv('CACHE_BACKEND', 'memory').lower()
+    if backend == 'redis':
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        return RedisCacheBackend(aioredis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0')))
+    return MemoryCacheBackend(max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 10000)))
@@ -0,0 +1,123 @@
+"""
+Service catalog
+The catalog is indexed by id and serialized once per load, so list and
+detail requests only hand out pre-built bytes with a strong ETag. It can be
+reloaded from a JSON file or the `services` collection without a restart.
+"""
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _serialize(value) -> bytes:
+    # Same encoding as Starlette's JSONResponse
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against a strong ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixed tags also match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class CatalogSnapshot:
+    """Immutable view of one catalog version"""
+
+    def __init__(self, services: List[dict]):
+        self.services = services
+        self.by_id: Dict[str, dict] = {service["id"]: service for service in services}
+        self.list_body = _serialize(services)
+        self.list_etag = _etag(self.list_body)
+        self.bodies: Dict[str, Tuple[bytes, str]] = {}
+        for service in services:
+            body = _serialize(service)
+            self.bodies[service["id"]] = (body, _etag(body))
+        # Every document type any service asks for, with its human-readable text
+        self.document_types: Dict[str, str] = {}
+        for service in services:
+            for required in service.get("required_documents", []):
+                text = f"{required.get('name', '')} {required.get('description', '')}"
+                self.document_types[required["type"]] = f"{self.document_types.get(required['type'], '')} {text}".strip()
+
+
+class ServiceCatalog:
+    def __init__(self, services: List[dict]):
+        self.snapshot = CatalogSnapshot(services)
+        self._file_mtime: Optional[float] = None
+
+    def get(self, service_id: str) -> Optional[dict]:
+        return self.snapshot.by_id.get(service_id)
+
+    def list_response(self) -> Tuple[bytes, str]:
+        return self.snapshot.list_body, self.snapshot.list_etag
+
+    def service_response(self, service_id: str) -> Optional[Tuple[bytes, str]]:
+        return self.snapshot.bodies.get(service_id)
+
+    def document_types(self) -> Dict[str, str]:
+        return self.snapshot.document_types
+
+    def load(self, services: List[dict]) -> bool:
+        """Swap in a new catalog; returns True when its content changed"""
+        snapshot = CatalogSnapshot(services)
+        if snapshot.list_etag == self.snapshot.list_etag:
+            return False
+        # Single attribute assignment, so requests see either version, never a mix
+        self.snapshot = snapshot
+        logger.info(f"Service catalog reloaded ({len(services)} services)")
+        return True
+
+    def reload_from_file(self, path: str) -> bool:
+        """Reload from a JSON file containing a list of services, if it changed on disk"""
+        mtime = Path(path).stat().st_mtime
+        if mtime == self._file_mtime:
+            return False
+        with open(path, encoding="utf-8") as handle:
+            services = json.load(handle)
+        self._file_mtime = mtime
+        return self.load(services)
+
+    async def reload_from_db(self, db, collection: str = "services") -> bool:
+        """Reload from a Mongo collection, keeping documents in their stored order"""
+        services = await db[collection].find({}, {"_id": 0}).to_list(None)
+        if not services:
+            logger.warning(f"Service catalog collection '{collection}' is empty, keeping current catalog")
+            return False
+        return self.load(services)
+
+    async def refresh(self, db) -> bool:
+        """Reload from the source selected by SERVICE_CATALOG_SOURCE ("builtin", "file" or "mongo")"""
+        source = os.getenv('SERVICE_CATALOG_SOURCE', 'builtin').lower()
+        if source == 'file':
+            path = os.getenv('SERVICE_CATALOG_PATH')
+            if not path:
+                logger.warning("SERVICE_CATALOG_SOURCE=file but SERVICE_CATALOG_PATH is not set")
+                return False
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.reload_from_file, path)
+        if source == 'mongo':
+            return await self.reload_from_db(db)
+        return False
+
+    async def watch(self, db, interval: float) -> None:
+        """Background task: refresh the catalog every `interval` seconds"""
+        while True:
+            try:
+                await self.refresh(db)
+            except Exception as e:
+                logger.error(f"Service catalog refresh failed: {str(e)}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,45 @@
+"""
+Akshaya centers
+Every application is routed to the queue of exactly one center. CENTER_IDS
+lists the centers (comma-separated) and DEFAULT_CENTER_ID takes applications
+whose client picks none; it counts as listed. A client-supplied center_id is
+only accepted when it is listed, so a citizen cannot file into the queue of
+an arbitrary center.
+"""
+import os
+from typing import Iterable, Optional
+
+
+class UnknownCenter(ValueError):
+    """Raised for a center_id that is not one of the configured centers"""
+
+
+class CenterDirectory:
+    def __init__(self, center_ids: Iterable[str], default_center_id: Optional[str] = None):
+        self.default_center_id = default_center_id
+        self.center_ids = frozenset(center_ids) | ({default_center_id} if default_center_id else frozenset())
+
+    def resolve(self, center_id: Optional[str]) -> str:
+        """The center an application goes to: the client's choice if listed, else the default"""
+        if center_id is None:
+            if not self.default_center_id:
+                raise UnknownCenter("No center was chosen and DEFAULT_CENTER_ID is not set")
+            return self.default_center_id
+        if center_id not in self.center_ids:
+            raise UnknownCenter(f"Unknown center: {center_id}")
+        return center_id
+
+    async def backfill(self, db) -> int:
+        """Route applications stored without a center to the default one; returns how many moved"""
+        if not self.default_center_id:
+            return 0
+        # Matches both a missing field and an explicit null
+        result = await db.applications.update_many(
+            {"center_id": None}, {"$set": {"center_id": self.default_center_id}}
+        )
+        return result.modified_count
+
+
+def create_center_directory() -> CenterDirectory:
+    center_ids = [center.strip() for center in os.getenv('CENTER_IDS', '').split(',') if center.strip()]
+    return CenterDirectory(center_ids, os.getenv('DEFAULT_CENTER_ID') or None)
@@ -0,0 +1,79 @@
+"""
+Multi-worker deployment checks
+Several worker processes (gunicorn -c gunicorn.conf.py, or uvicorn --workers)
+only behave like one API when every piece of cross-request state lives in a
+shared backend and every secret is identical in all workers. The app calls
+check_deployment() at import time, so a misconfigured worker fails to boot
+instead of serving inconsistent logins, rate limits or cached profiles.
+Settings the API cannot run without at all fail the check in any mode.
+"""
+import os
+import sys
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessLocalStateError(RuntimeError):
+    """Raised when a multi-worker deployment is configured with per-process state"""
+
+
+class MissingSettingError(RuntimeError):
+    """Raised when a setting every deployment needs is not configured"""
+
+
+def _uvicorn_cli_workers(argv: List[str]) -> Optional[int]:
+    """--workers of a uvicorn command line; its worker processes are spawned with the parent's argv"""
+    program = argv[0] if argv else ""
+    if os.path.basename(program) != "uvicorn" and not program.endswith(os.path.join("uvicorn", "__main__.py")):
+        return None
+    for index, arg in enumerate(argv):
+        if arg == "--workers" and index + 1 < len(argv):
+            return int(argv[index + 1])
+        if arg.startswith("--workers="):
+            return int(arg.split("=", 1)[1])
+    return None
+
+
+def worker_count() -> int:
+    """
+    Worker processes serving the app:
+    - gunicorn: gunicorn.conf.py exports the arbiter's real count (config, -w or
+      GUNICORN_CMD_ARGS) as WEB_CONCURRENCY before any worker starts
+    - uvicorn: --workers on its command line, else WEB_CONCURRENCY (uvicorn's own default)
+    """
+    workers = _uvicorn_cli_workers(sys.argv)
+    if workers is None:
+        workers = int(os.getenv('WEB_CONCURRENCY', 1))
+    return max(1, workers)
+
+
+def check_deployment(
+    adapters: Dict[str, Optional[object]],
+    secrets: Dict[str, bool],
+    workers: Optional[int] = None,
+    required: Optional[Dict[str, bool]] = None
+) -> None:
+    """
+    adapters: setting name -> adapter exposing `is_shared` (None when not in use)
+    secrets: setting name -> whether it is configured explicitly
+    required: setting name -> whether it is configured; checked even with one worker
+    """
+    missing = [name for name, configured in (required or {}).items() if not configured]
+    if missing:
+        raise MissingSettingError("Required settings are not set: " + ", ".join(missing))
+    workers = workers or worker_count()
+    problems = [
+        f"{name} uses process-local {type(adapter).__name__}"
+        for name, adapter in adapters.items()
+        if adapter is not None and not getattr(adapter, "is_shared", False)
+    ]
+    problems += [f"{name} is not set, so each worker would generate its own" for name, configured in secrets.items() if not configured]
+    if not problems:
+        return
+    if workers > 1:
+        raise ProcessLocalStateError(
+            f"Refusing to start {workers} workers with per-process state: " + "; ".join(problems)
+        )
+    logger.info(f"Single-worker mode with process-local state ({'; '.join(problems)})")
@@ -0,0 +1,281 @@
+"""
+Image normalization and thumbnails for uploaded documents
+Uploads are queued after the request returns. A background worker claims
+each new piece of content (by hash, so duplicates are processed once), runs
+the CPU-heavy Pillow work in a process pool and stores:
+- a downscaled, recompressed version that replaces the original when smaller
+- small thumbnails for the document vault list view
+PDFs and other non-image content pass through untouched.
+
+Readers resolve a document's bytes through its blob_refs record, so swapping
+in the compressed version is a single update of that record. The replaced
+original is not deleted right away: it is retired to `retired_blobs` and
+collected after a grace period, so streams that already started on it (or
+readers that looked it up just before the swap) can finish.
+"""
+import io
+import os
+import asyncio
+import logging
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from services.deployment import worker_count
+from services.storage import BlobNotFound, MAX_UPLOAD_BYTES
+
+try:
+    from PIL import Image, ImageOps
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = {"small": 128, "medium": 384}
+OUTPUT_FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+
+
+def _encode(image, output_format: str, quality: int) -> bytes:
+    pil_format, _ = OUTPUT_FORMATS[output_format]
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def process_image(data: bytes, max_dimension: int, quality: int, output_format: str, thumbnail_sizes: Dict[str, int]) -> dict:
+    """
+    Runs in a worker process. Returns the normalized image and thumbnails as
+    bytes, or an empty dict when the data is not an image Pillow can read.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception:
+        return {}
+    # Phone cameras store rotation in EXIF; bake it in before resizing
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    normalized = image.copy()
+    normalized.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    result = {"normalized": _encode(normalized, output_format, quality), "thumbnails": {}}
+    for name, size in thumbnail_sizes.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        result["thumbnails"][name] = _encode(thumbnail, output_format, quality)
+    return result
+
+
+async def _write_blob(blob_store, data: bytes, filename: str, content_type: str):
+    async def chunks():
+        for offset in range(0, len(data), blob_store.chunk_size):
+            yield data[offset:offset + blob_store.chunk_size]
+    return await blob_store.put(chunks(), filename, content_type)
+
+
+class DocumentImageProcessor:
+    CLAIM_TIMEOUT = timedelta(minutes=10)
+    # How often retired originals past their grace period are deleted
+    GC_INTERVAL_SECONDS = 300
+
+    def __init__(
+        self,
+        db,
+        blob_store,
+        workers: int = 2,
+        max_dimension: int = 1600,
+        quality: int = 80,
+        output_format: str = "jpeg",
+        thumbnail_sizes: Optional[Dict[str, int]] = None,
+        retire_grace_seconds: int = 3600,
+        max_bytes: int = MAX_UPLOAD_BYTES
+    ):
+        self.db = db
+        self.blob_store = blob_store
+        self.workers = workers
+        # Larger blobs (stored before uploads were capped) are never read into memory or sent to a worker
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.output_format = output_format if output_format in OUTPUT_FORMATS else "jpeg"
+        self.thumbnail_sizes = thumbnail_sizes or THUMBNAIL_SIZES
+        self.retire_grace = timedelta(seconds=retire_grace_seconds)
+        self.queue: Optional[asyncio.Queue] = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._tasks = []
+
+    @property
+    def enabled(self) -> bool:
+        return PILLOW_AVAILABLE and self.workers > 0
+
+    async def start(self) -> None:
+        if not self.enabled:
+            if not PILLOW_AVAILABLE:
+                logger.warning("Pillow not installed - uploaded images will not be compressed or thumbnailed")
+            return
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue()
+        # spawn, not fork: the parent holds Motor's threads and sockets
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._collect_periodically()))
+        await self.recover()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def enqueue(self, content_hash: str) -> None:
+        if self._tasks and content_hash:
+            self.queue.put_nowait(content_hash)
+
+    async def recover(self, limit: int = 1000) -> None:
+        """Re-queue image content left unprocessed by a restart"""
+        async for ref in self.db.blob_refs.find(
+            {"processed_at": {"$exists": False}, "content_type": {"$regex": "^image/"}},
+            {"_id": 1}
+        ).limit(limit):
+            self.queue.put_nowait(ref["_id"])
+
+    async def _worker(self) -> None:
+        while True:
+            content_hash = await self.queue.get()
+            try:
+                await self.process(content_hash)
+            except Exception as e:
+                logger.error(f"Image processing failed for {content_hash}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _claim(self, content_hash: str) -> Optional[dict]:
+        """Atomically claim unprocessed content so only one worker/process handles it"""
+        from pymongo import ReturnDocument
+
+        now = datetime.utcnow()
+        return await self.db.blob_refs.find_one_and_update(
+            {
+                "_id": content_hash,
+                "processed_at": {"$exists": False},
+                "$or": [{"claimed_at": {"$exists": False}}, {"claimed_at": {"$lt": now - self.CLAIM_TIMEOUT}}]
+            },
+            {"$set": {"claimed_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _delete_blobs(self, blob_ids) -> None:
+        for blob_id in blob_ids:
+            try:
+                await self.blob_store.delete(blob_id)
+            except BlobNotFound:
+                pass
+
+    async def retire(self, blob_id: str) -> None:
+        """Delete a blob once the grace period is over instead of right away"""
+        await self.db.retired_blobs.update_one(
+            {"_id": blob_id},
+            {"$set": {"delete_after": datetime.utcnow() + self.retire_grace}},
+            upsert=True
+        )
+
+    async def collect_garbage(self, limit: int = 1000) -> int:
+        """Delete retired blobs whose grace period is over; returns how many were deleted"""
+        due = await self.db.retired_blobs.find(
+            {"delete_after": {"$lte": datetime.utcnow()}}, {"_id": 1}
+        ).limit(limit).to_list(limit)
+        for entry in due:
+            await self._delete_blobs([entry["_id"]])
+            await self.db.retired_blobs.delete_one({"_id": entry["_id"]})
+        return len(due)
+
+    async def _collect_periodically(self) -> None:
+        while True:
+            try:
+                await self.collect_garbage()
+            except Exception as e:
+                logger.error(f"Retired blob collection failed: {str(e)}")
+            await asyncio.sleep(self.GC_INTERVAL_SECONDS)
+
+    async def process(self, content_hash: str) -> None:
+        ref = await self._claim(content_hash)
+        if ref is None:
+            return
+        if not ref.get("content_type", "").startswith("image/"):
+            # PDFs and other content pass through unchanged
+            await self.db.blob_refs.update_one({"_id": content_hash}, {"$set": {"processed_at": datetime.utcnow()}})
+            return
+        if ref.get("length", 0) > self.max_bytes:
+            logger.warning(f"Skipping {content_hash}: {ref['length']} bytes is over the {self.max_bytes} byte limit")
+            await self.db.blob_refs.update_one({"_id": content_hash}, {"$set": {"processed_at": datetime.utcnow()}})
+            return
+
+        data = await self.blob_store.read_all(ref["blob_id"])
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self.executor, process_image,
+            data, self.max_dimension, self.quality, self.output_format, self.thumbnail_sizes
+        )
+        _, media_type = OUTPUT_FORMATS[self.output_format]
+        update = {"processed_at": datetime.utcnow()}
+
+        thumbnails = {}
+        for name, thumbnail in result.get("thumbnails", {}).items():
+            info = await _write_blob(self.blob_store, thumbnail, f"{content_hash}-{name}", media_type)
+            thumbnails[name] = {"blob_id": info.blob_id, "length": info.length, "content_type": media_type}
+        if thumbnails:
+            update["thumbnails"] = thumbnails
+
+        normalized = result.get("normalized")
+        replaced_blob_id = None
+        if normalized and len(normalized) < len(data):
+            info = await _write_blob(self.blob_store, normalized, content_hash, media_type)
+            update.update({
+                "blob_id": info.blob_id,
+                "length": info.length,
+                "content_type": media_type,
+                "original_length": len(data),
+            })
+            replaced_blob_id = ref["blob_id"]
+
+        # Only publish while the claim is still ours: the content may have been
+        # released (or reclaimed after a timeout) while it was being processed
+        result = await self.db.blob_refs.update_one(
+            {"_id": content_hash, "claimed_at": ref["claimed_at"]},
+            {"$set": update, "$unset": {"claimed_at": ""}}
+        )
+        written = [thumbnail["blob_id"] for thumbnail in thumbnails.values()]
+        if replaced_blob_id:
+            written.append(update["blob_id"])
+        if result.matched_count == 0:
+            await self._delete_blobs(written)
+            return
+        if replaced_blob_id:
+            # Content is read through the ref; the document copies are metadata for listings
+            await self.db.documents.update_many(
+                {"content_hash": content_hash},
+                {"$set": {"blob_id": update["blob_id"], "size": update["length"], "content_type": media_type}}
+            )
+            await self.retire(replaced_blob_id)
+            logger.info(f"Compressed {content_hash}: {len(data)} -> {update['length']} bytes")
+
+
+def create_image_processor(db, blob_store) -> DocumentImageProcessor:
+    return DocumentImageProcessor(
+        db,
+        blob_store,
+        # Half the cores, split across the API worker processes that each run a pool
+        workers=int(os.getenv('IMAGE_WORKERS', max(1, (os.cpu_count() or 2) // 2 // worker_count()))),
+        max_dimension=int(os.getenv('IMAGE_MAX_DIMENSION', 1600)),
+        quality=int(os.getenv('IMAGE_QUALITY', 80)),
+        output_format=os.getenv('IMAGE_FORMAT', 'jpeg').lower(),
+        retire_grace_seconds=int(os.getenv('IMAGE_RETIRED_BLOB_GRACE_SECONDS', 3600)),
+        max_bytes=MAX_UPLOAD_BYTES
+    )
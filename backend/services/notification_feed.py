@@ -0,0 +1,126 @@
+"""
+Real-time notification fan-out
+NotificationBroker keeps one small queue per connected client, grouped by
+user, and fans new notifications out to them. NotificationFeed feeds the
+broker from a MongoDB change stream on `notifications`, so inserts made by
+any worker reach every connected client. When change streams are not
+available (standalone servers), it falls back to in-process publishing from
+the insert sites; clients then only see notifications written by their own
+worker.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationBroker:
+    """In-memory pub/sub keyed by user id; also the stand-in used by tests"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def publish(self, user_id: str, message: dict) -> int:
+        """Deliver to every connection of user_id; returns the number of connections reached"""
+        queues = self._subscribers.get(user_id)
+        if not queues:
+            return 0
+        for queue in queues:
+            if queue.full():
+                # Slow consumer: drop its oldest message rather than block the publisher
+                queue.get_nowait()
+            queue.put_nowait(message)
+        return len(queues)
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+class NotificationFeed:
+    def __init__(self, broker: NotificationBroker):
+        self.broker = broker
+        self.mode = "local"
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, db) -> None:
+        """Open a change stream on notifications, or fall back to local publishing"""
+        if self._task:
+            return
+        stream = None
+        try:
+            stream = db.notifications.watch([{"$match": {"operationType": "insert"}}])
+            # Opening the cursor is where standalone servers reject change streams
+            first_change = await stream.try_next()
+        except Exception as e:
+            # Any failure here (standalone servers, drivers or mocks without
+            # change streams) must not stop the app from starting
+            logger.warning(f"Change streams unavailable ({str(e)}) - notifications are pushed from this worker only")
+            if stream is not None:
+                await self._close(stream)
+            self.mode = "local"
+            return
+        self.mode = "change_stream"
+        if first_change:
+            self._publish_change(first_change)
+        self._task = asyncio.create_task(self._consume(db, stream, stream.resume_token))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    async def _close(stream) -> None:
+        try:
+            await stream.close()
+        except Exception as e:
+            logger.debug(f"Closing the notification change stream failed: {str(e)}")
+
+    def _publish_change(self, change: dict) -> None:
+        document = change["fullDocument"]
+        document.pop("_id", None)
+        self.broker.publish(document["user_id"], document)
+
+    async def _consume(self, db, stream, resume_token) -> None:
+        while True:
+            try:
+                async with stream:
+                    async for change in stream:
+                        resume_token = change["_id"]
+                        self._publish_change(change)
+            except PyMongoError as e:
+                logger.warning(f"Notification change stream interrupted ({str(e)}), resuming")
+                await asyncio.sleep(1)
+            stream = db.notifications.watch(
+                [{"$match": {"operationType": "insert"}}],
+                resume_after=resume_token
+            )
+
+    def notify(self, notification: dict) -> None:
+        """Called after notifications are written; only publishes when no change stream does it"""
+        if self.mode != "local":
+            return
+        notification = {k: v for k, v in notification.items() if k != "_id"}
+        self.broker.publish(notification["user_id"], notification)
@@ -0,0 +1,214 @@
+"""
+OTP storage backends
+Every backend expires codes after a TTL and counts verification attempts
+atomically, so a code issued by one worker can be verified on any other
+when a shared backend (MongoDB or Redis) is configured.
+"""
+import os
+import time
+import logging
+from enum import Enum
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 300  # 5 minutes
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class OTPResult(str, Enum):
+    OK = "ok"
+    NOT_FOUND = "not_found"
+    EXPIRED = "expired"
+    TOO_MANY_ATTEMPTS = "too_many_attempts"
+    INVALID = "invalid"
+
+
+class OTPStore:
+    """Interface implemented by every OTP backend"""
+
+    is_shared = False  # True when all workers see the same codes
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TTL_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+
+    async def save(self, phone: str, otp: str) -> None:
+        """Store a fresh code for phone, replacing any previous one"""
+        raise NotImplementedError
+
+    async def verify(self, phone: str, otp: str) -> OTPResult:
+        """Check a code; the entry is consumed on success, expiry or attempt exhaustion"""
+        raise NotImplementedError
+
+
+class MemoryOTPStore(OTPStore):
+    """Process-local store with TTL expiry and a bounded number of entries"""
+
+    def __init__(self, max_entries: int = 10000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        # phone -> [otp, expires_at (monotonic), attempts]; ordered by insertion
+        # time, so the oldest (first to expire) entries are at the front
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            phone, entry = next(iter(self._entries.items()))
+            if entry[1] > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[phone]
+
+    async def save(self, phone: str, otp: str) -> None:
+        now = time.monotonic()
+        self._entries.pop(phone, None)
+        self._entries[phone] = [otp, now + self.ttl_seconds, 0]
+        self._evict(now)
+
+    async def verify(self, phone: str, otp: str) -> OTPResult:
+        # No awaits below, so the check-and-update is atomic within the event loop
+        now = time.monotonic()
+        entry = self._entries.get(phone)
+        if entry is None:
+            self._evict(now)
+            return OTPResult.NOT_FOUND
+        if entry[1] <= now:
+            del self._entries[phone]
+            return OTPResult.EXPIRED
+        if entry[2] >= self.max_attempts:
+            del self._entries[phone]
+            return OTPResult.TOO_MANY_ATTEMPTS
+        if entry[0] != otp:
+            entry[2] += 1
+            return OTPResult.INVALID
+        del self._entries[phone]
+        return OTPResult.OK
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MongoOTPStore(OTPStore):
+    """
+    Shared store in a MongoDB collection. A TTL index on expires_at (declared
+    in database.indexes) removes abandoned codes; verification itself never
+    relies on the TTL monitor, which only runs once a minute.
+    """
+
+    is_shared = True
+
+    def __init__(self, db, collection: str = "otp_codes", **kwargs):
+        super().__init__(**kwargs)
+        self.collection = db[collection]
+
+    async def save(self, phone: str, otp: str) -> None:
+        now = datetime.utcnow()
+        await self.collection.replace_one(
+            {"_id": phone},
+            {"otp": otp, "attempts": 0, "created_at": now, "expires_at": now + timedelta(seconds=self.ttl_seconds)},
+            upsert=True
+        )
+
+    async def verify(self, phone: str, otp: str) -> OTPResult:
+        from pymongo import ReturnDocument
+
+        now = datetime.utcnow()
+        live = {"_id": phone, "expires_at": {"$gt": now}, "attempts": {"$lt": self.max_attempts}}
+
+        # Correct code: consume it in one atomic operation
+        if await self.collection.find_one_and_delete({**live, "otp": otp}, projection={"_id": 1}):
+            return OTPResult.OK
+
+        # Wrong code: count the attempt atomically while attempts remain
+        if await self.collection.find_one_and_update(
+            live, {"$inc": {"attempts": 1}}, projection={"_id": 1}, return_document=ReturnDocument.AFTER
+        ):
+            return OTPResult.INVALID
+
+        entry = await self.collection.find_one({"_id": phone})
+        if entry is None:
+            return OTPResult.NOT_FOUND
+        if entry["expires_at"] > now and entry["attempts"] < self.max_attempts:
+            # A fresh code was saved after the checks above; leave it for the next attempt
+            return OTPResult.INVALID
+        # Only remove the dead entry we looked at, never a code re-requested meanwhile
+        await self.collection.delete_one({"_id": phone, "otp": entry["otp"], "created_at": entry["created_at"]})
+        if entry["expires_at"] <= now:
+            return OTPResult.EXPIRED
+        return OTPResult.TOO_MANY_ATTEMPTS
+
+
+# KEYS[1] = otp key; ARGV = otp, max attempts, now (ms)
+_REDIS_VERIFY_SCRIPT = """
+local data = redis.call('HMGET', KEYS[1], 'otp', 'attempts', 'expires_at')
+if not data[1] then return 'not_found' end
+if tonumber(data[3]) <= tonumber(ARGV[3]) then
+    redis.call('DEL', KEYS[1])
+    return 'expired'
+end
+if tonumber(data[2]) >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return 'too_many_attempts'
+end
+if data[1] == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 'ok'
+end
+redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+return 'invalid'
+"""
+
+
+class RedisOTPStore(OTPStore):
+    """
+    Shared store on any Redis-protocol server (redis.asyncio client API).
+    Verification runs as a Lua script, so attempt counting is atomic.
+    """
+
+    is_shared = True
+    # Keys outlive their logical expiry briefly so clients get "expired"
+    # rather than "not found" right after the deadline
+    EXPIRY_GRACE_SECONDS = 60
+
+    def __init__(self, redis, key_prefix: str = "otp:", **kwargs):
+        super().__init__(**kwargs)
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self._verify_script = redis.register_script(_REDIS_VERIFY_SCRIPT)
+
+    async def save(self, phone: str, otp: str) -> None:
+        key = self.key_prefix + phone
+        expires_at = int((time.time() + self.ttl_seconds) * 1000)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={"otp": otp, "attempts": 0, "expires_at": expires_at})
+            pipe.expire(key, self.ttl_seconds + self.EXPIRY_GRACE_SECONDS)
+            await pipe.execute()
+
+    async def verify(self, phone: str, otp: str) -> OTPResult:
+        result = await self._verify_script(
+            keys=[self.key_prefix + phone],
+            args=[otp, self.max_attempts, int(time.time() * 1000)]
+        )
+        if isinstance(result, bytes):
+            result = result.decode()
+        return OTPResult(result)
+
+
+def create_otp_store(db) -> OTPStore:
+    """Build the OTP store selected by OTP_STORE ("memory", "mongo" or "redis")"""
+    backend = os.getenv('OTP_STORE', 'memory').lower()
+    options = {
+        "ttl_seconds": int(os.getenv('OTP_TTL_SECONDS', DEFAULT_TTL_SECONDS)),
+        "max_attempts": int(os.getenv('OTP_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)),
+    }
+    if backend == 'mongo':
+        return MongoOTPStore(db, **options)
+    if backend == 'redis':
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("OTP_STORE=redis requires the 'redis' package")
+        return RedisOTPStore(aioredis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0')), **options)
+    return MemoryOTPStore(max_entries=int(os.getenv('OTP_MAX_ENTRIES', 10000)), **options)
@@ -0,0 +1,61 @@
+"""
+Opaque keyset cursors for list endpoints
+Pages are ordered by (created_at, id) descending, so the cursor only needs
+the sort key of the last row served.
+"""
+import json
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    payload = json.dumps({"t": created_at.isoformat(), "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def keyset_filter(query: dict, cursor: Optional[str]) -> dict:
+    """Extend a Mongo filter so it only matches rows after the cursor (newest first)"""
+    if not cursor:
+        return query
+    created_at, row_id = decode_cursor(cursor)
+    return {
+        **query,
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": row_id}},
+        ],
+    }
+
+
+KEYSET_SORT = [("created_at", -1), ("id", -1)]
+
+
+def split_page(rows: list, limit: int) -> Tuple[list, Optional[str]]:
+    """
+    Split rows fetched with limit + 1 into (page, next cursor).
+    The extra row only signals that another page exists; it is not returned.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last["created_at"], last["id"])
+
+
+def cursor_headers(cursor: Optional[str]) -> dict:
+    """Response headers advertising the next page, if any"""
+    return {"X-Next-Cursor": cursor} if cursor else {}
@@ -0,0 +1,47 @@
+"""
+Fast JSON responses for list endpoints
+Rows fetched with a projection that already matches the response model are
+encoded straight to bytes with orjson, skipping the Pydantic re-validation
+and jsonable_encoder passes FastAPI applies to returned objects. Endpoints
+opt in by returning fast_json_response(...); their response_model still
+documents the shape in OpenAPI.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class FastJSONResponse(Response):
+    """orjson-encoded JSON; handles datetimes natively, falls back to the stdlib encoder"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return JSONResponse.render(self, jsonable_encoder(content))
+
+
+def with_defaults(rows: Iterable[dict], defaults: Dict[str, Any]) -> List[dict]:
+    """Fill fields older rows may lack, mirroring the response model defaults"""
+    return [{**defaults, **row} for row in rows]
+
+
+def fast_json_response(content: Any, headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    return FastJSONResponse(content=content, status_code=status_code, headers=headers)
+
+
+def model_defaults(model) -> Dict[str, Any]:
+    """Static field defaults of a Pydantic model (fields with default factories are skipped)"""
+    return {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
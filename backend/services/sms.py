@@ -1,60 +1,279 @@
 """
 Production SMS Service for OTP delivery
-Replace mock implementation with actual SMS provider
+Messages are queued and delivered by a bounded pool of background workers,
+so a slow SMS gateway never blocks request handling. Provider calls that are
+synchronous (the Twilio SDK) run in a dedicated thread pool.
 """
 import os
+import random
+import asyncio
 import logging
-from typing import Optional
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioException
 
 logger = logging.getLogger(__name__)
 
+
+class SMSDeliveryError(Exception):
+    """Raised by providers when a message could not be delivered"""
+
+
+@dataclass
+class SMSMessage:
+    to: str
+    body: str
+    attempts: int = 0
+
+
+class SMSProvider:
+    """Interface implemented by every SMS provider"""
+
+    name = "base"
+    max_concurrency = 4
+
+    async def send(self, to: str, body: str) -> str:
+        """Deliver one message and return the provider message id"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class TwilioProvider(SMSProvider):
+    name = "Twilio"
+
+    def __init__(self, account_sid: str, auth_token: str, phone_number: str, max_concurrency: int = 4):
+        self.client = Client(account_sid, auth_token)
+        self.phone_number = phone_number
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="sms")
+
+    def _send_sync(self, to: str, body: str) -> str:
+        try:
+            return self.client.messages.create(body=body, from_=self.phone_number, to=to).sid
+        except TwilioException as e:
+            raise SMSDeliveryError(str(e))
+
+    async def send(self, to: str, body: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._send_sync, to, body)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+class LogProvider(SMSProvider):
+    """Development provider - messages are only logged"""
+
+    name = "Development"
+
+    async def send(self, to: str, body: str) -> str:
+        logger.info(f"🔐 DEVELOPMENT MODE - SMS to {to}: {body}")
+        print(f"🔐 SMS to {to}: {body}")
+        return "dev"
+
+
+class FakeSMSProvider(SMSProvider):
+    """In-memory provider for tests: records messages, can simulate latency and failures"""
+
+    name = "Fake"
+
+    def __init__(self, latency: float = 0.0, fail_times: int = 0, max_concurrency: int = 4):
+        self.latency = latency
+        self.fail_times = fail_times
+        self.max_concurrency = max_concurrency
+        self.sent: List[SMSMessage] = []
+        self.calls = 0
+
+    async def send(self, to: str, body: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise SMSDeliveryError("simulated failure")
+        self.sent.append(SMSMessage(to=to, body=body))
+        return f"fake-{len(self.sent)}"
+
+
+class SMSDispatcher:
+    """
+    Bounded async queue drained by background workers. Each worker takes a
+    batch of queued messages and sends them concurrently, limited by the
+    provider's max_concurrency; failed sends are retried with exponential
+    backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        provider: SMSProvider,
+        workers: int = 2,
+        batch_size: int = 10,
+        queue_size: int = 10000,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        self.provider = provider
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retry_tasks = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._semaphore = asyncio.Semaphore(self.provider.max_concurrency)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Give queued messages a chance to go out, then stop the workers"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"SMS dispatcher stopped with {self.queue.qsize()} undelivered messages")
+        for task in [*self._tasks, *self._retry_tasks]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retry_tasks, return_exceptions=True)
+        self._tasks = []
+        self._retry_tasks.clear()
+        self.provider.close()
+
+    def enqueue(self, to: str, body: str) -> bool:
+        """Queue a message without waiting; False when the queue is full or stopped"""
+        if not self.running:
+            return False
+        try:
+            self.queue.put_nowait(SMSMessage(to=to, body=body))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"SMS queue full, dropping message to {to}")
+            return False
+
+    async def _worker(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await asyncio.gather(*(self._deliver(message) for message in batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _deliver(self, message: SMSMessage) -> None:
+        message.attempts += 1
+        try:
+            async with self._semaphore:
+                sid = await self.provider.send(message.to, message.body)
+            self.sent += 1
+            logger.info(f"SMS sent successfully to {message.to}, SID: {sid}")
+        except Exception as e:
+            if message.attempts > self.max_retries:
+                self.failed += 1
+                logger.error(f"Failed to send SMS to {message.to} after {message.attempts} attempts: {str(e)}")
+                return
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (message.attempts - 1))
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(f"SMS to {message.to} failed ({str(e)}), retrying in {delay:.1f}s")
+            # Retry off the worker, so backoff never holds up the rest of the queue
+            task = asyncio.create_task(self._retry_later(message, delay))
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+
+    async def _retry_later(self, message: SMSMessage, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._deliver(message)
+
+    def get_status(self) -> dict:
+        return {
+            "queued": self.queue.qsize() if self.queue else 0,
+            "retrying": len(self._retry_tasks),
+            "sent": self.sent,
+            "failed": self.failed,
+            "workers": len(self._tasks),
+        }
+
+
+def format_validity(seconds: int) -> str:
+    """Human wording for an OTP lifetime: whole minutes when it divides evenly, else seconds"""
+    if seconds >= 60 and seconds % 60 == 0:
+        minutes = seconds // 60
+        return f"{minutes} minute" if minutes == 1 else f"{minutes} minutes"
+    return f"{seconds} second" if seconds == 1 else f"{seconds} seconds"
+
+
 class SMSService:
-    def __init__(self):
+    def __init__(self, provider: Optional[SMSProvider] = None):
         self.account_sid = os.getenv('TWILIO_ACCOUNT_SID')
         self.auth_token = os.getenv('TWILIO_AUTH_TOKEN')
         self.phone_number = os.getenv('TWILIO_PHONE_NUMBER')
-        
-        if all([self.account_sid, self.auth_token, self.phone_number]):
-            self.client = Client(self.account_sid, self.auth_token)
+
+        if provider is not None:
+            self.is_production = not isinstance(provider, (LogProvider, FakeSMSProvider))
+        elif all([self.account_sid, self.auth_token, self.phone_number]):
+            provider = TwilioProvider(
+                self.account_sid,
+                self.auth_token,
+                self.phone_number,
+                max_concurrency=int(os.getenv('SMS_MAX_CONCURRENCY', 4))
+            )
             self.is_production = True
         else:
-            self.client = None
+            provider = LogProvider()
             self.is_production = False
             logger.warning("SMS service running in development mode - OTPs will be logged")
 
-    async def send_otp(self, phone_number: str, otp: str) -> bool:
+        self.provider = provider
+        self.dispatcher = SMSDispatcher(
+            provider,
+            workers=int(os.getenv('SMS_WORKERS', 2)),
+            batch_size=int(os.getenv('SMS_BATCH_SIZE', 10)),
+            queue_size=int(os.getenv('SMS_QUEUE_SIZE', 10000)),
+            max_retries=int(os.getenv('SMS_MAX_RETRIES', 3))
+        )
+
+    async def start(self) -> None:
+        await self.dispatcher.start()
+
+    async def stop(self) -> None:
+        await self.dispatcher.stop()
+
+    async def send_otp(self, phone_number: str, otp: str, ttl_seconds: int) -> bool:
         """
-        Send OTP via SMS
-        In production: Uses Twilio SMS service
-        In development: Logs OTP to console
+        Queue an OTP SMS and return immediately.
+        ttl_seconds is the OTP store's expiry, quoted in the message.
+        Returns False only when the message could not be queued.
         """
-        message = f"Your Akshaya E-Services verification code is: {otp}. Valid for 5 minutes."
-        
-        if self.is_production and self.client:
-            try:
-                message = self.client.messages.create(
-                    body=message,
-                    from_=self.phone_number,
-                    to=phone_number
-                )
-                logger.info(f"SMS sent successfully to {phone_number}, SID: {message.sid}")
-                return True
-            except TwilioException as e:
-                logger.error(f"Failed to send SMS to {phone_number}: {str(e)}")
-                return False
-        else:
-            # Development mode - log OTP
-            logger.info(f"🔐 DEVELOPMENT MODE - OTP for {phone_number}: {otp}")
-            print(f"🔐 OTP for {phone_number}: {otp}")
-            return True
+        if not self.dispatcher.running:
+            await self.dispatcher.start()
+        message = f"Your Akshaya E-Services verification code is: {otp}. Valid for {format_validity(ttl_seconds)}."
+        return self.dispatcher.enqueue(phone_number, message)
 
     def get_status(self) -> dict:
         """Get SMS service status"""
         return {
             "service": "SMS",
-            "provider": "Twilio" if self.is_production else "Development",
+            "provider": self.provider.name,
             "status": "configured" if self.is_production else "development_mode",
-            "phone_configured": bool(self.phone_number)
-        }
\ No newline at end of file
+            "phone_configured": bool(self.phone_number),
+            "queue": self.dispatcher.get_status()
+        }
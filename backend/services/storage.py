@@ -0,0 +1,381 @@
+"""
+Blob storage for uploaded document files
+Document rows only keep metadata plus a blob reference; file bytes live here
+and are written and read in fixed-size chunks.
+"""
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 255 * 1024  # GridFS default chunk size
+# Largest accepted upload; also the largest blob the image pipeline will load
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+
+
+class BlobNotFound(Exception):
+    """Raised when a blob reference does not resolve to stored bytes"""
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the store's size limit"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+@dataclass
+class BlobInfo:
+    blob_id: str
+    length: int
+    content_type: str
+    content_hash: Optional[str] = None
+
+
+class BlobStore:
+    """Interface implemented by every blob storage backend"""
+
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+
+    async def put(self, chunks: AsyncIterator[bytes], filename: str, content_type: str) -> BlobInfo:
+        raise NotImplementedError
+
+    async def stat(self, blob_id: str) -> BlobInfo:
+        raise NotImplementedError
+
+    def open(self, blob_id: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield bytes [start, end] (inclusive) of a blob, one chunk at a time"""
+        raise NotImplementedError
+
+    async def delete(self, blob_id: str) -> None:
+        raise NotImplementedError
+
+    async def read_all(self, blob_id: str) -> bytes:
+        """Whole blob in memory, for background processing of bounded-size uploads"""
+        return b"".join([chunk async for chunk in self.open(blob_id)])
+
+
+class GridFSBlobStore(BlobStore):
+    """Stores blobs in a MongoDB GridFS bucket next to the application data"""
+
+    def __init__(self, db, bucket_name: str = "document_blobs", chunk_size: int = DEFAULT_CHUNK_SIZE):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+        self.chunk_size = chunk_size
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name, chunk_size_bytes=chunk_size)
+
+    @staticmethod
+    def _object_id(blob_id: str):
+        from bson import ObjectId
+        from bson.errors import InvalidId
+
+        try:
+            return ObjectId(blob_id)
+        except (InvalidId, TypeError):
+            raise BlobNotFound(blob_id)
+
+    async def put(self, chunks: AsyncIterator[bytes], filename: str, content_type: str) -> BlobInfo:
+        grid_in = self.bucket.open_upload_stream(filename, metadata={"content_type": content_type})
+        length = 0
+        try:
+            async for chunk in chunks:
+                await grid_in.write(chunk)
+                length += len(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return BlobInfo(blob_id=str(grid_in._id), length=length, content_type=content_type)
+
+    async def _open_grid_out(self, blob_id: str):
+        from gridfs.errors import NoFile
+
+        try:
+            return await self.bucket.open_download_stream(self._object_id(blob_id))
+        except NoFile:
+            raise BlobNotFound(blob_id)
+
+    async def stat(self, blob_id: str) -> BlobInfo:
+        grid_out = await self._open_grid_out(blob_id)
+        metadata = grid_out.metadata or {}
+        return BlobInfo(
+            blob_id=blob_id,
+            length=grid_out.length,
+            content_type=metadata.get("content_type", "application/octet-stream"),
+        )
+
+    async def open(self, blob_id: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        grid_out = await self._open_grid_out(blob_id)
+        last = grid_out.length - 1 if end is None else min(end, grid_out.length - 1)
+        grid_out.seek(start)
+        remaining = last - start + 1
+        while remaining > 0:
+            data = await grid_out.read(min(self.chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+    async def delete(self, blob_id: str) -> None:
+        from gridfs.errors import NoFile
+
+        try:
+            await self.bucket.delete(self._object_id(blob_id))
+        except NoFile:
+            raise BlobNotFound(blob_id)
+
+
+class LocalBlobStore(BlobStore):
+    """Filesystem-backed store for development, tests and single-node deployments"""
+
+    def __init__(self, root: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, blob_id: str) -> Path:
+        # Blob ids are generated here as uuid4 hex; reject anything else so a
+        # crafted id can never escape the storage root.
+        if len(blob_id) != 32 or not all(c in "0123456789abcdef" for c in blob_id):
+            raise BlobNotFound(blob_id)
+        return self.root / blob_id[:2] / blob_id
+
+    async def put(self, chunks: AsyncIterator[bytes], filename: str, content_type: str) -> BlobInfo:
+        blob_id = uuid.uuid4().hex
+        path = self._path(blob_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        tmp_path = path.with_suffix(".part")
+        handle = await loop.run_in_executor(None, open, tmp_path, "wb")
+        length = 0
+        try:
+            async for chunk in chunks:
+                await loop.run_in_executor(None, handle.write, chunk)
+                length += len(chunk)
+        except BaseException:
+            handle.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        handle.close()
+        os.replace(tmp_path, path)
+        path.with_suffix(".type").write_text(content_type)
+        return BlobInfo(blob_id=blob_id, length=length, content_type=content_type)
+
+    async def stat(self, blob_id: str) -> BlobInfo:
+        path = self._path(blob_id)
+        if not path.exists():
+            raise BlobNotFound(blob_id)
+        type_path = path.with_suffix(".type")
+        content_type = type_path.read_text() if type_path.exists() else "application/octet-stream"
+        return BlobInfo(blob_id=blob_id, length=path.stat().st_size, content_type=content_type)
+
+    async def open(self, blob_id: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        path = self._path(blob_id)
+        if not path.exists():
+            raise BlobNotFound(blob_id)
+        size = path.stat().st_size
+        last = size - 1 if end is None else min(end, size - 1)
+        loop = asyncio.get_running_loop()
+        with open(path, "rb") as handle:
+            handle.seek(start)
+            remaining = last - start + 1
+            while remaining > 0:
+                data = await loop.run_in_executor(None, handle.read, min(self.chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    async def delete(self, blob_id: str) -> None:
+        path = self._path(blob_id)
+        if not path.exists():
+            raise BlobNotFound(blob_id)
+        path.unlink()
+        path.with_suffix(".type").unlink(missing_ok=True)
+
+
+class BytesSource:
+    """Rewindable source over in-memory bytes, same read/seek API as UploadFile"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    async def read(self, size: int) -> bytes:
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        return chunk
+
+    async def seek(self, offset: int) -> None:
+        self.offset = offset
+
+
+async def iter_source(source, chunk_size: int) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def is_reencoded(ref: dict) -> bool:
+    """Whether a blob ref's bytes were replaced by a re-encoded version (see services.image_pipeline)"""
+    return ref.get("original_length") is not None
+
+
+class ContentAddressedStore:
+    """
+    Deduplicating layer over a BlobStore. Uploads are hashed (SHA-256) before
+    anything is written; identical content is stored once and shared through
+    a reference-counted `blob_refs` record keyed by the hash. Releasing the
+    last reference deletes the record and the blob.
+
+    Uploads longer than max_length are rejected while hashing, before any
+    bytes are written.
+
+    Sharing is limited to one scope (the uploading user): the key is
+    "<scope>:<sha256>", so an upload never reveals whether, or as what,
+    anyone else stored the same bytes.
+    """
+
+    def __init__(self, blobs: BlobStore, db, collection: str = "blob_refs", max_length: Optional[int] = None):
+        self.blobs = blobs
+        self.refs = db[collection]
+        self.max_length = max_length
+
+    @property
+    def chunk_size(self) -> int:
+        return self.blobs.chunk_size
+
+    async def _hash(self, source) -> str:
+        digest = hashlib.sha256()
+        length = 0
+        async for chunk in iter_source(source, self.chunk_size):
+            length += len(chunk)
+            if self.max_length is not None and length > self.max_length:
+                raise UploadTooLarge(self.max_length)
+            digest.update(chunk)
+        await source.seek(0)
+        return digest.hexdigest()
+
+    async def _acquire_existing(self, content_hash: str) -> Optional[dict]:
+        from pymongo import ReturnDocument
+
+        return await self.refs.find_one_and_update(
+            {"_id": content_hash},
+            {"$inc": {"refs": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def put(self, source, filename: str, content_type: str, scope: Optional[str] = None) -> BlobInfo:
+        """
+        Store a rewindable source (UploadFile or BytesSource), reusing identical
+        content from the same scope. The returned content_type is the caller's
+        own unless the shared bytes have since been re-encoded.
+        """
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+
+        content_hash = await self._hash(source)
+        if scope:
+            content_hash = f"{scope}:{content_hash}"
+        ref = await self._acquire_existing(content_hash)
+        if ref is None:
+            info = await self.blobs.put(iter_source(source, self.chunk_size), filename, content_type)
+            try:
+                ref = await self.refs.find_one_and_update(
+                    {"_id": content_hash},
+                    {
+                        "$inc": {"refs": 1},
+                        "$setOnInsert": {
+                            "blob_id": info.blob_id,
+                            "length": info.length,
+                            "content_type": info.content_type,
+                            "created_at": datetime.utcnow(),
+                        }
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # Concurrent upsert of the same hash; the other insert won
+                ref = await self._acquire_existing(content_hash)
+            if ref is None or ref["blob_id"] != info.blob_id:
+                # Someone stored the same content first; keep theirs
+                await self.blobs.delete(info.blob_id)
+            if ref is None:
+                # The winner was released in between; nothing left to share
+                await source.seek(0)
+                return await self.put(source, filename, content_type, scope)
+        return BlobInfo(
+            blob_id=ref["blob_id"],
+            length=ref["length"],
+            content_type=ref["content_type"] if is_reencoded(ref) else content_type,
+            content_hash=content_hash
+        )
+
+    async def release(self, content_hash: str) -> None:
+        """Drop one reference; the blob is deleted with the last one"""
+        await self.refs.update_one({"_id": content_hash}, {"$inc": {"refs": -1}})
+        ref = await self.refs.find_one_and_delete({"_id": content_hash, "refs": {"$lte": 0}})
+        if ref is not None:
+            # Derived renditions (thumbnails) go with the content they were made from
+            blob_ids = [ref["blob_id"]] + [t["blob_id"] for t in ref.get("thumbnails", {}).values()]
+            for blob_id in blob_ids:
+                try:
+                    await self.blobs.delete(blob_id)
+                except BlobNotFound:
+                    logger.warning(f"Blob {blob_id} for content {content_hash} was already gone")
+
+    async def get_ref(self, content_hash: str) -> Optional[dict]:
+        return await self.refs.find_one({"_id": content_hash})
+
+
+def create_blob_store(db) -> BlobStore:
+    """Build the blob store selected by BLOB_STORE ("gridfs" or "local")"""
+    backend = os.getenv('BLOB_STORE', 'gridfs').lower()
+    chunk_size = int(os.getenv('BLOB_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    if backend == 'local':
+        root = os.getenv('BLOB_STORE_PATH', str(Path(__file__).parent.parent / 'uploads'))
+        logger.info(f"Using local blob store at {root}")
+        return LocalBlobStore(root, chunk_size=chunk_size)
+    return GridFSBlobStore(db, chunk_size=chunk_size)
+
+
+def parse_range(range_header: Optional[str], length: int):
+    """
+    Parse a single-range "bytes=start-end" header.
+    Returns (start, end) inclusive, None when the header is absent/ignored,
+    or raises ValueError when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        # Multipart ranges are not supported; serve the whole body instead
+        return None
+    start_s, _, end_s = spec.partition("-")
+    try:
+        if start_s == "":
+            # Suffix range: last N bytes
+            suffix = int(end_s)
+            if suffix <= 0:
+                raise ValueError(range_header)
+            start = max(length - suffix, 0)
+            end = length - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else length - 1
+    except ValueError:
+        raise ValueError(range_header)
+    if start >= length or start > end:
+        raise ValueError(range_header)
+    return start, min(end, length - 1)
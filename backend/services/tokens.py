@@ -0,0 +1,229 @@
+"""
+Signed access tokens
+Tokens are HS256 JWTs carrying the user id, so verification needs no
+database round trip. Recently verified tokens are kept in a small LRU cache
+and revoked token ids are checked against an in-memory set.
+
+Key rotation: JWT_SIGNING_KEYS="kid1:secret1,kid2:secret2" lists every key
+that is still accepted, JWT_ACTIVE_KID picks the one used to sign new
+tokens. JWT_SECRET alone configures a single key.
+
+Notification streams are opened with a stream ticket instead of the access
+token, since browsers can only pass credentials to EventSource/WebSocket in
+the URL. A ticket is valid for seconds, only for streams, and names the
+access token it was issued from so open streams end when that is revoked.
+"""
+import os
+import time
+import calendar
+import uuid
+import asyncio
+import logging
+import secrets
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+ISSUER = "akshaya-e-services-api"
+# Audience of stream tickets; access tokens carry none, so neither passes for the other
+STREAM_AUDIENCE = "notification-stream"
+
+
+class InvalidToken(Exception):
+    """Raised for tokens that are malformed, expired, forged or revoked"""
+
+
+@dataclass(frozen=True)
+class StreamGrant:
+    """Who an open notification stream belongs to, and the access token that authorized it"""
+    user_id: str
+    access_jti: str
+    access_exp: float
+
+
+class RevocationList:
+    """
+    Revoked token ids (jti) with their expiry. Lookups are O(1); entries are
+    dropped once the token would have expired anyway. When a database is
+    given, revocations are persisted to `revoked_tokens` so other workers
+    pick them up on their next sync.
+    """
+
+    def __init__(self, db=None, collection: str = "revoked_tokens"):
+        self.collection = db[collection] if db is not None else None
+        self._revoked: Dict[str, float] = {}
+
+    def __contains__(self, jti: str) -> bool:
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._revoked[jti]
+            return False
+        return True
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        self._revoked[jti] = expires_at
+        if self.collection is not None:
+            await self.collection.update_one(
+                {"_id": jti},
+                {"$set": {"expires_at": datetime.utcfromtimestamp(expires_at)}},
+                upsert=True
+            )
+
+    async def sync(self) -> None:
+        """Pull revocations made by other workers and drop expired entries"""
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        if self.collection is None:
+            return
+        async for entry in self.collection.find({"expires_at": {"$gt": datetime.utcnow()}}):
+            self._revoked[entry["_id"]] = calendar.timegm(entry["expires_at"].utctimetuple())
+
+    async def watch(self, interval: float) -> None:
+        """Background task: sync every `interval` seconds"""
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Token revocation sync failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+
+class TokenManager:
+    def __init__(
+        self,
+        keys: Dict[str, str],
+        active_kid: str,
+        ttl_seconds: int = 30 * 24 * 3600,
+        cache_size: int = 10000,
+        revocations: Optional[RevocationList] = None
+    ):
+        if active_kid not in keys:
+            raise ValueError(f"Active signing key '{active_kid}' is not configured")
+        self.keys = keys
+        self.active_kid = active_kid
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self.revocations = revocations or RevocationList()
+        # token -> (user_id, jti, exp)
+        self._cache: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+
+    def issue(self, user_id: str) -> str:
+        now = int(time.time())
+        claims = {
+            "sub": user_id,
+            "iat": now,
+            "exp": now + self.ttl_seconds,
+            "jti": uuid.uuid4().hex,
+            "iss": ISSUER,
+        }
+        return jwt.encode(claims, self.keys[self.active_kid], algorithm=ALGORITHM, headers={"kid": self.active_kid})
+
+    def decode(self, token: str) -> Tuple[str, str, float]:
+        """Verify a token and return (user_id, jti, exp)"""
+        cached = self._cache.get(token)
+        if cached is not None:
+            user_id, jti, exp = cached
+            if exp > time.time() and jti not in self.revocations:
+                self._cache.move_to_end(token)
+                return cached
+            del self._cache[token]
+            raise InvalidToken("Token expired" if exp <= time.time() else "Token revoked")
+
+        claims = self._decode_claims(token)
+        if claims["jti"] in self.revocations:
+            raise InvalidToken("Token revoked")
+        entry = (claims["sub"], claims["jti"], float(claims["exp"]))
+        self._cache[token] = entry
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    def _decode_claims(self, token: str, audience: Optional[str] = None, require=("sub", "exp", "jti")) -> dict:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid", self.active_kid)
+            key = self.keys.get(kid)
+            if key is None:
+                raise InvalidToken("Unknown signing key")
+            return jwt.decode(
+                token, key, algorithms=[ALGORITHM], issuer=ISSUER, audience=audience,
+                options={"require": list(require)}
+            )
+        except jwt.ExpiredSignatureError:
+            raise InvalidToken("Token expired")
+        except jwt.PyJWTError:
+            raise InvalidToken("Invalid token")
+
+    def verify(self, token: str) -> str:
+        """Verify a token and return its user id"""
+        return self.decode(token)[0]
+
+    def stream_grant(self, token: str) -> StreamGrant:
+        """Grant for a stream authenticated directly with an access token (Authorization header)"""
+        return StreamGrant(*self.decode(token))
+
+    def issue_stream_ticket(self, token: str, ttl_seconds: int = 30) -> str:
+        """Short-lived ticket for opening notification streams on behalf of an access token"""
+        user_id, jti, exp = self.decode(token)
+        now = int(time.time())
+        claims = {
+            "sub": user_id,
+            "iat": now,
+            "exp": min(now + ttl_seconds, int(exp)),
+            "jti": uuid.uuid4().hex,
+            "iss": ISSUER,
+            "aud": STREAM_AUDIENCE,
+            "access_jti": jti,
+            "access_exp": exp,
+        }
+        return jwt.encode(claims, self.keys[self.active_kid], algorithm=ALGORITHM, headers={"kid": self.active_kid})
+
+    def verify_stream_ticket(self, ticket: str) -> StreamGrant:
+        claims = self._decode_claims(
+            ticket, audience=STREAM_AUDIENCE, require=("sub", "exp", "jti", "aud", "access_jti", "access_exp")
+        )
+        grant = StreamGrant(claims["sub"], claims["access_jti"], float(claims["access_exp"]))
+        if not self.is_active(grant):
+            raise InvalidToken("Token revoked")
+        return grant
+
+    def is_active(self, grant: StreamGrant) -> bool:
+        """Whether the access token behind a stream is still unexpired and unrevoked; O(1), no I/O"""
+        return grant.access_exp > time.time() and grant.access_jti not in self.revocations
+
+    async def revoke(self, token: str) -> None:
+        _, jti, exp = self.decode(token)
+        self._cache.pop(token, None)
+        await self.revocations.revoke(jti, exp)
+
+
+def load_signing_keys() -> Tuple[Dict[str, str], str]:
+    """Read (keys, active kid) from JWT_SIGNING_KEYS / JWT_ACTIVE_KID or JWT_SECRET"""
+    configured = os.getenv('JWT_SIGNING_KEYS')
+    if configured:
+        keys = dict(item.strip().split(":", 1) for item in configured.split(",") if item.strip())
+        active_kid = os.getenv('JWT_ACTIVE_KID') or next(iter(keys))
+        return keys, active_kid
+    secret = os.getenv('JWT_SECRET')
+    if not secret:
+        logger.warning("JWT_SECRET not set - using a random key, tokens will not survive a restart")
+        secret = secrets.token_urlsafe(32)
+    return {"default": secret}, "default"
+
+
+def create_token_manager(db=None) -> TokenManager:
+    keys, active_kid = load_signing_keys()
+    return TokenManager(
+        keys,
+        active_kid,
+        ttl_seconds=int(os.getenv('JWT_TTL_SECONDS', 30 * 24 * 3600)),
+        cache_size=int(os.getenv('JWT_CACHE_SIZE', 10000)),
+        revocations=RevocationList(db)
+    )
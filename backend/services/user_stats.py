@@ -0,0 +1,211 @@
+"""
+Materialized per-user counters
+One `user_stats` document per user (keyed by user id) is kept up to date
+with atomic $inc updates on every write that changes a count, so dashboard
+reads are a single _id lookup. A user's document is first created by a full
+count, never by an $inc, so users who predate the counters get complete
+numbers. Writers call ensure() before the write they count: the document
+then exists before the row is written, and every row lands in exactly one
+of the seed count or an $inc. The counters can always be rebuilt from the
+source collections:
+
+    python -m services.user_stats                 # reconcile every user
+    python -m services.user_stats --user <id>     # reconcile one user
+"""
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "user_stats"
+COUNTERS = ("applications", "fees_paid", "documents", "notifications", "unread_notifications")
+REBUILD_ATTEMPTS = 5
+
+
+async def ensure(db, user_id: str, session=None) -> None:
+    """Seed a user's counters if they don't exist yet; call before the write being counted"""
+    if await db[COLLECTION].find_one({"_id": user_id}, {"_id": 1}, session=session) is None:
+        await seed(db, user_id, session=session)
+
+
+async def ensure_many(db, user_ids, session=None) -> None:
+    """ensure() for many users with one lookup"""
+    user_ids = list(user_ids)
+    seeded = await db[COLLECTION].distinct("_id", {"_id": {"$in": user_ids}}, session=session)
+    for user_id in set(user_ids) - set(seeded):
+        await seed(db, user_id, session=session)
+
+
+async def seed(db, user_id: str, session=None) -> Optional[dict]:
+    """
+    Create a user's counters from a full count. Returns None when another
+    writer seeded them first; that count stands, and recounting here could
+    take in a concurrent write whose $inc has not landed yet.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    stats = await _count(db, user_id, session=session)
+    try:
+        await db[COLLECTION].insert_one({"_id": user_id, **stats, "version": 0}, session=session)
+    except DuplicateKeyError:
+        return None
+    return stats
+
+
+async def increment(db, user_id: str, session=None, **deltas: int) -> None:
+    """
+    Atomically adjust counters. A caller that skipped ensure() gets the user
+    rebuilt from the source collections instead, which already include the
+    write being counted.
+    """
+    result = await db[COLLECTION].update_one(
+        {"_id": user_id},
+        {"$inc": {**deltas, "version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        session=session
+    )
+    if result.matched_count == 0:
+        await rebuild(db, user_id, session=session)
+
+
+async def increment_many(db, deltas_by_user: Dict[str, Dict[str, int]], session=None) -> None:
+    """increment() for many users in a single bulk_write"""
+    from pymongo import UpdateOne
+
+    if not deltas_by_user:
+        return
+    now = datetime.utcnow()
+    result = await db[COLLECTION].bulk_write(
+        [
+            UpdateOne({"_id": user_id}, {"$inc": {**deltas, "version": 1}, "$set": {"updated_at": now}})
+            for user_id, deltas in deltas_by_user.items()
+        ],
+        ordered=False,
+        session=session
+    )
+    if result.matched_count < len(deltas_by_user):
+        seeded = await db[COLLECTION].distinct("_id", {"_id": {"$in": list(deltas_by_user)}}, session=session)
+        for user_id in set(deltas_by_user) - set(seeded):
+            await rebuild(db, user_id, session=session)
+
+
+async def _count(db, user_id: str, session=None) -> dict:
+    application_totals = await db.applications.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "fees": {"$sum": "$fee"}}}
+    ], session=session).to_list(1)
+    documents = await db.documents.count_documents({"user_id": user_id}, session=session)
+    notification_totals = await db.notifications.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "unread": {"$sum": {"$cond": [{"$eq": ["$read", False]}, 1, 0]}}
+        }}
+    ], session=session).to_list(1)
+    return {
+        "applications": application_totals[0]["count"] if application_totals else 0,
+        "fees_paid": application_totals[0]["fees"] if application_totals else 0,
+        "documents": documents,
+        "notifications": notification_totals[0]["count"] if notification_totals else 0,
+        "unread_notifications": notification_totals[0]["unread"] if notification_totals else 0,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+async def rebuild(db, user_id: str, session=None) -> dict:
+    """
+    Recompute one user's counters from the source collections.
+    Every increment bumps the document's version, and the recount is only
+    written if the version is unchanged, so it never overwrites an increment
+    that landed while counting; on a conflict the counts are taken again.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    stats = None
+    for _ in range(REBUILD_ATTEMPTS):
+        current = await db[COLLECTION].find_one({"_id": user_id}, {"version": 1}, session=session)
+        stats = await _count(db, user_id, session=session)
+        if current is None:
+            try:
+                await db[COLLECTION].insert_one({"_id": user_id, **stats, "version": 0}, session=session)
+                return stats
+            except DuplicateKeyError:
+                continue  # seeded concurrently; recount against that version
+        version = current.get("version", 0)
+        result = await db[COLLECTION].replace_one(
+            # None also matches documents written before versions existed
+            {"_id": user_id, "version": current.get("version")},
+            {**stats, "version": version + 1},
+            session=session
+        )
+        if result.matched_count:
+            return stats
+    logger.warning(f"Counters for user {user_id} kept changing, rebuild gave up after {REBUILD_ATTEMPTS} attempts")
+    return stats
+
+
+async def get_stats(db, user_id: str) -> dict:
+    """Read a user's counters; users without a stats document are backfilled on first read"""
+    stats = await db[COLLECTION].find_one({"_id": user_id})
+    if stats is None:
+        stats = await seed(db, user_id) or await db[COLLECTION].find_one({"_id": user_id})
+    return {counter: stats.get(counter, 0) for counter in COUNTERS}
+
+
+async def reconcile_all(db, concurrency: int = 8) -> int:
+    """Rebuild counters for every user; returns the number of users processed"""
+    semaphore = asyncio.Semaphore(concurrency)
+    processed = 0
+
+    async def reconcile(user_id: str) -> None:
+        nonlocal processed
+        async with semaphore:
+            await rebuild(db, user_id)
+            processed += 1
+
+    pending = set()
+    async for user in db.users.find({}, {"_id": 0, "id": 1}):
+        pending.add(asyncio.create_task(reconcile(user["id"])))
+        if len(pending) >= concurrency * 4:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    if pending:
+        await asyncio.gather(*pending)
+    return processed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild materialized per-user counters")
+    parser.add_argument("--user", help="only reconcile this user id")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run() -> Optional[int]:
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            if args.user:
+                await rebuild(db, args.user)
+                return 1
+            return await reconcile_all(db, concurrency=args.concurrency)
+        finally:
+            client.close()
+
+    processed = asyncio.run(run())
+    logger.info(f"Reconciled counters for {processed} users")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
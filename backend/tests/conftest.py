@@ -0,0 +1,63 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+# Tests import backend modules the way server.py does (services.*, database.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DB_NAME', 'test_database')
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """server.py on an in-memory mongomock database, imported once per session"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from database import client
+
+    os.environ.update(
+        NODE_ENV='development',
+        DEFAULT_CENTER_ID='c1',
+        CENTER_IDS='c2',
+        BLOB_STORE='local',
+        BLOB_STORE_PATH=str(tmp_path_factory.mktemp("blobs")),
+        OTP_STORE='memory',
+        # No worker processes: tests drive the tagger and image pipeline directly
+        TAGGING_WORKERS='0',
+        IMAGE_WORKERS='0',
+    )
+    client.configure(client=mongomock_motor.AsyncMongoMockClient())
+    import server
+    return server
+
+
+@pytest.fixture
+def api(server):
+    """
+    Runs `async def scenario(http)` against the app on an empty database, with
+    the lifespan (indexes, background services) started around it.
+    """
+    import httpx
+    from database import transactions
+
+    async def serve(scenario):
+        await server.client.drop_database(server.database.name)
+        async with server.app.router.lifespan_context(server.app):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return await scenario(http)
+
+    # mongomock has no sessions; use the standalone-server write path
+    transactions.set_transactions_supported(False)
+    yield lambda scenario: asyncio.run(serve(scenario))
+    transactions.set_transactions_supported(None)
+
+
+@pytest.fixture
+def login(server):
+    """Creates a user row and returns (user_id, Authorization headers) for it"""
+    async def create(phone="+919000000001", **fields):
+        user = server.User(phone=phone, **fields)
+        await server.critical_db.users.insert_one(user.model_dump())
+        return user.id, {"Authorization": f"Bearer {server.token_manager.issue(user.id)}"}
+    return create
@@ -0,0 +1,219 @@
+import uuid
+import asyncio
+from datetime import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pydantic import BaseModel, Field
+
+from database import transactions
+from services import application_workflow as workflow
+from services import user_stats
+
+
+class Notification(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    title: str
+    message: str
+    type: str
+    read: bool = False
+
+
+@pytest.fixture(autouse=True)
+def no_transactions():
+    # mongomock has no sessions; use the standalone-server write path
+    transactions.set_transactions_supported(False)
+    yield
+    transactions.set_transactions_supported(None)
+
+
+@pytest.fixture
+def mongo():
+    client = AsyncMongoMockClient()
+    return client, client["test_database"]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def application(app_id, status="pending", center_id="c1", user_id="u1", **extra):
+    return {
+        "id": app_id, "user_id": user_id, "service_name": "Ration Card", "status": status,
+        "center_id": center_id, "priority": 0, "created_at": datetime(2024, 1, 1), **extra,
+    }
+
+
+@pytest.mark.parametrize("current,target,allowed", [
+    ("pending", "processing", True),
+    ("pending", "rejected", True),
+    ("pending", "completed", False),
+    ("processing", "completed", True),
+    ("processing", "pending", True),
+    ("completed", "processing", False),
+    ("rejected", "pending", False),
+    ("unknown", "pending", False),
+])
+def test_can_transition(current, target, allowed):
+    assert workflow.can_transition(current, target) is allowed
+
+
+def test_apply_transitions_reports_each_item(mongo):
+    client, db = mongo
+
+    async def scenario():
+        await db.applications.insert_many([
+            application("a1"), application("a2"), application("a3", status="completed"),
+        ])
+        result = await workflow.apply_transitions(db, client, [
+            workflow.Transition("a1", "processing"),
+            workflow.Transition("a2", "rejected", note="Blurred scan."),
+            workflow.Transition("a3", "processing"),
+            workflow.Transition("missing", "processing"),
+        ], Notification, operator_id="op1")
+
+        assert sorted(result.updated) == ["a1", "a2"]
+        assert {f["application_id"]: f["reason"] for f in result.failed} == {
+            "a3": "invalid_transition: completed -> processing",
+            "missing": "not_found",
+        }
+        a1 = await db.applications.find_one({"id": "a1"})
+        assert a1["status"] == "processing"
+        assert a1["status_history"][-1]["from"] == "pending" and a1["status_history"][-1]["by"] == "op1"
+
+        # One notification per accepted transition, with the note appended
+        assert len(result.notifications) == 2
+        rejected = next(n for n in result.notifications if n["title"] == "Application Rejected")
+        assert rejected["message"].endswith("Blurred scan.")
+        assert await db.notifications.count_documents({"user_id": "u1"}) == 2
+        stats = await user_stats.get_stats(db, "u1")
+        assert stats["notifications"] == 2 and stats["unread_notifications"] == 2
+    run(scenario())
+
+
+def test_scope_hides_other_centers(mongo):
+    client, db = mongo
+
+    async def scenario():
+        await db.applications.insert_many([application("a1", center_id="c1"), application("a2", center_id="c2")])
+        result = await workflow.apply_transitions(db, client, [
+            workflow.Transition("a1", "processing"),
+            workflow.Transition("a2", "processing"),
+        ], Notification, operator_id="op1", scope={"center_id": "c1"})
+        assert result.updated == ["a1"]
+        assert result.failed == [{"application_id": "a2", "reason": "not_found"}]
+        assert (await db.applications.find_one({"id": "a2"}))["status"] == "pending"
+    run(scenario())
+
+
+def test_last_request_for_an_application_wins(mongo):
+    client, db = mongo
+
+    async def scenario():
+        await db.applications.insert_one(application("a1"))
+        result = await workflow.apply_transitions(db, client, [
+            workflow.Transition("a1", "processing"),
+            workflow.Transition("a1", "rejected"),
+        ], Notification)
+        assert result.updated == ["a1"]
+        assert (await db.applications.find_one({"id": "a1"}))["status"] == "rejected"
+    run(scenario())
+
+
+def test_returning_to_the_queue_unassigns_the_operator(mongo):
+    client, db = mongo
+
+    async def scenario():
+        await db.applications.insert_one(application("a1", status="processing", assigned_operator="op1"))
+        await workflow.apply_transitions(db, client, [workflow.Transition("a1", "pending")], Notification)
+        assert (await db.applications.find_one({"id": "a1"}))["assigned_operator"] is None
+    run(scenario())
+
+
+def test_concurrent_change_is_reported_as_conflict(mongo, monkeypatch):
+    client, db = mongo
+
+    async def scenario():
+        await db.applications.insert_many([application("a1"), application("a2")])
+        original_run_in_transaction = workflow.run_in_transaction
+
+        async def run_after_other_operator(client, callback):
+            # Another operator rejects a2 between validation and the write
+            await db.applications.update_one({"id": "a2"}, {"$set": {"status": "rejected"}})
+            return await original_run_in_transaction(client, callback)
+        monkeypatch.setattr(workflow, "run_in_transaction", run_after_other_operator)
+
+        result = await workflow.apply_transitions(db, client, [
+            workflow.Transition("a1", "processing"),
+            workflow.Transition("a2", "processing"),
+        ], Notification)
+        assert result.updated == ["a1"]
+        assert result.failed == [{"application_id": "a2", "reason": "conflict"}]
+        assert len(result.notifications) == 1
+    run(scenario())
+
+
+class ServerSideClaims:
+    """
+    mongomock's find_one_and_update updates the first match in insertion order
+    whatever the sort, and returns None for an AFTER image projected without
+    _id. Emulates the server for the queue: pick by sort, update, project.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def find_one_and_update(self, query, update, sort, projection, return_document, session=None):
+        rows = await self.collection.find(query).sort(sort).limit(1).to_list(1)
+        if not rows:
+            return None
+        await self.collection.update_one({"_id": rows[0]["_id"]}, update)
+        return await self.collection.find_one({"_id": rows[0]["_id"]}, projection)
+
+
+class QueueDatabase:
+    def __init__(self, db):
+        self.db = db
+        self.applications = ServerSideClaims(db.applications)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+
+def test_claims_follow_priority_then_age_within_the_center(mongo):
+    client, db = mongo
+    queue = QueueDatabase(db)
+
+    async def scenario():
+        await db.applications.insert_many([
+            application("old", created_at=datetime(2024, 1, 1)),
+            application("urgent", priority=1, created_at=datetime(2024, 1, 3)),
+            application("new", created_at=datetime(2024, 1, 2), user_id="u2"),
+            application("elsewhere", center_id="c2", priority=5),
+            application("done", status="completed", priority=5),
+        ])
+        claims = [
+            await workflow.claim_next(queue, client, "c1", operator, Notification)
+            for operator in ("op1", "op2", "op3", "op4")
+        ]
+        claimed = [app["id"] if app else None for app, _ in claims]
+        assert claimed == ["urgent", "old", "new", None]
+
+        urgent, notifications = claims[0]
+        assert urgent["status"] == "processing" and urgent["assigned_operator"] == "op1"
+        assert "status_history" not in urgent
+        assert [n["user_id"] for n in notifications] == ["u1"]
+        assert claims[3] == (None, [])
+
+        stored = await db.applications.find_one({"id": "urgent"})
+        assert stored["status_history"][-1]["from"] == "pending" and stored["status_history"][-1]["by"] == "op1"
+        assert (await db.applications.find_one({"id": "elsewhere"}))["status"] == "pending"
+        assert (await user_stats.get_stats(db, "u2"))["unread_notifications"] == 1
+    run(scenario())
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from services.auto_tagging import AUTO_TYPE, OTHER_TYPE, DocumentTagger
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Catalog:
+    def document_types(self):
+        return {"identity_proof": "Aadhaar card or voter ID", "address_proof": "Electricity bill"}
+
+
+@pytest.fixture
+def tagger():
+    db = AsyncMongoMockClient()["test_database"]
+    # No executor: classification runs in the default thread pool instead of worker processes
+    return db, DocumentTagger(db, blob_store=None, catalog=Catalog())
+
+
+def pending(document_id, name, doc_type=AUTO_TYPE):
+    return {"id": document_id, "name": name, "type": doc_type, "content_type": "application/pdf",
+            "tagging_status": "pending"}
+
+
+def test_auto_uploads_take_the_label_or_fall_back_to_other(tagger):
+    db, tagger = tagger
+
+    async def scenario():
+        await db.documents.insert_many([
+            pending("d1", "aadhaar card.pdf"),
+            pending("d2", "scan_0001.pdf"),
+            pending("d3", "scan_0002.pdf", doc_type="income_certificate"),
+        ])
+        await tagger.process(["d1", "d2", "d3"])
+        return {doc["id"]: doc async for doc in db.documents.find({}, {"_id": 0})}
+
+    docs = run(scenario())
+    assert docs["d1"]["type"] == "identity_proof" and docs["d1"]["auto_tagged"]
+    assert docs["d2"]["type"] == OTHER_TYPE and docs["d2"]["tagging_status"] == "unrecognized"
+    # A type chosen by the owner is never overwritten
+    assert docs["d3"]["type"] == "income_certificate"
+    assert all("tagging_claim" not in doc for doc in docs.values())
+
+
+def test_recover_backfills_finished_auto_documents(tagger):
+    db, tagger = tagger
+
+    async def scenario():
+        tagger.queue = asyncio.Queue()
+        await db.documents.insert_many([
+            {"id": "d1", "type": AUTO_TYPE, "tagging_status": "failed"},
+            {"id": "d2", "type": AUTO_TYPE, "tagging_status": "pending"},
+        ])
+        await tagger.recover()
+        return {doc["id"]: doc["type"] async for doc in db.documents.find({})}, tagger.queue.qsize()
+
+    types, queued = run(scenario())
+    assert types == {"d1": OTHER_TYPE, "d2": AUTO_TYPE}
+    assert queued == 1
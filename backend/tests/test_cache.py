@@ -0,0 +1,124 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from services import cache as cache_module
+from services.cache import CacheBackend, MemoryCacheBackend, ReadThroughCache, RedisCacheBackend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+BACKENDS = [MemoryCacheBackend, lambda: RedisCacheBackend(fakeredis.FakeAsyncRedis())]
+
+
+class CountingLoader:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    async def __call__(self, key):
+        self.calls += 1
+        return self.rows.get(key)
+
+
+@pytest.mark.parametrize("make_backend", BACKENDS)
+def test_read_through_loads_once(make_backend):
+    async def scenario():
+        loader = CountingLoader({"u1": {"name": "Asha"}})
+        cache = ReadThroughCache("profile", make_backend(), loader)
+        assert await cache.get("u1") == {"name": "Asha"}
+        assert await cache.get("u1") == {"name": "Asha"}
+        assert loader.calls == 1
+        # Missing rows are not cached
+        assert await cache.get("nobody") is None
+        assert await cache.get("nobody") is None
+        assert loader.calls == 3
+    run(scenario())
+
+
+@pytest.mark.parametrize("make_backend", BACKENDS)
+def test_invalidate_reloads_from_the_source(make_backend):
+    async def scenario():
+        loader = CountingLoader({"u1": {"name": "Asha"}})
+        cache = ReadThroughCache("profile", make_backend(), loader)
+        await cache.get("u1")
+        loader.rows["u1"] = {"name": "Asha K"}
+        await cache.invalidate("u1")
+        assert await cache.get("u1") == {"name": "Asha K"}
+        assert loader.calls == 2
+    run(scenario())
+
+
+@pytest.mark.parametrize("make_backend", BACKENDS)
+def test_set_writes_through(make_backend):
+    async def scenario():
+        loader = CountingLoader({})
+        cache = ReadThroughCache("profile", make_backend(), loader)
+        await cache.set("u1", {"name": "Asha"})
+        assert await cache.get("u1") == {"name": "Asha"}
+        assert loader.calls == 0
+    run(scenario())
+
+
+def test_shared_backend_invalidation_is_seen_by_every_worker():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        loader = CountingLoader({"u1": {"role": "operator"}})
+        worker_a = ReadThroughCache("profile", RedisCacheBackend(fakeredis.FakeAsyncRedis(server=server)), loader)
+        worker_b = ReadThroughCache("profile", RedisCacheBackend(fakeredis.FakeAsyncRedis(server=server)), loader)
+        await worker_a.get("u1")
+        loader.rows["u1"] = {"role": "citizen"}
+        await worker_b.invalidate("u1")
+        assert await worker_a.get("u1") == {"role": "citizen"}
+    run(scenario())
+
+
+def test_entries_expire(monkeypatch):
+    async def scenario():
+        now = [1000.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        backend = MemoryCacheBackend()
+        await backend.set("k", "v", ttl=10)
+        now[0] += 9
+        assert await backend.get("k") == "v"
+        now[0] += 2
+        assert await backend.get("k") is None
+        assert len(backend) == 0
+    run(scenario())
+
+
+def test_memory_backend_evicts_least_recently_used():
+    async def scenario():
+        backend = MemoryCacheBackend(max_entries=2)
+        await backend.set("a", 1, ttl=60)
+        await backend.set("b", 2, ttl=60)
+        await backend.get("a")
+        await backend.set("c", 3, ttl=60)
+        assert await backend.get("b") is None
+        assert await backend.get("a") == 1 and await backend.get("c") == 3
+    run(scenario())
+
+
+class BrokenBackend(CacheBackend):
+    async def get(self, key):
+        raise ConnectionError("cache down")
+
+    async def set(self, key, value, ttl):
+        raise ConnectionError("cache down")
+
+    async def delete(self, key):
+        raise ConnectionError("cache down")
+
+
+def test_cache_outage_falls_back_to_the_source():
+    async def scenario():
+        loader = CountingLoader({"u1": {"name": "Asha"}})
+        cache = ReadThroughCache("profile", BrokenBackend(), loader)
+        assert await cache.get("u1") == {"name": "Asha"}
+        await cache.set("u1", {"name": "Asha"})
+        # A committed write must not fail because its invalidation could not reach the cache
+        await cache.invalidate("u1")
+    run(scenario())
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from services.catalog import ServiceCatalog, etag_matches
+
+SERVICES = [
+    {"id": "a", "name": "Birth certificate", "fee": 50, "required_documents": [
+        {"type": "identity_proof", "name": "Aadhaar", "description": "Aadhaar card"},
+    ]},
+    {"id": "b", "name": "Ration card", "fee": 0, "required_documents": [
+        {"type": "identity_proof", "name": "Voter ID", "description": ""},
+        {"type": "address_proof", "name": "Electricity bill", "description": ""},
+    ]},
+]
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"v1"', True),
+    ('W/"v1"', True),
+    ('"v0", "v1"', True),
+    ("*", True),
+    ('"v2"', False),
+])
+def test_if_none_match_uses_weak_comparison(header, expected):
+    assert etag_matches(header, '"v1"') is expected
+
+
+def test_bodies_and_etags_are_built_once_per_version():
+    catalog = ServiceCatalog(SERVICES)
+    body, etag = catalog.list_response()
+    assert json.loads(body) == SERVICES
+    service_body, service_etag = catalog.service_response("b")
+    assert json.loads(service_body) == SERVICES[1] and service_etag != etag
+    assert catalog.service_response("missing") is None
+    assert set(catalog.document_types()) == {"identity_proof", "address_proof"}
+
+
+def test_reload_changes_the_etag_only_when_content_changes():
+    catalog = ServiceCatalog(SERVICES)
+    _, etag = catalog.list_response()
+    assert not catalog.load([dict(service) for service in SERVICES])
+    assert catalog.list_response()[1] == etag
+
+    assert catalog.load([{**SERVICES[0], "fee": 60}, SERVICES[1]])
+    assert catalog.list_response()[1] != etag
+    # The unchanged service keeps its ETag
+    assert catalog.service_response("b") == ServiceCatalog(SERVICES).service_response("b")
+
+
+def test_conditional_requests_get_304(server, api):
+    async def scenario(http):
+        first = await http.get("/api/services")
+        etag = first.headers["etag"]
+        revalidated = await http.get("/api/services", headers={"If-None-Match": etag})
+        stale = await http.get("/api/services", headers={"If-None-Match": '"outdated"'})
+        service_id = first.json()[0]["id"]
+        detail = await http.get(f"/api/services/{service_id}")
+        detail_revalidated = await http.get(f"/api/services/{service_id}", headers={"If-None-Match": detail.headers["etag"]})
+        missing = await http.get("/api/services/missing")
+        return first, revalidated, stale, detail, detail_revalidated, missing
+
+    first, revalidated, stale, detail, detail_revalidated, missing = api(scenario)
+    assert first.status_code == 200 and "max-age=" in first.headers["cache-control"]
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["etag"] == first.headers["etag"]
+    assert stale.status_code == 200 and stale.content == first.content
+    assert detail.json() == first.json()[0]
+    assert detail_revalidated.status_code == 304
+    assert missing.status_code == 404
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from services.centers import CenterDirectory, UnknownCenter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_listed_centers_and_the_default_are_accepted():
+    centers = CenterDirectory(["c1", "c2"], default_center_id="c0")
+    assert centers.resolve("c2") == "c2"
+    assert centers.resolve("c0") == "c0"
+    assert centers.resolve(None) == "c0"
+
+
+def test_unlisted_center_is_rejected():
+    centers = CenterDirectory(["c1"], default_center_id="c0")
+    with pytest.raises(UnknownCenter, match="other-center"):
+        centers.resolve("other-center")
+
+
+def test_no_default_means_a_center_must_be_chosen():
+    centers = CenterDirectory(["c1"])
+    assert centers.resolve("c1") == "c1"
+    with pytest.raises(UnknownCenter, match="DEFAULT_CENTER_ID"):
+        centers.resolve(None)
+
+
+def test_backfill_routes_center_less_applications_to_the_default():
+    db = AsyncMongoMockClient()["test_database"]
+
+    async def scenario():
+        await db.applications.insert_many([
+            {"id": "a1", "center_id": None}, {"id": "a2"}, {"id": "a3", "center_id": "c1"},
+        ])
+        moved = await CenterDirectory([], default_center_id="c0").backfill(db)
+        assert await CenterDirectory([]).backfill(db) == 0
+        return moved, {app["id"]: app["center_id"] async for app in db.applications.find({})}
+
+    moved, centers = run(scenario())
+    assert moved == 2
+    assert centers == {"a1": "c0", "a2": "c0", "a3": "c1"}
@@ -0,0 +1,29 @@
+from pymongo import ReadPreference
+from pymongo.read_preferences import SecondaryPreferred
+
+from database.client import Database
+
+
+def test_list_reads_default_to_the_primary(monkeypatch):
+    monkeypatch.delenv('MONGO_LIST_READ_PREFERENCE', raising=False)
+    options = Database("mongodb://unused", "test_database", client=object())._options("list")
+    assert options["read_preference"] == ReadPreference.PRIMARY
+
+
+def test_secondary_list_reads_are_opt_in(monkeypatch):
+    monkeypatch.setenv('MONGO_LIST_READ_PREFERENCE', 'secondaryPreferred')
+    monkeypatch.setenv('MONGO_MAX_STALENESS_SECONDS', '120')
+    options = Database("mongodb://unused", "test_database", client=object())._options("list")
+    assert options["read_preference"] == SecondaryPreferred(max_staleness=120)
+
+
+def test_unknown_read_preference_falls_back_to_the_primary(monkeypatch):
+    monkeypatch.setenv('MONGO_LIST_READ_PREFERENCE', 'fastest')
+    options = Database("mongodb://unused", "test_database", client=object())._options("list")
+    assert options["read_preference"] == ReadPreference.PRIMARY
+
+
+def test_critical_writes_wait_for_a_journaled_majority(monkeypatch):
+    monkeypatch.delenv('MONGO_WRITE_CONCERN_CRITICAL', raising=False)
+    write_concern = Database("mongodb://unused", "test_database", client=object())._options("critical")["write_concern"]
+    assert write_concern.document == {"w": "majority", "j": True}
@@ -0,0 +1,74 @@
+import runpy
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from services import deployment
+from services.deployment import MissingSettingError, ProcessLocalStateError, check_deployment, worker_count
+
+
+class Adapter:
+    def __init__(self, is_shared):
+        self.is_shared = is_shared
+
+
+@pytest.fixture
+def argv(monkeypatch):
+    def set_argv(*args):
+        monkeypatch.setattr(deployment.sys, "argv", list(args))
+    set_argv("pytest")
+    return set_argv
+
+
+def test_worker_count_defaults_to_one(monkeypatch, argv):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert worker_count() == 1
+
+
+def test_worker_count_from_web_concurrency(monkeypatch, argv):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert worker_count() == 4
+
+
+@pytest.mark.parametrize("command", [
+    ("/venv/bin/uvicorn", "server:app", "--workers", "3"),
+    ("/venv/lib/python3.11/site-packages/uvicorn/__main__.py", "server:app", "--workers=3"),
+])
+def test_worker_count_from_uvicorn_command_line(monkeypatch, argv, command):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    argv(*command)
+    assert worker_count() == 3
+
+
+def test_other_commands_are_not_parsed(monkeypatch, argv):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    argv("/venv/bin/some-tool", "--workers", "8")
+    assert worker_count() == 1
+
+
+def test_gunicorn_exports_the_arbiter_worker_count(monkeypatch, argv):
+    # Recorded by monkeypatch, so the value on_starting exports is undone afterwards
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    config = runpy.run_path(str(Path(deployment.__file__).parent.parent / "gunicorn.conf.py"))
+    # e.g. "gunicorn -c gunicorn.conf.py -w 6" overrides the config value
+    config["on_starting"](SimpleNamespace(cfg=SimpleNamespace(workers=6)))
+    assert worker_count() == 6
+
+
+def test_multi_worker_refuses_process_local_state():
+    with pytest.raises(ProcessLocalStateError, match="OTP_STORE uses process-local Adapter"):
+        check_deployment({"OTP_STORE": Adapter(False), "CACHE_BACKEND": Adapter(True)}, {}, workers=2)
+    with pytest.raises(ProcessLocalStateError, match="JWT_SECRET is not set"):
+        check_deployment({}, {"JWT_SECRET": False}, workers=2)
+
+
+def test_shared_state_or_single_worker_boots():
+    check_deployment({"OTP_STORE": Adapter(True), "RATE_LIMIT_BACKEND": None}, {"JWT_SECRET": True}, workers=4)
+    check_deployment({"OTP_STORE": Adapter(False)}, {"JWT_SECRET": False}, workers=1)
+
+
+def test_required_settings_fail_even_a_single_worker():
+    with pytest.raises(MissingSettingError, match="DEFAULT_CENTER_ID"):
+        check_deployment({}, {}, workers=1, required={"DEFAULT_CENTER_ID": False})
+    check_deployment({}, {}, workers=1, required={"DEFAULT_CENTER_ID": True})
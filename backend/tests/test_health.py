@@ -0,0 +1,84 @@
+import time
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+pytest.importorskip("psutil")
+
+from monitoring import health  # noqa: E402
+from monitoring.health import HealthMonitor  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Admin:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.pings = 0
+
+    async def command(self, name):
+        self.pings += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {"ok": 1}
+
+
+class Client:
+    def __init__(self, **kwargs):
+        self.admin = Admin(**kwargs)
+
+
+def sampled(client=None, **kwargs) -> HealthMonitor:
+    monitor = HealthMonitor(**kwargs)
+    if client is not None:
+        monitor.attach(client)
+    run(monitor.sample())
+    return monitor
+
+
+def test_ready_after_a_sample_that_reached_the_database():
+    monitor = sampled(Client())
+    assert monitor.snapshot["database"] == "connected"
+    assert monitor.is_ready
+
+
+def test_unreachable_or_slow_database_is_not_ready():
+    assert sampled(Client(error=ConnectionError("down"))).snapshot["database"] == "unreachable"
+    slow = sampled(Client(delay=1.0), db_timeout=0.01)
+    assert slow.snapshot["database"] == "unreachable" and not slow.is_ready
+
+
+def test_stale_snapshot_is_not_ready():
+    monitor = HealthMonitor(interval=15.0)
+    assert monitor.is_stale and not monitor.is_ready
+    monitor.snapshot = {"sampled_at": time.time() - 46, "database": "connected", "system": {}}
+    assert monitor.is_stale and not monitor.is_ready
+
+
+def test_probes_read_the_snapshot_without_pinging(monkeypatch):
+    client = Client()
+    monitor = sampled(client)
+    monkeypatch.setattr(health, "health_monitor", monitor)
+    app = FastAPI()
+    app.include_router(health.router)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://x") as http:
+            ready = await http.get("/health/ready")
+            detailed = await http.get("/health/detailed")
+            monitor.snapshot["database"] = "unreachable"
+            not_ready = await http.get("/health/ready")
+            return ready, detailed, not_ready
+
+    ready, detailed, not_ready = run(scenario())
+    assert ready.status_code == 200 and ready.json()["status"] == "ready"
+    assert detailed.status_code == 200 and detailed.json()["database"]["status"] == "connected"
+    assert not_ready.status_code == 503 and not_ready.json()["database"] == "unreachable"
+    # Only the sample itself touched the database
+    assert client.admin.pings == 1
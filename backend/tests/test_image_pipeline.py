@@ -0,0 +1,120 @@
+import io
+import random
+import asyncio
+from datetime import timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+Image = pytest.importorskip("PIL.Image")
+
+from services.image_pipeline import DocumentImageProcessor  # noqa: E402
+from services.storage import BlobNotFound, BytesSource, ContentAddressedStore, LocalBlobStore  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def noisy_png(size=400) -> bytes:
+    # Noise compresses badly as PNG, so the JPEG rendition is always smaller
+    rng = random.Random(1)
+    image = Image.frombytes("RGB", (size, size), bytes(rng.getrandbits(8) for _ in range(size * size * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    db = AsyncMongoMockClient()["test_database"]
+    blobs = LocalBlobStore(str(tmp_path), chunk_size=64 * 1024)
+    store = ContentAddressedStore(blobs, db)
+    # No executor: Pillow runs in the default thread pool instead of worker processes
+    processor = DocumentImageProcessor(db, blobs, max_dimension=200, retire_grace_seconds=0)
+    return db, blobs, store, processor
+
+
+def blob_files(blobs):
+    return {path for path in blobs.root.rglob("*") if path.is_file() and path.suffix != ".type"}
+
+
+def test_compressed_version_replaces_the_original_through_the_ref(pipeline):
+    db, blobs, store, processor = pipeline
+
+    async def scenario():
+        original = await store.put(BytesSource(noisy_png()), "scan.png", "image/png", scope="u1")
+        await db.documents.insert_one({"id": "d1", "content_hash": original.content_hash, "blob_id": original.blob_id})
+        await processor.process(original.content_hash)
+
+        ref = await store.get_ref(original.content_hash)
+        assert ref["blob_id"] != original.blob_id and ref["content_type"] == "image/jpeg"
+        assert ref["length"] < ref["original_length"] == original.length
+        assert set(ref["thumbnails"]) == {"small", "medium"}
+        document = await db.documents.find_one({"id": "d1"})
+        assert document["blob_id"] == ref["blob_id"] and document["size"] == ref["length"]
+
+        # The original stays readable until retired blobs are collected
+        assert (await blobs.stat(original.blob_id)).length == original.length
+        assert await processor.collect_garbage() == 1
+        with pytest.raises(BlobNotFound):
+            await blobs.stat(original.blob_id)
+
+        # Uploading the same bytes again reuses the compressed version
+        again = await store.put(BytesSource(noisy_png()), "again.png", "image/png", scope="u1")
+        assert again.blob_id == ref["blob_id"] and again.content_type == "image/jpeg"
+    run(scenario())
+
+
+def test_retired_blobs_wait_for_the_grace_period(pipeline):
+    db, blobs, store, processor = pipeline
+    processor.retire_grace = timedelta(hours=1)
+
+    async def scenario():
+        original = await store.put(BytesSource(noisy_png()), "scan.png", "image/png", scope="u1")
+        await processor.process(original.content_hash)
+        assert await processor.collect_garbage() == 0
+        assert (await blobs.stat(original.blob_id)).length == original.length
+    run(scenario())
+
+
+def test_content_released_while_processing_leaves_no_blobs(pipeline):
+    db, blobs, store, processor = pipeline
+
+    async def scenario():
+        original = await store.put(BytesSource(noisy_png()), "scan.png", "image/png", scope="u1")
+        read_all = blobs.read_all
+
+        async def read_then_release(blob_id):
+            data = await read_all(blob_id)
+            await store.release(original.content_hash)
+            return data
+        blobs.read_all = read_then_release
+
+        await processor.process(original.content_hash)
+        assert await store.get_ref(original.content_hash) is None
+        assert blob_files(blobs) == set()
+    run(scenario())
+
+
+def test_non_images_pass_through(pipeline):
+    db, blobs, store, processor = pipeline
+
+    async def scenario():
+        pdf = await store.put(BytesSource(b"%PDF-1.4 not an image"), "form.pdf", "application/pdf", scope="u1")
+        await processor.process(pdf.content_hash)
+        ref = await store.get_ref(pdf.content_hash)
+        assert ref["blob_id"] == pdf.blob_id and "processed_at" in ref and "thumbnails" not in ref
+    run(scenario())
+
+
+def test_images_over_the_size_limit_are_left_alone(pipeline):
+    db, blobs, store, processor = pipeline
+    processor.max_bytes = 1024
+
+    async def scenario():
+        original = await store.put(BytesSource(noisy_png()), "scan.png", "image/png", scope="u1")
+        await processor.process(original.content_hash)
+        ref = await store.get_ref(original.content_hash)
+        assert ref["blob_id"] == original.blob_id and "processed_at" in ref and "thumbnails" not in ref
+    run(scenario())
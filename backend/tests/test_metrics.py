@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from monitoring.metrics import (
+    MetricsMiddleware, MongoCommandMetrics, MongoPoolMetrics, Registry, http_request_duration_seconds,
+    http_requests_in_flight, http_requests_total, http_response_size_bytes, mongo_command_duration_seconds,
+    mongo_pool_checked_out, mongo_pool_checkout_failures_total, mongo_pool_connections, mongo_pool_waiting,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_registry_renders_the_exposition_format():
+    registry = Registry()
+    registry.counter("jobs_total", "Jobs", ("queue",)).labels('a"b').inc(2)
+    registry.histogram("job_seconds", "Job time", buckets=(0.1, 1.0)).labels().observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE jobs_total counter" in lines
+    assert 'jobs_total{queue="a\\"b"} 2' in lines
+    assert 'job_seconds_bucket{le="0.1"} 0' in lines
+    assert 'job_seconds_bucket{le="1"} 1' in lines
+    assert 'job_seconds_bucket{le="+Inf"} 1' in lines
+    assert "job_seconds_sum 0.5" in lines and "job_seconds_count 1" in lines
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+
+    @app.get("/metrics-test/items/{item_id}")
+    async def get_item(item_id: str):
+        if item_id == "missing":
+            raise HTTPException(status_code=404)
+        return {"id": item_id}
+
+    app.add_middleware(MetricsMiddleware)
+    route = "/metrics-test/items/{item_id}"
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://x") as client:
+            for path in ("/metrics-test/items/1", "/metrics-test/items/2", "/metrics-test/items/missing"):
+                await client.get(path)
+            await client.get("/metrics-test/nowhere")
+
+    run(scenario())
+    assert http_requests_total.labels("GET", route, "200").value == 2
+    assert http_requests_total.labels("GET", route, "404").value == 1
+    # Raw paths never become label values
+    assert "/metrics-test/items/1" not in "\n".join(http_requests_total.render())
+    assert http_requests_total.labels("GET", "unmatched", "404").value >= 1
+    assert http_request_duration_seconds.labels("GET", route).count == 3
+    assert http_response_size_bytes.labels("GET", route).sum > 0
+    assert http_requests_in_flight.labels().value == 0
+
+
+def test_command_listener_times_commands_by_outcome():
+    listener = MongoCommandMetrics()
+    listener.succeeded(SimpleNamespace(command_name="metricsTestFind", duration_micros=1500))
+    listener.failed(SimpleNamespace(command_name="metricsTestFind", duration_micros=250000))
+
+    success = mongo_command_duration_seconds.labels("metricsTestFind", "success")
+    failure = mongo_command_duration_seconds.labels("metricsTestFind", "failure")
+    assert (success.count, success.sum) == (1, 0.0015)
+    assert (failure.count, failure.sum) == (1, 0.25)
+
+
+def test_pool_listener_tracks_connections_and_checkouts():
+    listener = MongoPoolMetrics()
+    event = SimpleNamespace(address=("metrics-test", 27017))
+    address = "metrics-test:27017"
+
+    listener.pool_created(event)
+    listener.connection_created(event)
+    listener.connection_created(event)
+    listener.connection_check_out_started(event)
+    assert mongo_pool_waiting.labels(address).value == 1
+    listener.connection_checked_out(event)
+    listener.connection_check_out_started(event)
+    listener.connection_check_out_failed(SimpleNamespace(address=event.address, reason="timeout"))
+
+    assert mongo_pool_connections.labels(address).value == 2
+    assert mongo_pool_checked_out.labels(address).value == 1
+    assert mongo_pool_waiting.labels(address).value == 0
+    assert mongo_pool_checkout_failures_total.labels(address, "timeout").value == 1
+
+    listener.connection_checked_in(event)
+    listener.connection_closed(event)
+    assert mongo_pool_checked_out.labels(address).value == 0
+    assert mongo_pool_connections.labels(address).value == 1
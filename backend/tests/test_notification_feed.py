@@ -0,0 +1,98 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import OperationFailure
+
+from services.notification_feed import NotificationBroker, NotificationFeed
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_publish_reaches_every_connection_of_the_user_only():
+    async def scenario():
+        broker = NotificationBroker()
+        phone, laptop = broker.subscribe("u1"), broker.subscribe("u1")
+        other = broker.subscribe("u2")
+        assert broker.connection_count == 3
+        assert broker.publish("u1", {"title": "hi"}) == 2
+        assert phone.get_nowait() == {"title": "hi"} and laptop.get_nowait() == {"title": "hi"}
+        assert other.empty()
+        assert broker.publish("nobody", {"title": "hi"}) == 0
+    run(scenario())
+
+
+def test_unsubscribe_forgets_idle_users():
+    async def scenario():
+        broker = NotificationBroker()
+        queue = broker.subscribe("u1")
+        broker.unsubscribe("u1", queue)
+        broker.unsubscribe("u1", queue)
+        assert broker.connection_count == 0
+        assert broker.publish("u1", {"title": "hi"}) == 0
+    run(scenario())
+
+
+def test_slow_consumer_drops_its_oldest_message():
+    async def scenario():
+        broker = NotificationBroker(queue_size=2)
+        queue = broker.subscribe("u1")
+        for i in range(3):
+            broker.publish("u1", {"n": i})
+        assert [queue.get_nowait(), queue.get_nowait()] == [{"n": 1}, {"n": 2}]
+    run(scenario())
+
+
+def test_feed_without_change_streams_publishes_locally():
+    async def scenario():
+        broker = NotificationBroker()
+        feed = NotificationFeed(broker)
+        # mongomock has no change streams at all
+        await feed.start(AsyncMongoMockClient()["test_database"])
+        assert feed.mode == "local"
+        queue = broker.subscribe("u1")
+        feed.notify({"_id": "internal", "user_id": "u1", "title": "hi"})
+        assert queue.get_nowait() == {"user_id": "u1", "title": "hi"}
+        await feed.stop()
+    run(scenario())
+
+
+class RejectedStream:
+    closed = False
+
+    async def try_next(self):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+    async def close(self):
+        self.closed = True
+
+
+class StandaloneCollection:
+    def __init__(self):
+        self.stream = RejectedStream()
+
+    def watch(self, pipeline, **kwargs):
+        return self.stream
+
+
+class StandaloneDatabase:
+    def __init__(self):
+        self.notifications = StandaloneCollection()
+
+
+def test_rejected_change_stream_is_closed():
+    async def scenario():
+        db = StandaloneDatabase()
+        feed = NotificationFeed(NotificationBroker())
+        await feed.start(db)
+        assert feed.mode == "local" and db.notifications.stream.closed
+    run(scenario())
+
+
+def test_change_stream_mode_leaves_publishing_to_the_stream():
+    feed = NotificationFeed(NotificationBroker())
+    feed.mode = "change_stream"
+    queue = feed.broker.subscribe("u1")
+    feed.notify({"user_id": "u1", "title": "hi"})
+    assert queue.empty()
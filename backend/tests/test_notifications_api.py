@@ -0,0 +1,76 @@
+from datetime import datetime
+
+
+def notification(server, user_id, title, created_at, read=False):
+    return server.NotificationMessage(
+        user_id=user_id, title=title, message=title, type="system", read=read, created_at=created_at
+    ).model_dump()
+
+
+async def seed(server, user_id, other_id):
+    await server.db.notifications.insert_many([
+        notification(server, user_id, "n1", datetime(2024, 1, 1)),
+        notification(server, user_id, "n2", datetime(2024, 1, 2)),
+        notification(server, user_id, "n3", datetime(2024, 1, 3)),
+        notification(server, user_id, "old", datetime(2023, 12, 1), read=True),
+        notification(server, other_id, "theirs", datetime(2024, 1, 1)),
+    ])
+    rows = await server.db.notifications.find({"user_id": user_id}).to_list(None)
+    return {row["title"]: row["id"] for row in rows}
+
+
+async def unread(http, headers):
+    return (await http.get("/api/notifications/unread-count", headers=headers)).json()["unread"]
+
+
+async def dashboard_unread(http, headers):
+    return (await http.get("/api/dashboard/summary", headers=headers)).json()["unread_notifications"]
+
+
+def test_bulk_read_by_ids_only_touches_the_callers_unread_rows(server, api, login):
+    async def scenario(http):
+        user_id, headers = await login()
+        other_id, other_headers = await login("+919000000002")
+        ids = await seed(server, user_id, other_id)
+        theirs = await server.db.notifications.find_one({"user_id": other_id})
+        assert await unread(http, headers) == 3
+
+        response = await http.post("/api/notifications/read", headers=headers, json={
+            "ids": [ids["n1"], ids["old"], theirs["id"], "missing"]
+        })
+        assert response.status_code == 200 and response.json()["updated"] == 1
+        assert await unread(http, headers) == 2
+        assert await dashboard_unread(http, headers) == 2
+        assert await unread(http, other_headers) == 1
+
+    api(scenario)
+
+
+def test_bulk_read_before_a_timestamp(server, api, login):
+    async def scenario(http):
+        user_id, headers = await login()
+        other_id, other_headers = await login("+919000000002")
+        await seed(server, user_id, other_id)
+
+        response = await http.post("/api/notifications/read", headers=headers, json={"before": "2024-01-02T05:30:00+05:30"})
+        assert response.json()["updated"] == 2
+        assert await unread(http, headers) == 1
+        assert await dashboard_unread(http, headers) == 1
+        # Repeating it changes nothing, and the counter does not drift
+        response = await http.post("/api/notifications/read", headers=headers, json={"before": "2024-01-02T00:00:00"})
+        assert response.json()["updated"] == 0
+        assert await dashboard_unread(http, headers) == 1
+        assert await unread(http, other_headers) == 1
+
+    api(scenario)
+
+
+def test_bulk_read_needs_exactly_one_selector(server, api, login):
+    async def scenario(http):
+        _, headers = await login()
+        both = await http.post("/api/notifications/read", headers=headers, json={"ids": [], "before": "2024-01-01T00:00:00"})
+        neither = await http.post("/api/notifications/read", headers=headers, json={})
+        anonymous = await http.get("/api/notifications/unread-count")
+        return both.status_code, neither.status_code, anonymous.status_code
+
+    assert api(scenario) == (422, 422, 401)
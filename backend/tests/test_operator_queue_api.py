@@ -0,0 +1,63 @@
+from datetime import datetime
+
+
+def application(server, user_id, center_id, priority=0, created_at=datetime(2024, 1, 1), **fields):
+    return server.ServiceApplication(
+        user_id=user_id, service_name="Ration Card", service_id="ration_card", fee=100,
+        center_id=center_id, priority=priority, created_at=created_at, **fields
+    ).model_dump()
+
+
+def test_queue_lists_the_operators_center_most_urgent_first(server, api, login):
+    async def scenario(http):
+        citizen_id, _ = await login()
+        _, operator = await login("+919000000002", role="operator", center_id="c1")
+        rows = [
+            application(server, citizen_id, "c1", created_at=datetime(2024, 1, 2)),
+            application(server, citizen_id, "c1", created_at=datetime(2024, 1, 1)),
+            application(server, citizen_id, "c1", priority=1, created_at=datetime(2024, 1, 3)),
+            application(server, citizen_id, "c2", priority=5),
+            application(server, citizen_id, "c1", priority=5, status="processing"),
+        ]
+        await server.db.applications.insert_many([dict(row) for row in rows])
+        queue = await http.get("/api/operator/queue", headers=operator)
+        limited = await http.get("/api/operator/queue?limit=1", headers=operator)
+        return rows, queue, limited
+
+    rows, queue, limited = api(scenario)
+    assert queue.status_code == 200
+    assert [row["id"] for row in queue.json()] == [rows[2]["id"], rows[1]["id"], rows[0]["id"]]
+    assert [row["id"] for row in limited.json()] == [rows[2]["id"]]
+    assert "status_history" not in queue.json()[0]
+
+
+def test_queue_is_for_operators_with_a_center(server, api, login):
+    async def scenario(http):
+        _, citizen = await login()
+        _, unassigned = await login("+919000000002", role="operator")
+        _, operator = await login("+919000000003", role="operator", center_id="c1")
+        return (
+            (await http.get("/api/operator/queue", headers=citizen)).status_code,
+            (await http.post("/api/operator/queue/claim", headers=citizen)).status_code,
+            (await http.get("/api/operator/queue", headers=unassigned)).status_code,
+            (await http.post("/api/operator/queue/claim", headers=unassigned)).status_code,
+            # Nothing pending at the center
+            (await http.post("/api/operator/queue/claim", headers=operator)).status_code,
+        )
+
+    assert api(scenario) == (403, 403, 403, 403, 204)
+
+
+def test_submitted_applications_land_in_the_chosen_or_default_center(server, api, login):
+    async def scenario(http):
+        _, citizen = await login()
+        _, operator = await login("+919000000002", role="operator", center_id="c2")
+        await http.post("/api/applications", headers=citizen, json={"service_id": "ration_card"})
+        chosen = await http.post("/api/applications", headers=citizen, json={"service_id": "ration_card", "center_id": "c2"})
+        unknown = await http.post("/api/applications", headers=citizen, json={"service_id": "ration_card", "center_id": "c9"})
+        queue = await http.get("/api/operator/queue", headers=operator)
+        return chosen, unknown, queue
+
+    chosen, unknown, queue = api(scenario)
+    assert unknown.status_code == 422
+    assert [row["id"] for row in queue.json()] == [chosen.json()["id"]]
@@ -0,0 +1,111 @@
+import asyncio
+
+import fakeredis
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from services.otp_store import MemoryOTPStore, MongoOTPStore, OTPResult, RedisOTPStore
+
+
+def memory_store(**options):
+    return MemoryOTPStore(**options)
+
+
+def mongo_store(**options):
+    return MongoOTPStore(AsyncMongoMockClient()["test_database"], **options)
+
+
+def redis_store(**options):
+    # fakeredis runs the verification Lua script like a real server
+    return RedisOTPStore(fakeredis.FakeAsyncRedis(), **options)
+
+
+STORES = [memory_store, mongo_store, redis_store]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize("make_store", STORES)
+def test_correct_code_is_consumed(make_store):
+    async def scenario():
+        store = make_store()
+        await store.save("+911234567890", "123456")
+        assert await store.verify("+911234567890", "123456") == OTPResult.OK
+        assert await store.verify("+911234567890", "123456") == OTPResult.NOT_FOUND
+    run(scenario())
+
+
+@pytest.mark.parametrize("make_store", STORES)
+def test_unknown_phone(make_store):
+    assert run(make_store().verify("+911234567890", "123456")) == OTPResult.NOT_FOUND
+
+
+@pytest.mark.parametrize("make_store", STORES)
+def test_attempts_are_limited(make_store):
+    async def scenario():
+        store = make_store(max_attempts=2)
+        await store.save("+911234567890", "123456")
+        assert await store.verify("+911234567890", "000000") == OTPResult.INVALID
+        assert await store.verify("+911234567890", "000000") == OTPResult.INVALID
+        # Even the right code is refused once the attempts are used up
+        assert await store.verify("+911234567890", "123456") == OTPResult.TOO_MANY_ATTEMPTS
+        assert await store.verify("+911234567890", "123456") == OTPResult.NOT_FOUND
+    run(scenario())
+
+
+@pytest.mark.parametrize("make_store", STORES)
+def test_expired_code(make_store):
+    async def scenario():
+        store = make_store(ttl_seconds=1)
+        await store.save("+911234567890", "123456")
+        await asyncio.sleep(1.05)
+        assert await store.verify("+911234567890", "123456") == OTPResult.EXPIRED
+        assert await store.verify("+911234567890", "123456") == OTPResult.NOT_FOUND
+    run(scenario())
+
+
+@pytest.mark.parametrize("make_store", STORES)
+def test_new_code_replaces_old_one_and_resets_attempts(make_store):
+    async def scenario():
+        store = make_store(max_attempts=1)
+        await store.save("+911234567890", "111111")
+        assert await store.verify("+911234567890", "000000") == OTPResult.INVALID
+        await store.save("+911234567890", "222222")
+        assert await store.verify("+911234567890", "111111") == OTPResult.INVALID
+        await store.save("+911234567890", "333333")
+        assert await store.verify("+911234567890", "333333") == OTPResult.OK
+    run(scenario())
+
+
+def test_mongo_cleanup_keeps_a_code_requested_meanwhile():
+    async def scenario():
+        store = mongo_store(max_attempts=1)
+        await store.save("+911234567890", "111111")
+        assert await store.verify("+911234567890", "000000") == OTPResult.INVALID
+
+        # A new code is saved between the failed checks and the cleanup lookup
+        original_find_one = store.collection.find_one
+
+        async def find_one_then_resend(*args, **kwargs):
+            entry = await original_find_one(*args, **kwargs)
+            await store.save("+911234567890", "222222")
+            return entry
+        store.collection.find_one = find_one_then_resend
+
+        assert await store.verify("+911234567890", "000000") == OTPResult.TOO_MANY_ATTEMPTS
+        store.collection.find_one = original_find_one
+        assert await store.verify("+911234567890", "222222") == OTPResult.OK
+    run(scenario())
+
+
+def test_memory_store_is_bounded():
+    async def scenario():
+        store = MemoryOTPStore(max_entries=2)
+        for phone in ("+911", "+912", "+913"):
+            await store.save(phone, "123456")
+        assert len(store) == 2
+        assert await store.verify("+911", "123456") == OTPResult.NOT_FOUND
+        assert await store.verify("+913", "123456") == OTPResult.OK
+    run(scenario())
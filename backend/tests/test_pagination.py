@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.pagination import (
+    InvalidCursor, cursor_headers, decode_cursor, encode_cursor, keyset_filter, split_page,
+)
+
+
+def rows(count):
+    start = datetime(2024, 1, 1)
+    return [{"id": f"row-{i:03d}", "created_at": start - timedelta(minutes=i)} for i in range(count)]
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 10, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, "abc")) == (created_at, "abc")
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime(2024, 5, 17), "a/b+c")
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", "eyJ0IjoieCIsImlkIjoxfQ"])
+def test_foreign_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_keyset_filter_without_cursor_keeps_query():
+    assert keyset_filter({"user_id": "u"}, None) == {"user_id": "u"}
+
+
+def test_keyset_filter_resumes_after_last_row():
+    created_at = datetime(2024, 5, 17)
+    query = keyset_filter({"user_id": "u"}, encode_cursor(created_at, "row-5"))
+    assert query == {
+        "user_id": "u",
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": "row-5"}},
+        ],
+    }
+
+
+def test_split_page_last_page_has_no_cursor():
+    page, cursor = split_page(rows(3), 3)
+    assert len(page) == 3 and cursor is None
+    assert cursor_headers(cursor) == {}
+
+
+def test_split_page_drops_lookahead_row_and_points_at_last_served():
+    fetched = rows(4)
+    page, cursor = split_page(fetched, 3)
+    assert page == fetched[:3]
+    assert decode_cursor(cursor) == (fetched[2]["created_at"], fetched[2]["id"])
+    assert cursor_headers(cursor) == {"X-Next-Cursor": cursor}
@@ -0,0 +1,158 @@
+import asyncio
+
+import fakeredis
+import httpx
+import pytest
+
+from middleware import rate_limit
+from middleware.rate_limit import MemoryRateLimitBackend, RateLimiter, RateLimitRule, RedisRateLimitBackend, default_rules
+from middleware.security import SecurityMiddleware
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "time", clock)
+    return clock
+
+
+BACKENDS = [MemoryRateLimitBackend, lambda: RedisRateLimitBackend(fakeredis.FakeAsyncRedis())]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize("make_backend", BACKENDS)
+def test_limit_within_window(clock, make_backend):
+    async def scenario():
+        limiter = RateLimiter([RateLimitRule("ip", 3, 60)], make_backend())
+        for _ in range(3):
+            assert await limiter.check("/api/x", "1.1.1.1", None) == (True, 0)
+        allowed, retry_after = await limiter.check("/api/x", "1.1.1.1", None)
+        assert not allowed and 1 <= retry_after <= 60
+        # Other clients have their own budget
+        assert await limiter.check("/api/x", "2.2.2.2", None) == (True, 0)
+    run(scenario())
+
+
+@pytest.mark.parametrize("make_backend", BACKENDS)
+def test_previous_window_is_weighted_by_overlap(clock, make_backend):
+    async def scenario():
+        limiter = RateLimiter([RateLimitRule("ip", 4, 60)], make_backend())
+        clock.now = 60 * 1000
+        for _ in range(4):
+            assert (await limiter.check("/", "ip", None))[0]
+        # Half way into the next window half of the previous count still applies
+        clock.now += 90
+        assert (await limiter.check("/", "ip", None))[0]
+        assert (await limiter.check("/", "ip", None))[0]
+        assert not (await limiter.check("/", "ip", None))[0]
+        # Two windows later the old requests no longer count
+        clock.now += 120
+        assert (await limiter.check("/", "ip", None))[0]
+    run(scenario())
+
+
+@pytest.mark.parametrize("make_backend", BACKENDS)
+def test_rejected_request_uses_no_quota(clock, make_backend):
+    async def scenario():
+        limiter = RateLimiter(
+            [RateLimitRule("otp", 1, 60, path="/api/auth/request-otp"), RateLimitRule("ip", 3, 60)],
+            make_backend()
+        )
+        assert (await limiter.check("/api/auth/request-otp", "ip", None))[0]
+        for _ in range(5):
+            assert not (await limiter.check("/api/auth/request-otp", "ip", None))[0]
+        # Only the accepted OTP request counted towards the general limit
+        assert (await limiter.check("/api/documents", "ip", None))[0]
+        assert (await limiter.check("/api/documents", "ip", None))[0]
+        assert not (await limiter.check("/api/documents", "ip", None))[0]
+    run(scenario())
+
+
+def test_per_user_rule_keys_on_user_and_falls_back_to_ip(clock):
+    async def scenario():
+        limiter = RateLimiter([RateLimitRule("user", 1, 60, path="/api/*", per_user=True)])
+        assert (await limiter.check("/api/x", "ip", "alice"))[0]
+        assert not (await limiter.check("/api/x", "other-ip", "alice"))[0]
+        assert (await limiter.check("/api/x", "ip", None))[0]
+        assert not (await limiter.check("/api/x", "ip", None))[0]
+        # Rules for other paths are not applied
+        assert (await limiter.check("/health", "ip", "alice"))[0]
+    run(scenario())
+
+
+def test_memory_backend_is_bounded(clock):
+    async def scenario():
+        backend = MemoryRateLimitBackend(max_keys=10)
+        limiter = RateLimiter([RateLimitRule("ip", 5, 60)], backend)
+        for i in range(100):
+            await limiter.check("/", f"10.0.0.{i}", None)
+        assert len(backend) == 10
+    run(scenario())
+
+
+def test_middleware_keys_per_user_limits_on_verified_tokens(clock):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    def identify(token):
+        if token != "valid-token":
+            raise ValueError("invalid token")
+        return "alice"
+
+    limiter = RateLimiter([RateLimitRule("user", 2, 60, path="/api/*", per_user=True)])
+    middleware = SecurityMiddleware(app, limiter=limiter, identify=identify)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware, client=("1.2.3.4", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            # Every forged token shares the caller's IP budget
+            statuses = [
+                (await http.get("/api/x", headers={"Authorization": f"Bearer forged-{i}"})).status_code
+                for i in range(3)
+            ]
+            assert statuses == [200, 200, 429]
+            valid = {"Authorization": "Bearer valid-token"}
+            assert (await http.get("/api/x", headers=valid)).status_code == 200
+            assert (await http.get("/api/x", headers=valid)).status_code == 200
+            response = await http.get("/api/x", headers=valid)
+            assert response.status_code == 429 and "Retry-After" in response.headers
+    run(scenario())
+
+
+def test_authenticated_client_is_not_held_to_the_ip_limit(clock, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_MAX_REQUESTS", "2")
+    monkeypatch.setenv("RATE_LIMIT_USER_MAX_REQUESTS", "4")
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    def identify(token):
+        if token != "valid-token":
+            raise ValueError("invalid token")
+        return "alice"
+
+    middleware = SecurityMiddleware(app, limiter=RateLimiter(default_rules()), identify=identify)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware, client=("1.2.3.4", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            valid = {"Authorization": "Bearer valid-token"}
+            statuses = [(await http.get("/api/x", headers=valid)).status_code for _ in range(5)]
+            assert statuses == [200, 200, 200, 200, 429]
+            # Anonymous callers from the same address still get the IP budget
+            statuses = [(await http.get("/api/x")).status_code for _ in range(3)]
+            assert statuses == [200, 200, 429]
+    run(scenario())
@@ -0,0 +1,63 @@
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from services import serialization
+from services.serialization import FastJSONResponse, fast_json_response, model_defaults, with_defaults
+
+
+class Row(BaseModel):
+    id: str
+    tags: List[str] = []
+    note: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+def test_model_defaults_skip_required_fields_and_factories():
+    assert model_defaults(Row) == {"tags": [], "note": None}
+
+
+def test_with_defaults_fills_missing_fields_without_overriding():
+    rows = with_defaults([{"id": "a"}, {"id": "b", "note": "kept"}], model_defaults(Row))
+    assert rows == [{"id": "a", "tags": [], "note": None}, {"id": "b", "tags": [], "note": "kept"}]
+
+
+def test_fast_response_matches_the_response_model_encoding():
+    row = {"id": "a", "tags": ["x"], "note": None, "created_at": datetime(2024, 1, 2, 3, 4, 5, 678000)}
+    response = fast_json_response([row], headers={"X-Next-Cursor": "c"}, status_code=201)
+
+    assert response.status_code == 201 and response.headers["x-next-cursor"] == "c"
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == [Row(**row).model_dump(mode="json")]
+
+
+def test_stdlib_fallback_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "ORJSON_AVAILABLE", False)
+    row = {"id": "a", "created_at": datetime(2024, 1, 2, 3, 4, 5)}
+    assert json.loads(FastJSONResponse(content=[row]).body) == [{"id": "a", "created_at": "2024-01-02T03:04:05"}]
+
+
+def test_list_endpoint_serves_legacy_rows_with_model_defaults(server, api, login):
+    async def scenario(http):
+        user_id, headers = await login()
+        # Millisecond precision: MongoDB truncates stored datetimes to it
+        current = server.ServiceApplication(
+            user_id=user_id, service_name="S", service_id="s", fee=10, center_id="c1",
+            created_at=datetime(2024, 1, 2, 3, 4, 5, 678000)
+        )
+        await server.db.applications.insert_many([
+            current.model_dump(),
+            # Stored before status_updated_at, center_id, priority and assigned_operator existed
+            {"id": "legacy", "user_id": user_id, "service_name": "S", "service_id": "s", "fee": 10,
+             "status": "pending", "documents": [], "created_at": datetime(2023, 5, 1)},
+        ])
+        response = await http.get("/api/applications", headers=headers)
+        return current, response
+
+    current, response = api(scenario)
+    by_id = {row["id"]: row for row in response.json()}
+    assert by_id[current.id] == json.loads(current.model_dump_json())
+    legacy = server.ServiceApplication(**by_id["legacy"]).model_dump(mode="json")
+    assert by_id["legacy"] == legacy and legacy["priority"] == 0 and legacy["center_id"] is None
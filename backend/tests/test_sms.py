@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+# services.sms imports the Twilio SDK at module level
+pytest.importorskip("twilio")
+
+from services.sms import FakeSMSProvider, SMSDispatcher, SMSService, format_validity  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_queued_messages_are_delivered():
+    async def scenario():
+        provider = FakeSMSProvider()
+        dispatcher = SMSDispatcher(provider, workers=2, batch_size=3)
+        await dispatcher.start()
+        for i in range(7):
+            assert dispatcher.enqueue(f"+91{i}", "hello")
+        await dispatcher.stop()
+        assert sorted(message.to for message in provider.sent) == [f"+91{i}" for i in range(7)]
+        assert dispatcher.get_status()["sent"] == 7
+    run(scenario())
+
+
+def test_enqueue_does_not_wait_for_the_provider():
+    async def scenario():
+        provider = FakeSMSProvider(latency=0.2)
+        dispatcher = SMSDispatcher(provider)
+        await dispatcher.start()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        dispatcher.enqueue("+911", "hello")
+        assert loop.time() - started < 0.05
+        await dispatcher.stop()
+        assert len(provider.sent) == 1
+    run(scenario())
+
+
+def test_provider_concurrency_is_bounded():
+    async def scenario():
+        in_flight = peak = 0
+
+        class CountingProvider(FakeSMSProvider):
+            async def send(self, to, body):
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                try:
+                    return await super().send(to, body)
+                finally:
+                    in_flight -= 1
+
+        provider = CountingProvider(latency=0.01, max_concurrency=2)
+        dispatcher = SMSDispatcher(provider, workers=4, batch_size=5)
+        await dispatcher.start()
+        for i in range(20):
+            dispatcher.enqueue(f"+91{i}", "hello")
+        await dispatcher.stop()
+        assert len(provider.sent) == 20
+        assert peak <= 2
+    run(scenario())
+
+
+def test_failed_sends_are_retried_with_backoff():
+    async def scenario():
+        provider = FakeSMSProvider(fail_times=2)
+        dispatcher = SMSDispatcher(provider, max_retries=3, backoff_base=0.01)
+        await dispatcher.start()
+        dispatcher.enqueue("+911", "hello")
+        for _ in range(100):
+            if provider.sent:
+                break
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        assert provider.calls == 3 and len(provider.sent) == 1
+    run(scenario())
+
+
+def test_gives_up_after_max_retries():
+    async def scenario():
+        provider = FakeSMSProvider(fail_times=10)
+        dispatcher = SMSDispatcher(provider, max_retries=1, backoff_base=0.01)
+        await dispatcher.start()
+        dispatcher.enqueue("+911", "hello")
+        for _ in range(100):
+            if dispatcher.failed:
+                break
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        assert provider.calls == 2 and dispatcher.failed == 1 and not provider.sent
+    run(scenario())
+
+
+def test_full_queue_rejects_instead_of_blocking():
+    async def scenario():
+        dispatcher = SMSDispatcher(FakeSMSProvider(latency=1), workers=1, batch_size=1, queue_size=1)
+        await dispatcher.start()
+        dispatcher.enqueue("+911", "first")
+        await asyncio.sleep(0)  # the worker takes the first message
+        assert dispatcher.enqueue("+912", "second")
+        assert not dispatcher.enqueue("+913", "third")
+        await dispatcher.stop(timeout=0.01)
+    run(scenario())
+
+
+def test_service_sends_otp_through_the_queue():
+    async def scenario():
+        provider = FakeSMSProvider()
+        service = SMSService(provider=provider)
+        assert await service.send_otp("+911234567890", "123456", ttl_seconds=600)
+        await service.stop()
+        assert provider.sent[0].to == "+911234567890"
+        assert "123456" in provider.sent[0].body
+        assert "Valid for 10 minutes." in provider.sent[0].body
+        assert service.get_status()["status"] == "development_mode"
+    run(scenario())
+
+
+@pytest.mark.parametrize("seconds, wording", [(300, "5 minutes"), (60, "1 minute"), (90, "90 seconds"), (1, "1 second")])
+def test_validity_wording_follows_the_ttl(seconds, wording):
+    assert format_validity(seconds) == wording
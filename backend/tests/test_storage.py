@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from services.storage import BlobNotFound, BytesSource, ContentAddressedStore, LocalBlobStore, UploadTooLarge, parse_range
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentAddressedStore(LocalBlobStore(str(tmp_path), chunk_size=4), AsyncMongoMockClient()["test_database"])
+
+
+def test_no_header_or_other_unit_serves_whole_body():
+    assert parse_range(None, 100) is None
+    assert parse_range("items=0-1", 100) is None
+
+
+def test_multipart_ranges_are_ignored():
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+
+def test_closed_range():
+    assert parse_range("bytes=10-19", 100) == (10, 19)
+
+
+def test_open_ended_range_runs_to_the_end():
+    assert parse_range("bytes=90-", 100) == (90, 99)
+
+
+def test_end_past_length_is_clamped():
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+
+
+def test_suffix_range():
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=20-10", "bytes=-0", "bytes=a-b", "bytes=-"])
+def test_unsatisfiable_ranges_raise(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 100)
+
+
+def test_identical_uploads_of_one_user_share_a_blob(store):
+    async def scenario():
+        first = await store.put(BytesSource(b"same bytes"), "a.txt", "text/plain", scope="u1")
+        second = await store.put(BytesSource(b"same bytes"), "b.bin", "application/octet-stream", scope="u1")
+        assert first.blob_id == second.blob_id and first.content_hash == second.content_hash
+        assert (await store.get_ref(first.content_hash))["refs"] == 2
+        # Each upload keeps the type it was sent with
+        assert first.content_type == "text/plain"
+        assert second.content_type == "application/octet-stream"
+    run(scenario())
+
+
+def test_uploads_are_not_shared_across_users(store):
+    async def scenario():
+        mine = await store.put(BytesSource(b"same bytes"), "a.txt", "text/plain", scope="u1")
+        theirs = await store.put(BytesSource(b"same bytes"), "a.txt", "text/plain", scope="u2")
+        assert mine.blob_id != theirs.blob_id and mine.content_hash != theirs.content_hash
+        assert (await store.get_ref(mine.content_hash))["refs"] == 1
+    run(scenario())
+
+
+def test_reencoded_content_reports_its_new_type(store):
+    async def scenario():
+        first = await store.put(BytesSource(b"png bytes"), "a.png", "image/png", scope="u1")
+        await store.refs.update_one(
+            {"_id": first.content_hash},
+            {"$set": {"content_type": "image/jpeg", "length": 5, "original_length": 9}}
+        )
+        again = await store.put(BytesSource(b"png bytes"), "b.png", "image/png", scope="u1")
+        assert again.content_type == "image/jpeg" and again.length == 5
+    run(scenario())
+
+
+def test_last_release_deletes_the_blob(store):
+    async def scenario():
+        first = await store.put(BytesSource(b"bytes"), "a.txt", "text/plain", scope="u1")
+        await store.put(BytesSource(b"bytes"), "a.txt", "text/plain", scope="u1")
+        await store.release(first.content_hash)
+        assert (await store.blobs.stat(first.blob_id)).length == 5
+        await store.release(first.content_hash)
+        assert await store.get_ref(first.content_hash) is None
+        with pytest.raises(BlobNotFound):
+            await store.blobs.stat(first.blob_id)
+    run(scenario())
+
+
+def test_oversized_upload_is_rejected_before_anything_is_stored(tmp_path):
+    store = ContentAddressedStore(
+        LocalBlobStore(str(tmp_path), chunk_size=4), AsyncMongoMockClient()["test_database"], max_length=8
+    )
+
+    async def scenario():
+        assert (await store.put(BytesSource(b"8 bytes!"), "a.txt", "text/plain", scope="u1")).length == 8
+        with pytest.raises(UploadTooLarge):
+            await store.put(BytesSource(b"nine byte"), "b.txt", "text/plain", scope="u1")
+        assert await store.refs.count_documents({}) == 1
+        assert len([p for p in tmp_path.rglob("*") if p.is_file()]) == 2  # the accepted blob and its .type file
+    run(scenario())
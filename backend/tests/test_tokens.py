@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from services.tokens import InvalidToken, TokenManager
+
+KEY = "k" * 32
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def tokens():
+    return TokenManager({"default": KEY}, "default")
+
+
+def test_stream_ticket_identifies_the_user(tokens):
+    access = tokens.issue("alice")
+    grant = tokens.verify_stream_ticket(tokens.issue_stream_ticket(access))
+    assert grant.user_id == "alice" and tokens.is_active(grant)
+
+
+def test_tickets_and_access_tokens_are_not_interchangeable(tokens):
+    access = tokens.issue("alice")
+    ticket = tokens.issue_stream_ticket(access)
+    with pytest.raises(InvalidToken):
+        tokens.verify(ticket)
+    with pytest.raises(InvalidToken):
+        tokens.verify_stream_ticket(access)
+
+
+def test_expired_stream_ticket_is_rejected(tokens):
+    ticket = tokens.issue_stream_ticket(tokens.issue("alice"), ttl_seconds=0)
+    with pytest.raises(InvalidToken, match="expired"):
+        tokens.verify_stream_ticket(ticket)
+
+
+def test_revoking_the_access_token_ends_open_streams(tokens):
+    access = tokens.issue("alice")
+    ticket = tokens.issue_stream_ticket(access)
+    grant = tokens.verify_stream_ticket(ticket)
+    run(tokens.revoke(access))
+    assert not tokens.is_active(grant)
+    with pytest.raises(InvalidToken):
+        tokens.verify_stream_ticket(ticket)
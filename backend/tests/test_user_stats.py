@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from services import user_stats
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def new_db():
+    return AsyncMongoMockClient()["test_database"]
+
+
+def test_first_increment_seeds_from_existing_rows():
+    async def scenario():
+        db = new_db()
+        # A user with history from before the counters existed
+        await db.documents.insert_many([{"user_id": "u1"}, {"user_id": "u1"}])
+        await db.notifications.insert_many([{"user_id": "u1", "read": False}, {"user_id": "u1", "read": True}])
+        await db.documents.insert_one({"user_id": "u1"})
+        await user_stats.increment(db, "u1", documents=1)
+        assert await user_stats.get_stats(db, "u1") == {
+            "applications": 0, "fees_paid": 0, "documents": 3, "notifications": 2, "unread_notifications": 1,
+        }
+        await db.documents.insert_one({"user_id": "u1"})
+        await user_stats.increment(db, "u1", documents=1)
+        assert (await user_stats.get_stats(db, "u1"))["documents"] == 4
+    run(scenario())
+
+
+def test_increment_many_seeds_missing_users():
+    async def scenario():
+        db = new_db()
+        await db.notifications.insert_many([{"user_id": "u1", "read": False}, {"user_id": "u2", "read": False}])
+        await user_stats.rebuild(db, "u1")
+        await db.notifications.insert_many([{"user_id": "u1", "read": False}, {"user_id": "u2", "read": False}])
+        await user_stats.increment_many(db, {
+            "u1": {"notifications": 1, "unread_notifications": 1},
+            "u2": {"notifications": 1, "unread_notifications": 1},
+        })
+        for user_id in ("u1", "u2"):
+            stats = await user_stats.get_stats(db, user_id)
+            assert stats["notifications"] == 2 and stats["unread_notifications"] == 2
+    run(scenario())
+
+
+def test_rebuild_does_not_overwrite_a_concurrent_increment(monkeypatch):
+    async def scenario():
+        db = new_db()
+        await db.applications.insert_one({"user_id": "u1", "fee": 10})
+        await user_stats.rebuild(db, "u1")
+
+        # An application is written and counted while the rebuild is counting
+        original_count = user_stats._count
+        raced = False
+
+        async def count_during_write(db, user_id, session=None):
+            nonlocal raced
+            counts = await original_count(db, user_id, session=session)
+            if not raced:
+                raced = True
+                await db.applications.insert_one({"user_id": "u1", "fee": 5})
+                await user_stats.increment(db, "u1", applications=1, fees_paid=5)
+            return counts
+
+        monkeypatch.setattr(user_stats, "_count", count_during_write)
+        await user_stats.rebuild(db, "u1")
+        stats = await user_stats.get_stats(db, "u1")
+        assert stats["applications"] == 2 and stats["fees_paid"] == 15
+    run(scenario())
+
+
+
+def test_first_write_landing_between_another_write_and_its_increment_is_counted_once():
+    async def scenario():
+        db = new_db()
+        # History from before the counters existed
+        await db.applications.insert_one({"user_id": "u1", "fee": 10})
+
+        # B has written its row but not yet counted it when A submits
+        await user_stats.ensure(db, "u1")
+        await db.applications.insert_one({"user_id": "u1", "fee": 5})
+        await user_stats.ensure(db, "u1")
+        await db.applications.insert_one({"user_id": "u1", "fee": 20})
+        await user_stats.increment(db, "u1", applications=1, fees_paid=20)
+        await user_stats.increment(db, "u1", applications=1, fees_paid=5)
+
+        stats = await user_stats.get_stats(db, "u1")
+        assert stats["applications"] == 3 and stats["fees_paid"] == 35
+    run(scenario())
+
+
+def test_concurrent_seeds_keep_the_first_count(monkeypatch):
+    async def scenario():
+        db = new_db()
+        await db.applications.insert_one({"user_id": "u1", "fee": 10})
+
+        async def submit(fee):
+            await user_stats.ensure(db, "u1")
+            await db.applications.insert_one({"user_id": "u1", "fee": fee})
+            await user_stats.increment(db, "u1", applications=1, fees_paid=fee)
+
+        # B seeds and submits after A has counted but before A stores its count
+        original_count = user_stats._count
+        raced = False
+
+        async def count_then_race(db, user_id, session=None):
+            nonlocal raced
+            counts = await original_count(db, user_id, session=session)
+            if not raced:
+                raced = True
+                await submit(5)
+            return counts
+
+        monkeypatch.setattr(user_stats, "_count", count_then_race)
+        await submit(20)
+        stats = await user_stats.get_stats(db, "u1")
+        assert stats["applications"] == 3 and stats["fees_paid"] == 35
+    run(scenario())
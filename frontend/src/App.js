@@ -899,18 +899,48 @@ const DocumentsScreen = ({ onDocumentScan }) => {
     }
   };
 
-  const handleViewDocument = (document) => {
-    // Create a new window/tab to view the document
+  // Document bytes are served separately from the list, behind the auth header
+  const fetchDocumentContent = async (documentId) => {
+    const token = localStorage.getItem('authToken');
+    const response = await fetch(`${API}/documents/${documentId}/content`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+    if (!response.ok) {
+      throw new Error(`Failed to load document content (${response.status})`);
+    }
+    return response.blob();
+  };
+
+  const handleViewDocument = async (document) => {
+    // Open the tab before awaiting so popup blockers treat it as user initiated
     const newWindow = window.open('', '_blank');
-    newWindow.document.write(`
-      <html>
-        <head><title>${document.name}</title></head>
-        <body style="margin: 0; padding: 20px; text-align: center;">
-          <h2>${document.name}</h2>
-          <img src="${document.file_data}" style="max-width: 100%; height: auto;" />
-        </body>
-      </html>
-    `);
+    try {
+      const blob = await fetchDocumentContent(document.id);
+      newWindow.location.href = URL.createObjectURL(blob);
+    } catch (error) {
+      console.error('Error viewing document:', error);
+      newWindow.close();
+      alert('Could not open document');
+    }
+  };
+
+  const handleShareDocument = async (document) => {
+    if (!navigator.share) {
+      return;
+    }
+    try {
+      const blob = await fetchDocumentContent(document.id);
+      const file = new File([blob], document.name, { type: blob.type });
+      if (navigator.canShare && !navigator.canShare({ files: [file] })) {
+        alert('Sharing this document is not supported on this device');
+        return;
+      }
+      await navigator.share({ files: [file], title: document.name });
+    } catch (error) {
+      console.error('Error sharing document:', error);
+    }
   };
 
   if (loading) {
@@ -969,7 +999,7 @@ const DocumentsScreen = ({ onDocumentScan }) => {
                   👁️ {t('view')}
                 </button>
                 <button
-                  onClick={() => navigator.share && navigator.share({ files: [document.file_data] })}
+                  onClick={() => handleShareDocument(document)}
                   className="flex-1 bg-green-50 text-green-600 font-medium py-2 px-3 rounded-lg hover:bg-green-100 transition-colors duration-200"
                 >
                   📤 {t('share')}